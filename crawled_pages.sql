@@ -24,6 +24,7 @@ create table crawled_pages (
     metadata jsonb not null default '{}'::jsonb,
     source_id text not null,
     embedding vector(1536),  -- OpenAI embeddings are 1536 dimensions
+    content_hash text,  -- sha256 of the chunk content, used to skip unchanged chunks on re-crawl
     created_at timestamp with time zone default timezone('utc'::text, now()) not null,
     
     -- Add a unique constraint to prevent duplicate chunks for the same URL
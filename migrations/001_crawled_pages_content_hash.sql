@@ -0,0 +1,3 @@
+-- Per-chunk content hash used by incremental re-ingest
+-- (ingest.upsert_document / utils.add_documents_to_supabase only re-embed chunks whose hash changed)
+alter table crawled_pages add column if not exists content_hash text;
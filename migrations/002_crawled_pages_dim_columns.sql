@@ -0,0 +1,80 @@
+-- Per-dimension embedding columns and matching functions used by src/vector_store.py
+-- (768 for nomic-embed-text via Ollama, 1536 for OpenAI). Idempotent; also lets a
+-- local Postgres+pgvector container (VECTOR_BACKEND=postgres) be set up from
+-- crawled_pages.sql + migrations/.
+create extension if not exists vector;
+
+alter table crawled_pages add column if not exists embedding_768 vector(768);
+alter table crawled_pages add column if not exists embedding_1536 vector(1536);
+
+create or replace function match_crawled_pages_768 (
+  query_embedding vector(768),
+  match_count int default 10,
+  filter jsonb default null,
+  source_filter text default null
+) returns table (
+  id bigint,
+  url varchar,
+  chunk_number integer,
+  content text,
+  metadata jsonb,
+  source_id text,
+  similarity float
+)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+  return query
+  select
+    id,
+    url,
+    chunk_number,
+    content,
+    metadata,
+    source_id,
+    1 - (crawled_pages.embedding_768 <=> query_embedding) as similarity
+  from crawled_pages
+  where crawled_pages.embedding_768 is not null
+    and (filter is null or metadata @> filter)
+    and (source_filter is null or source_id = source_filter)
+  order by crawled_pages.embedding_768 <=> query_embedding
+  limit match_count;
+end;
+$$;
+
+create or replace function match_crawled_pages_1536 (
+  query_embedding vector(1536),
+  match_count int default 10,
+  filter jsonb default null,
+  source_filter text default null
+) returns table (
+  id bigint,
+  url varchar,
+  chunk_number integer,
+  content text,
+  metadata jsonb,
+  source_id text,
+  similarity float
+)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+  return query
+  select
+    id,
+    url,
+    chunk_number,
+    content,
+    metadata,
+    source_id,
+    1 - (crawled_pages.embedding_1536 <=> query_embedding) as similarity
+  from crawled_pages
+  where crawled_pages.embedding_1536 is not null
+    and (filter is null or metadata @> filter)
+    and (source_filter is null or source_id = source_filter)
+  order by crawled_pages.embedding_1536 <=> query_embedding
+  limit match_count;
+end;
+$$;
@@ -0,0 +1,37 @@
+-- One page of sources with per-source chunk counts, served from the sources table
+-- (used by vector_store.source_stats / GET /mcp/get_available_sources).
+-- Only the sources of the requested page are aggregated, through the
+-- crawled_pages(source_id) index, so the response is O(page size) and never
+-- transfers crawled_pages rows.
+create or replace function list_source_stats (
+  p_limit int default 100,
+  p_offset int default 0
+) returns table (
+  source_id text,
+  summary text,
+  total_words integer,
+  chunk_count bigint,
+  created_at timestamp with time zone,
+  updated_at timestamp with time zone,
+  total_sources bigint
+)
+language sql stable
+as $$
+  select
+    s.source_id,
+    s.summary,
+    s.total_word_count,
+    coalesce(c.chunk_count, 0),
+    s.created_at,
+    greatest(s.updated_at, c.last_chunk_at),
+    (select count(*) from sources)
+  from (
+    select * from sources order by source_id limit p_limit offset p_offset
+  ) s
+  left join lateral (
+    select count(*) as chunk_count, max(cp.created_at) as last_chunk_at
+    from crawled_pages cp
+    where cp.source_id = s.source_id
+  ) c on true
+  order by s.source_id;
+$$;
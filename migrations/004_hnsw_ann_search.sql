@@ -0,0 +1,112 @@
+-- HNSW indexes on the per-dimension embedding columns and tunable matching functions.
+--
+-- `match_crawled_pages_ann_768/_1536` are the `match_crawled_pages_768/_1536`
+-- queries with per-call ANN knobs: `ef_search` (HNSW candidate list, recall vs
+-- latency) and `probes` (IVFFlat lists scanned, for databases still on ivfflat).
+-- Both are applied with set_config(..., is_local => true), i.e. for the calling
+-- transaction only. vector_store.search uses these functions when available.
+--
+-- Run outside a transaction (CREATE INDEX CONCURRENTLY). On large tables raise
+-- maintenance_work_mem first so the graph is built in memory, e.g.:
+--   set maintenance_work_mem = '2GB';
+-- m = 16 and ef_construction = 64 are pgvector's stock defaults, not yet
+-- benchmarked on this schema; scripts/benchmarks/bench_ann.py measures recall
+-- and latency to retune them (and VECTOR_EF_SEARCH) on a given data volume.
+
+create index concurrently if not exists idx_crawled_pages_embedding_768_hnsw
+  on crawled_pages using hnsw (embedding_768 vector_cosine_ops) with (m = 16, ef_construction = 64);
+
+create index concurrently if not exists idx_crawled_pages_embedding_1536_hnsw
+  on crawled_pages using hnsw (embedding_1536 vector_cosine_ops) with (m = 16, ef_construction = 64);
+
+create or replace function match_crawled_pages_ann_768 (
+  query_embedding vector(768),
+  match_count int default 10,
+  filter jsonb default null,
+  source_filter text default null,
+  ef_search int default null,
+  probes int default null
+) returns table (
+  id bigint,
+  url varchar,
+  chunk_number integer,
+  content text,
+  metadata jsonb,
+  source_id text,
+  similarity float
+)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+  if ef_search is not null then
+    -- The scan returns at most ef_search rows: never below match_count, and
+    -- hnsw.ef_search is capped at 1000 by pgvector
+    perform set_config('hnsw.ef_search', least(greatest(ef_search, match_count), 1000)::text, true);
+  end if;
+  if probes is not null then
+    perform set_config('ivfflat.probes', probes::text, true);
+  end if;
+  return query
+  select
+    id,
+    url,
+    chunk_number,
+    content,
+    metadata,
+    source_id,
+    1 - (crawled_pages.embedding_768 <=> query_embedding) as similarity
+  from crawled_pages
+  where crawled_pages.embedding_768 is not null
+    and (filter is null or metadata @> filter)
+    and (source_filter is null or source_id = source_filter)
+  order by crawled_pages.embedding_768 <=> query_embedding
+  limit match_count;
+end;
+$$;
+
+create or replace function match_crawled_pages_ann_1536 (
+  query_embedding vector(1536),
+  match_count int default 10,
+  filter jsonb default null,
+  source_filter text default null,
+  ef_search int default null,
+  probes int default null
+) returns table (
+  id bigint,
+  url varchar,
+  chunk_number integer,
+  content text,
+  metadata jsonb,
+  source_id text,
+  similarity float
+)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+  if ef_search is not null then
+    -- The scan returns at most ef_search rows: never below match_count, and
+    -- hnsw.ef_search is capped at 1000 by pgvector
+    perform set_config('hnsw.ef_search', least(greatest(ef_search, match_count), 1000)::text, true);
+  end if;
+  if probes is not null then
+    perform set_config('ivfflat.probes', probes::text, true);
+  end if;
+  return query
+  select
+    id,
+    url,
+    chunk_number,
+    content,
+    metadata,
+    source_id,
+    1 - (crawled_pages.embedding_1536 <=> query_embedding) as similarity
+  from crawled_pages
+  where crawled_pages.embedding_1536 is not null
+    and (filter is null or metadata @> filter)
+    and (source_filter is null or source_id = source_filter)
+  order by crawled_pages.embedding_1536 <=> query_embedding
+  limit match_count;
+end;
+$$;
@@ -0,0 +1,146 @@
+-- Filtered vector search that stays fast and complete with source_filter / metadata filters.
+--
+-- With a plain `where <filter> order by embedding <=> q limit k`, a selective filter
+-- either starves the HNSW scan (it returns ef_search rows, most of them then
+-- filtered out) or makes the planner fall back to a sequential scan.
+-- match_crawled_pages_filtered picks a plan from the filter's selectivity:
+--   exact          the filtered set has at most exact_threshold rows (bounded count
+--                  through the GIN / source_id indexes): exact distance over that set
+--   partial_index  the source has its own HNSW index (create_source_vector_index):
+--                  ANN over that source only, metadata filter applied on the candidates
+--   ann_overfetch  ANN over the global index, filtered, widening the candidate list
+--                  (x4 per round, up to max_candidates) until match_count rows pass
+-- It returns {"plan", "prefilter_rows", "candidates", "results": [...]} so callers can
+-- report the chosen plan. On pgvector >= 0.8, hnsw.iterative_scan is enabled as well.
+
+-- Per-source partial HNSW indexes, for large sources that are often searched alone
+create table if not exists source_vector_indexes (
+  source_id text not null references sources(source_id) on delete cascade,
+  dim int not null,
+  index_name text not null,
+  created_at timestamp with time zone default timezone('utc'::text, now()) not null,
+  primary key (source_id, dim)
+);
+
+create or replace function create_source_vector_index (
+  p_source_id text,
+  p_dim int default 768
+) returns text
+language plpgsql
+as $$
+declare
+  v_index text := 'idx_cp_' || p_dim || '_src_' || md5(p_source_id);
+begin
+  if p_dim not in (768, 1536) then
+    raise exception 'unsupported embedding dimension %', p_dim;
+  end if;
+  execute format(
+    'create index if not exists %I on crawled_pages using hnsw (%I vector_cosine_ops) where source_id = %L',
+    v_index, 'embedding_' || p_dim, p_source_id
+  );
+  insert into source_vector_indexes (source_id, dim, index_name)
+  values (p_source_id, p_dim, v_index)
+  on conflict (source_id, dim) do update set index_name = excluded.index_name;
+  return v_index;
+end;
+$$;
+
+create or replace function match_crawled_pages_filtered (
+  query_embedding vector,
+  match_count int default 10,
+  filter jsonb default null,
+  source_filter text default null,
+  ef_search int default null,
+  exact_threshold int default 2000,
+  max_candidates int default 4000
+) returns jsonb
+language plpgsql
+as $$
+declare
+  v_dim int := vector_dims(query_embedding);
+  v_col text;
+  v_filter text := 'true';
+  v_inner text;
+  v_select text;
+  v_plan text;
+  v_prefilter bigint;
+  v_candidates int;
+  v_result jsonb;
+begin
+  if v_dim not in (768, 1536) then
+    raise exception 'unsupported embedding dimension %', v_dim;
+  end if;
+  v_col := 'embedding_' || v_dim;
+  if filter is not null and filter <> '{}'::jsonb then
+    v_filter := v_filter || format(' and metadata @> %L::jsonb', filter);
+  end if;
+  if source_filter is not null then
+    v_filter := v_filter || format(' and source_id = %L', source_filter);
+  end if;
+  v_select := format(
+    'select id, url, chunk_number, content, metadata, source_id, 1 - (%I <=> $1) as similarity from crawled_pages',
+    v_col
+  );
+
+  -- pgvector >= 0.8 keeps scanning the graph until enough rows pass the filter
+  begin
+    perform set_config('hnsw.iterative_scan', 'relaxed_order', true);
+  exception when others then
+    null;
+  end;
+
+  if v_filter = 'true' then
+    if ef_search is not null then
+      -- hnsw.ef_search is capped at 1000 by pgvector
+      perform set_config('hnsw.ef_search', least(greatest(ef_search, match_count), 1000)::text, true);
+    end if;
+    execute format(
+      'select coalesce(jsonb_agg(r), ''[]''::jsonb) from (%s where %I is not null order by %I <=> $1 limit $2) r',
+      v_select, v_col, v_col
+    ) into v_result using query_embedding, match_count;
+    return jsonb_build_object('plan', 'ann', 'results', v_result);
+  end if;
+
+  -- Selectivity: count the filtered rows, stopping past exact_threshold
+  execute format(
+    'select count(*) from (select 1 from crawled_pages where %I is not null and %s limit $1) s', v_col, v_filter
+  ) into v_prefilter using exact_threshold + 1;
+
+  if v_prefilter <= exact_threshold then
+    -- Materialized pre-filter: exact distances over the small set, no index post-filtering
+    execute format(
+      'with c as materialized (%s where %I is not null and %s)'
+      ' select coalesce(jsonb_agg(r), ''[]''::jsonb) from (select * from c order by similarity desc limit $2) r',
+      v_select, v_col, v_filter
+    ) into v_result using query_embedding, match_count;
+    return jsonb_build_object('plan', 'exact', 'prefilter_rows', v_prefilter, 'results', v_result);
+  end if;
+
+  if source_filter is not null and exists (
+    select 1 from source_vector_indexes s where s.source_id = source_filter and s.dim = v_dim
+  ) then
+    v_plan := 'partial_index';
+    -- Literal predicate so the planner can match the partial index
+    v_inner := format('%I is not null and source_id = %L', v_col, source_filter);
+  else
+    v_plan := 'ann_overfetch';
+    v_inner := format('%I is not null', v_col);
+  end if;
+
+  v_candidates := least(greatest(match_count * 4, coalesce(ef_search, 0)), max_candidates);
+  loop
+    -- hnsw.ef_search is capped at 1000 by pgvector
+    perform set_config('hnsw.ef_search', least(greatest(v_candidates, match_count), 1000)::text, true);
+    execute format(
+      'with c as materialized (%s where %s order by %I <=> $1 limit $3)'
+      ' select coalesce(jsonb_agg(r), ''[]''::jsonb) from (select * from c where %s order by similarity desc limit $2) r',
+      v_select, v_inner, v_col, v_filter
+    ) into v_result using query_embedding, match_count, v_candidates;
+    exit when jsonb_array_length(v_result) >= match_count or v_candidates >= max_candidates;
+    v_candidates := least(v_candidates * 4, max_candidates);
+  end loop;
+  return jsonb_build_object(
+    'plan', v_plan, 'prefilter_rows', v_prefilter, 'candidates', v_candidates, 'results', v_result
+  );
+end;
+$$;
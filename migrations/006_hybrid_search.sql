@@ -0,0 +1,126 @@
+-- Native hybrid search: full-text ranking + vector kNN fused with reciprocal rank fusion.
+--
+-- content_tsv is a stored generated column (kept in sync by Postgres on every
+-- insert/update, nothing to change in the ingest path) with a GIN index, so the
+-- keyword side is an index scan instead of an `ilike '%query%'` full-table scan.
+-- match_crawled_pages_hybrid runs both rankings in one round-trip:
+--   keyword  websearch_to_tsquery over content_tsv, ranked with ts_rank_cd
+--            (cover density, normalized by document length: BM25-like)
+--   vector   HNSW kNN on the embedding column matching the query dimension
+-- each limited to `candidates` rows, and fuses them with
+--   score = sum(1 / (rrf_k + rank))
+-- Rows found by one side only keep a null similarity / keyword_rank.
+--
+-- Adding a stored generated column rewrites crawled_pages: run it in a
+-- maintenance window on large tables. The index is built concurrently, so run
+-- this file outside a transaction (like migrations/004).
+
+alter table crawled_pages add column if not exists content_tsv tsvector
+  generated always as (to_tsvector('english', coalesce(content, ''))) stored;
+
+create index concurrently if not exists idx_crawled_pages_content_tsv
+  on crawled_pages using gin (content_tsv);
+
+create or replace function match_crawled_pages_hybrid (
+  query_text text,
+  query_embedding vector,
+  match_count int default 10,
+  filter jsonb default null,
+  source_filter text default null,
+  ef_search int default null,
+  rrf_k int default 60,
+  candidates int default null
+) returns table (
+  id bigint,
+  url varchar,
+  chunk_number integer,
+  content text,
+  metadata jsonb,
+  source_id text,
+  similarity float,
+  keyword_rank float,
+  score float
+)
+language plpgsql
+as $$
+declare
+  v_dim int := vector_dims(query_embedding);
+  v_col text;
+  v_filter text := 'true';
+  v_candidates int := greatest(coalesce(candidates, match_count * 4), match_count);
+begin
+  if v_dim not in (768, 1536) then
+    raise exception 'unsupported embedding dimension %', v_dim;
+  end if;
+  v_col := 'embedding_' || v_dim;
+  if filter is not null and filter <> '{}'::jsonb then
+    v_filter := v_filter || format(' and cp.metadata @> %L::jsonb', filter);
+  end if;
+  if source_filter is not null then
+    v_filter := v_filter || format(' and cp.source_id = %L', source_filter);
+  end if;
+
+  -- The kNN side must return `candidates` rows: hnsw.ef_search caps the scan (max 1000)
+  perform set_config(
+    'hnsw.ef_search', least(greatest(coalesce(ef_search, 0), v_candidates), 1000)::text, true
+  );
+  begin
+    perform set_config('hnsw.iterative_scan', 'relaxed_order', true);
+  exception when others then
+    null;
+  end;
+
+  return query execute format(
+    $q$
+    with tsq as (
+      select websearch_to_tsquery('english', $1) as q
+    ),
+    vec as (
+      select v.id, v.similarity, row_number() over (order by v.distance) as rnk
+      from (
+        select cp.id, cp.%1$I <=> $2 as distance, 1 - (cp.%1$I <=> $2) as similarity
+        from crawled_pages cp
+        where cp.%1$I is not null and %2$s
+        order by cp.%1$I <=> $2
+        limit $3
+      ) v
+    ),
+    kw as (
+      select k.id, k.keyword_rank, row_number() over (order by k.keyword_rank desc, k.id) as rnk
+      from (
+        select cp.id, ts_rank_cd(cp.content_tsv, tsq.q, 1) as keyword_rank
+        from crawled_pages cp, tsq
+        where cp.content_tsv @@ tsq.q and %2$s
+        order by ts_rank_cd(cp.content_tsv, tsq.q, 1) desc
+        limit $3
+      ) k
+    ),
+    fused as (
+      select
+        coalesce(vec.id, kw.id) as id,
+        vec.similarity,
+        kw.keyword_rank,
+        coalesce(1.0 / ($4 + vec.rnk), 0) + coalesce(1.0 / ($4 + kw.rnk), 0) as score
+      from vec
+      full outer join kw on kw.id = vec.id
+      order by score desc
+      limit $5
+    )
+    select
+      cp.id,
+      cp.url,
+      cp.chunk_number,
+      cp.content,
+      cp.metadata,
+      cp.source_id,
+      f.similarity::float,
+      f.keyword_rank::float,
+      f.score::float
+    from fused f
+    join crawled_pages cp on cp.id = f.id
+    order by f.score desc
+    $q$,
+    v_col, v_filter
+  ) using query_text, query_embedding, v_candidates, rrf_k, match_count;
+end;
+$$;
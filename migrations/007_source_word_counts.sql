@@ -0,0 +1,42 @@
+-- list_source_stats (migrations/003) with word counts summed from the chunks.
+--
+-- sources.total_word_count is not maintained by any write path (it stays at its
+-- default), so total_words is now the sum of the `word_count` each chunk carries
+-- in its metadata, computed in the same per-source lateral join as the chunk
+-- count (one index scan of crawled_pages(source_id) per listed source). Chunks
+-- written before the ingest path recorded `word_count` count as 0.
+create or replace function list_source_stats (
+  p_limit int default 100,
+  p_offset int default 0
+) returns table (
+  source_id text,
+  summary text,
+  total_words integer,
+  chunk_count bigint,
+  created_at timestamp with time zone,
+  updated_at timestamp with time zone,
+  total_sources bigint
+)
+language sql stable
+as $$
+  select
+    s.source_id,
+    s.summary,
+    coalesce(c.total_words, 0)::integer,
+    coalesce(c.chunk_count, 0),
+    s.created_at,
+    greatest(s.updated_at, c.last_chunk_at),
+    (select count(*) from sources)
+  from (
+    select * from sources order by source_id limit p_limit offset p_offset
+  ) s
+  left join lateral (
+    select
+      count(*) as chunk_count,
+      sum((cp.metadata->>'word_count')::bigint) as total_words,
+      max(cp.created_at) as last_chunk_at
+    from crawled_pages cp
+    where cp.source_id = s.source_id
+  ) c on true
+  order by s.source_id;
+$$;
@@ -0,0 +1,109 @@
+-- Per-source chunk and word counters kept on `sources`, so list_source_stats reads
+-- only that table instead of aggregating every chunk of the listed sources
+-- (migrations/007 summed the chunks' jsonb on each call: O(chunks)).
+--
+-- Statement-level triggers on crawled_pages apply the net change of each write
+-- (insert, upsert, COPY, delete, re-assignment to another source) to
+-- sources.chunk_count / total_word_count, one update per touched source, and
+-- bump updated_at. A chunk's words are its metadata `word_count` (0 when absent).
+-- Writes on the same source serialize on its `sources` row.
+alter table sources add column if not exists chunk_count bigint not null default 0;
+
+create or replace function crawled_pages_source_counters ()
+returns trigger
+language plpgsql
+as $$
+begin
+  -- Transition tables only exist for the events that define them: one statement per event
+  if tg_op = 'INSERT' then
+    update sources s
+    set chunk_count = s.chunk_count + d.chunks,
+        total_word_count = coalesce(s.total_word_count, 0) + d.words,
+        updated_at = now()
+    from (
+      select source_id, count(*) as chunks, coalesce(sum((metadata->>'word_count')::bigint), 0) as words
+      from new_rows group by source_id
+    ) d
+    where s.source_id = d.source_id;
+  elsif tg_op = 'DELETE' then
+    update sources s
+    set chunk_count = s.chunk_count - d.chunks,
+        total_word_count = coalesce(s.total_word_count, 0) - d.words,
+        updated_at = now()
+    from (
+      select source_id, count(*) as chunks, coalesce(sum((metadata->>'word_count')::bigint), 0) as words
+      from old_rows group by source_id
+    ) d
+    where s.source_id = d.source_id;
+  else
+    update sources s
+    set chunk_count = s.chunk_count + d.chunks,
+        total_word_count = coalesce(s.total_word_count, 0) + d.words,
+        updated_at = now()
+    from (
+      select source_id, sum(chunks) as chunks, sum(words) as words
+      from (
+        select source_id, count(*) as chunks, coalesce(sum((metadata->>'word_count')::bigint), 0) as words
+        from new_rows group by source_id
+        union all
+        select source_id, -count(*), -coalesce(sum((metadata->>'word_count')::bigint), 0)
+        from old_rows group by source_id
+      ) u
+      group by source_id
+    ) d
+    where s.source_id = d.source_id and (d.chunks <> 0 or d.words <> 0);
+  end if;
+  return null;
+end;
+$$;
+
+drop trigger if exists crawled_pages_source_counters_insert on crawled_pages;
+create trigger crawled_pages_source_counters_insert
+  after insert on crawled_pages referencing new table as new_rows
+  for each statement execute function crawled_pages_source_counters();
+drop trigger if exists crawled_pages_source_counters_update on crawled_pages;
+create trigger crawled_pages_source_counters_update
+  after update on crawled_pages referencing old table as old_rows new table as new_rows
+  for each statement execute function crawled_pages_source_counters();
+drop trigger if exists crawled_pages_source_counters_delete on crawled_pages;
+create trigger crawled_pages_source_counters_delete
+  after delete on crawled_pages referencing old table as old_rows
+  for each statement execute function crawled_pages_source_counters();
+
+-- Backfill from the existing chunks (one pass over crawled_pages)
+update sources set chunk_count = 0, total_word_count = 0;
+update sources s
+set chunk_count = c.chunks, total_word_count = c.words
+from (
+  select source_id, count(*) as chunks, coalesce(sum((metadata->>'word_count')::bigint), 0) as words
+  from crawled_pages group by source_id
+) c
+where s.source_id = c.source_id;
+
+-- Same columns as migrations/007 (the return type is unchanged), read from `sources` only
+create or replace function list_source_stats (
+  p_limit int default 100,
+  p_offset int default 0
+) returns table (
+  source_id text,
+  summary text,
+  total_words integer,
+  chunk_count bigint,
+  created_at timestamp with time zone,
+  updated_at timestamp with time zone,
+  total_sources bigint
+)
+language sql stable
+as $$
+  select
+    s.source_id,
+    s.summary,
+    s.total_word_count,
+    s.chunk_count,
+    s.created_at,
+    s.updated_at,
+    (select count(*) from sources)
+  from sources s
+  order by s.source_id
+  limit p_limit offset p_offset;
+$$;
@@ -0,0 +1,122 @@
+"""
+Benchmark du découpage markdown : passage unique `chunking.iter_chunks` vs l'ancien
+découpeur (regex de lookahead sur tout le document puis jointures répétées).
+
+Un corpus synthétique (titres, paragraphes, blocs de code, tableaux) est généré à
+des tailles croissantes jusqu'à `--max-mb` ; pour chaque taille on mesure le temps,
+le débit (Mo/s) et le temps par Mo, qui doit rester constant si le coût est linéaire.
+On vérifie aussi qu'aucun bloc de code n'est coupé (clôtures équilibrées par chunk).
+
+Exemple :
+    python scripts/benchmarks/bench_chunking.py --max-mb 50
+    python scripts/benchmarks/bench_chunking.py --file corpus.md
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src"))
+
+import chunking  # noqa: E402
+
+_SECTION = """## Section {i}
+
+Lorem ipsum dolor sit amet, consectetur adipiscing elit. Sed do eiusmod tempor
+incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud.
+
+```python
+def handler_{i}(request):
+    # exemple de code
+    return {{"status": 200, "id": {i}}}
+```
+
+| option | défaut | description |
+|--------|--------|-------------|
+| a{i} | 1 | première option |
+| b{i} | 2 | seconde option |
+
+Duis aute irure dolor in reprehenderit in voluptate velit esse cillum dolore eu
+fugiat nulla pariatur. Excepteur sint occaecat cupidatat non proident.
+
+"""
+
+
+def _corpus(mb: float) -> str:
+    parts: List[str] = []
+    size, i = 0, 0
+    target = int(mb * 1024 * 1024)
+    while size < target:
+        if i % 50 == 0:
+            parts.append(f"# Chapitre {i // 50}\n\n")
+        section = _SECTION.format(i=i)
+        parts.append(section)
+        size += len(section)
+        i += 1
+    return "".join(parts)
+
+
+def _legacy(text: str, max_chars: int = 2000, min_chars: int = 500) -> List[Dict]:
+    sections = re.split(r"\n(?=#+\s)|\n(?=\w+\n[-=]{3,}\n)", text)
+    chunks: List[Dict] = []
+    buf: List[str] = []
+    size = 0
+    for sec in sections:
+        s = sec.strip()
+        if not s:
+            continue
+        if size + len(s) + 1 > max_chars and size >= min_chars:
+            chunks.append({"chunk_number": len(chunks), "content": "\n".join(buf)})
+            buf, size = [s], len(s)
+        else:
+            buf.append(s)
+            size += len(s) + 1
+    if buf:
+        chunks.append({"chunk_number": len(chunks), "content": "\n".join(buf)})
+    return chunks
+
+
+def _split_fences(chunks: List[Dict]) -> int:
+    return sum(1 for c in chunks if len(re.findall(r"^ {0,3}```", c["content"], re.MULTILINE)) % 2)
+
+
+def _run(label: str, fn, text: str) -> List[Dict]:
+    t0 = time.perf_counter()
+    chunks = fn(text)
+    elapsed = time.perf_counter() - t0
+    mb = len(text) / (1024 * 1024)
+    print(
+        f"{label:<10}{mb:>8.1f}{elapsed * 1000:>12.0f}{mb / elapsed:>10.1f}{elapsed * 1000 / mb:>10.1f}"
+        f"{len(chunks):>10}{_split_fences(chunks):>10}"
+    )
+    return chunks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", type=Path, help="corpus markdown réel (au lieu du corpus synthétique)")
+    parser.add_argument("--max-mb", type=float, default=50.0)
+    parser.add_argument("--max-tokens", type=int, default=chunking.MAX_TOKENS)
+    parser.add_argument("--overlap", type=int, default=chunking.OVERLAP_TOKENS)
+    parser.add_argument("--no-legacy", action="store_true", help="ne pas mesurer l'ancien découpeur")
+    args = parser.parse_args()
+
+    def single_pass(text: str) -> List[Dict]:
+        return list(chunking.iter_chunks(text, max_tokens=args.max_tokens, overlap_tokens=args.overlap))
+
+    if args.file:
+        texts = [args.file.read_text(encoding="utf-8", errors="replace")]
+    else:
+        sizes = [s for s in (1, 5, 10, 25, 50, 100) if s < args.max_mb] + [args.max_mb]
+        texts = [_corpus(mb) for mb in sizes]
+    print(f"{'découpeur':<10}{'Mo':>8}{'ms':>12}{'Mo/s':>10}{'ms/Mo':>10}{'chunks':>10}{'coupés':>10}")
+    for text in texts:
+        _run("1 passe", single_pass, text)
+        if not args.no_legacy:
+            _run("ancien", _legacy, text)
+
+
+if __name__ == "__main__":
+    main()
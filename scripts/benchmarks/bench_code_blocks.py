@@ -0,0 +1,131 @@
+"""
+Benchmark de l'extraction des blocs de code : `code_blocks.extract_code_blocks`
+(une passe regex sur les lignes de clôture, offsets, contexte paresseux) contre
+l'ancien extracteur (`find` de chaque ``` puis découpes et copies du contexte pour
+chaque paire).
+
+Sur de vrais dumps de documentation (`--file`, plusieurs fichiers possibles, par
+exemple des llms-full.txt crawlés), ou à défaut sur un corpus synthétique mêlant
+blocs ```, ~~~, blocs indentés dans des listes et ```code``` en ligne. `--repeat`
+concatène le corpus pour observer la montée en taille ; `--min-length` est le seuil
+des blocs retenus (1000 par défaut, comme l'appelant).
+
+Exemple :
+    python scripts/benchmarks/bench_code_blocks.py --file dump1.md dump2.md --repeat 5
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src"))
+
+import code_blocks  # noqa: E402
+
+_SYNTHETIC = """## Fonction {i}
+
+Pour appeler l'API, utilisez ```client.call()``` puis vérifiez le statut.
+
+```python
+def handler_{i}(request):
+{body}
+```
+
+1. Installation :
+
+   ```bash
+   pip install paquet-{i}
+   ```
+
+~~~json
+{{"id": {i}, "items": [{items}]}}
+~~~
+
+"""
+
+
+def _synthetic(mb: float) -> str:
+    parts: List[str] = []
+    size, i = 0, 0
+    while size < mb * 1024 * 1024:
+        body = "\n".join(f"    value_{k} = compute({k})" for k in range(10 + i % 60))
+        part = _SYNTHETIC.format(i=i, body=body, items=", ".join(str(k) for k in range(i % 200)))
+        parts.append(part)
+        size += len(part)
+        i += 1
+    return "".join(parts)
+
+
+def _legacy(markdown_content: str, min_length: int = 1000) -> List[Dict[str, Any]]:
+    code_blocks_found = []
+    content = markdown_content.strip()
+    start_offset = 3 if content.startswith("```") else 0
+    positions = []
+    pos = start_offset
+    while True:
+        pos = markdown_content.find("```", pos)
+        if pos == -1:
+            break
+        positions.append(pos)
+        pos += 3
+    i = 0
+    while i < len(positions) - 1:
+        start_pos, end_pos = positions[i], positions[i + 1]
+        code_section = markdown_content[start_pos + 3:end_pos]
+        lines = code_section.split("\n", 1)
+        if len(lines) > 1:
+            first_line = lines[0].strip()
+            if first_line and " " not in first_line and len(first_line) < 20:
+                language, code_content = first_line, lines[1].strip()
+            else:
+                language, code_content = "", code_section.strip()
+        else:
+            language, code_content = "", code_section.strip()
+        if len(code_content) < min_length:
+            i += 2
+            continue
+        context_before = markdown_content[max(0, start_pos - 1000):start_pos].strip()
+        context_after = markdown_content[end_pos + 3:min(len(markdown_content), end_pos + 3 + 1000)].strip()
+        code_blocks_found.append({
+            "code": code_content, "language": language, "context_before": context_before,
+            "context_after": context_after, "full_context": f"{context_before}\n\n{code_content}\n\n{context_after}",
+        })
+        i += 2
+    return code_blocks_found
+
+
+def _run(label: str, fn, text: str, min_length: int) -> List[Dict[str, Any]]:
+    t0 = time.perf_counter()
+    blocks = fn(text, min_length)
+    elapsed = time.perf_counter() - t0
+    mb = len(text) / (1024 * 1024)
+    print(f"{label:<10}{mb:>8.1f}{elapsed * 1000:>10.1f}{mb / elapsed:>10.1f}{len(blocks):>8}")
+    return blocks
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", type=Path, nargs="*", help="dumps markdown réels")
+    parser.add_argument("--mb", type=float, default=20.0, help="taille du corpus synthétique")
+    parser.add_argument("--repeat", type=int, default=1, help="concaténer le corpus N fois")
+    parser.add_argument("--min-length", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.file:
+        text = "\n\n".join(p.read_text(encoding="utf-8", errors="replace") for p in args.file)
+    else:
+        text = _synthetic(args.mb)
+    text = "\n\n".join([text] * max(1, args.repeat))
+    spans = sum(1 for _ in code_blocks.iter_code_spans(text))
+    print(f"{spans} blocs clôturés dans le corpus, seuil {args.min_length} caractères")
+    print(f"{'extracteur':<10}{'Mo':>8}{'ms':>10}{'Mo/s':>10}{'blocs':>8}")
+    for min_length in sorted({args.min_length, 0}, reverse=True):
+        if min_length != args.min_length:
+            print(f"-- tous les blocs (min_length={min_length})")
+        _run("1 passe", code_blocks.extract_code_blocks, text, min_length)
+        _run("ancien", _legacy, text, min_length)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Benchmark de l'ingestion des exemples de code (`code_examples`) : ancien chemin série
+contre le pipeline `code_examples.CodeExampleIngester`.
+
+Aucun service externe : les résumés sont demandés au stub OpenAI local de
+`bench_contextualizer.py`, l'embedding et la table Supabase sont simulés avec une
+latence fixe par appel (`--embed-latency`, `--db-latency`).
+
+  - ancien : résumés via un ThreadPoolExecutor de 10 threads, puis un DELETE par URL,
+    embeddings lot par lot et INSERT lot par lot, en série ;
+  - pipeline : résumés concurrents, embeddings groupés entre URLs et plusieurs lots en
+    vol, un DELETE groupé, upserts groupés idempotents.
+
+Affiche la durée et le débit (exemples/s) de chaque chemin.
+
+Exemple :
+    python scripts/benchmarks/bench_code_examples.py --urls 20 --per-url 10
+"""
+import argparse
+import concurrent.futures
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src"))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import code_examples  # noqa: E402
+from bench_contextualizer import _Stub  # noqa: E402
+
+
+class _Table:
+    """Table simulée : chaque appel `execute()` coûte `latency` secondes."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.rows: Dict[Any, Dict[str, Any]] = {}
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def table(self, _name: str) -> "_Table":
+        return _Query(self)  # type: ignore[return-value]
+
+
+class _Query:
+    def __init__(self, table: _Table):
+        self.t = table
+        self.op: Any = None
+
+    def delete(self) -> "_Query":
+        self.op = ("delete",)
+        return self
+
+    def eq(self, _col: str, value: str) -> "_Query":
+        self.op = ("delete", [value])
+        return self
+
+    def in_(self, _col: str, values: List[str]) -> "_Query":
+        self.op = ("delete", list(values))
+        return self
+
+    def insert(self, rows: Any) -> "_Query":
+        self.op = ("write", rows if isinstance(rows, list) else [rows])
+        return self
+
+    def upsert(self, rows: Any, on_conflict: str = "") -> "_Query":
+        return self.insert(rows)
+
+    def execute(self) -> None:
+        time.sleep(self.t.latency)
+        with self.t.lock:
+            self.t.calls += 1
+            if self.op[0] == "delete":
+                urls = set(self.op[1])
+                for key in [k for k in self.t.rows if k[0] in urls]:
+                    del self.t.rows[key]
+            else:
+                for row in self.op[1]:
+                    self.t.rows[(row["url"], row["chunk_number"])] = row
+
+
+def _embedder(latency: float):
+    def embed(texts: List[str]) -> List[List[float]]:
+        time.sleep(latency)
+        return [[1.0] * 8 for _ in texts]
+    return embed
+
+
+def _legacy(client: _Table, embed, base_url: str, urls, numbers, codes, metas, batch_size: int = 20) -> None:
+    import openai  # type: ignore
+
+    chat = openai.OpenAI(base_url=base_url, api_key="unused")
+
+    def summarize(code: str) -> str:
+        response = chat.chat.completions.create(
+            model="stub", messages=[{"role": "user", "content": code[:1500]}], temperature=0.3, max_tokens=100
+        )
+        return response.choices[0].message.content
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+        summaries = list(executor.map(summarize, codes))
+    for url in set(urls):
+        client.table("code_examples").delete().eq("url", url).execute()
+    for i in range(0, len(urls), batch_size):
+        texts = [f"{codes[j]}\n\nSummary: {summaries[j]}" for j in range(i, min(i + batch_size, len(urls)))]
+        embeddings = embed(texts)
+        rows = [
+            {"url": urls[i + j], "chunk_number": numbers[i + j], "content": codes[i + j], "summary": summaries[i + j],
+             "metadata": metas[i + j], "source_id": "bench", "embedding": e}
+            for j, e in enumerate(embeddings)
+        ]
+        client.table("code_examples").insert(rows).execute()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--urls", type=int, default=20)
+    parser.add_argument("--per-url", type=int, default=10, help="exemples de code par URL")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--embed-latency", type=float, default=0.3, help="latence d'un appel d'embedding (lot)")
+    parser.add_argument("--db-latency", type=float, default=0.05)
+    parser.add_argument("--batch-size", type=int, default=20)
+    args = parser.parse_args()
+
+    _Stub.latency = args.llm_latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Stub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    urls = [f"https://docs.example.com/page{u}" for u in range(args.urls) for _ in range(args.per_url)]
+    numbers = [i % args.per_url for i in range(len(urls))]
+    codes = [f"def example_{i}():\n" + "    value = compute()\n" * 40 for i in range(len(urls))]
+    metas = [{"language": "python"} for _ in urls]
+    print(f"{len(urls)} exemples, {args.urls} URLs")
+    print(f"{'chemin':<10}{'s':>10}{'ex/s':>10}{'appels DB':>12}{'lignes':>10}")
+
+    embed = _embedder(args.embed_latency)
+    table = _Table(args.db_latency)
+    t0 = time.perf_counter()
+    _legacy(table, embed, base_url, urls, numbers, codes, metas, args.batch_size)
+    elapsed = time.perf_counter() - t0
+    print(f"{'ancien':<10}{elapsed:>10.2f}{len(urls) / elapsed:>10.1f}{table.calls:>12}{len(table.rows):>10}")
+
+    table = _Table(args.db_latency)
+    report = code_examples.ingest_code_examples(
+        table, embed, urls, numbers, codes, None, metas, batch_size=args.batch_size, base_url=base_url
+    )
+    print(
+        f"{'pipeline':<10}{report['seconds']:>10.2f}{report['examples_per_sec']:>10.1f}"
+        f"{table.calls:>12}{len(table.rows):>10}"
+    )
+    print(report)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark de la génération contextuelle (USE_CONTEXTUAL_EMBEDDINGS) contre un serveur
+local compatible OpenAI (stub intégré, aucune clé ni réseau requis).
+
+Compare :
+  - l'ancien chemin : un appel chat par chunk avec jusqu'à 25 000 caractères du
+    document, via un ThreadPoolExecutor de 10 threads (client OpenAI synchrone) ;
+  - `contextualizer.Contextualizer` à froid : un résumé par document puis un appel
+    court par chunk, en asyncio avec limite de concurrence (et de débit) ;
+  - le même à chaud : tout vient du cache (hash document, hash chunk).
+
+Le stub répond après `--latency` secondes ; on mesure la durée, le nombre de requêtes
+et le volume de prompt envoyé. Requiert le paquet `openai` (>= 1.0).
+
+Exemple :
+    python scripts/benchmarks/bench_contextualizer.py --docs 20 --chunks 30 --latency 0.2
+    python scripts/benchmarks/bench_contextualizer.py --rate 50
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src"))
+
+import contextualizer  # noqa: E402
+
+
+class _Stub(BaseHTTPRequestHandler):
+    latency = 0.1
+    requests = 0
+    received = 0
+    lock = threading.Lock()
+
+    def do_POST(self) -> None:  # noqa: N802
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with _Stub.lock:
+            _Stub.requests += 1
+            _Stub.received += len(body)
+        time.sleep(_Stub.latency)
+        payload = json.dumps({
+            "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": "stub",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "Contexte de démonstration."}}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def _corpus(docs: int, chunks: int) -> List[Tuple[str, str]]:
+    pairs = []
+    for d in range(docs):
+        parts = [f"## Partie {c} du document {d}\n\n" + "Texte de la partie. " * 60 for c in range(chunks)]
+        document = "\n\n".join(parts)
+        pairs.extend((document, part) for part in parts)
+    return pairs
+
+
+def _legacy(base_url: str, pairs: List[Tuple[str, str]]) -> None:
+    import openai  # type: ignore
+
+    client = openai.OpenAI(base_url=base_url, api_key="unused")
+
+    def one(pair: Tuple[str, str]) -> str:
+        document, chunk = pair
+        prompt = f"<document> \n{document[:25000]} \n</document>\n<chunk> \n{chunk}\n</chunk> "
+        response = client.chat.completions.create(
+            model="stub", messages=[{"role": "user", "content": prompt}], temperature=0.3, max_tokens=200
+        )
+        return response.choices[0].message.content
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
+        list(executor.map(one, pairs))
+
+
+def _report(label: str, started: float) -> None:
+    elapsed = time.perf_counter() - started
+    print(f"{label:<14}{elapsed:>10.2f}{_Stub.requests:>10}{_Stub.received / 1e6:>12.2f}")
+    _Stub.requests = _Stub.received = 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=10)
+    parser.add_argument("--chunks", type=int, default=20, help="chunks par document")
+    parser.add_argument("--latency", type=float, default=0.1, help="latence du stub par requête (s)")
+    parser.add_argument("--concurrency", type=int, default=contextualizer.CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=0.0, help="requêtes/s (seau à jetons), 0 = illimité")
+    parser.add_argument("--no-legacy", action="store_true", help="ne pas mesurer l'ancien chemin")
+    args = parser.parse_args()
+
+    _Stub.latency = args.latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Stub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    pairs = _corpus(args.docs, args.chunks)
+    print(f"{len(pairs)} chunks, {args.docs} documents, latence {args.latency}s")
+    print(f"{'chemin':<14}{'s':>10}{'requêtes':>10}{'Mo envoyés':>12}")
+
+    if not args.no_legacy:
+        started = time.perf_counter()
+        _legacy(base_url, pairs)
+        _report("ancien", started)
+
+    ctx = contextualizer.Contextualizer(
+        model="stub", base_url=base_url, concurrency=args.concurrency, rate_limit=args.rate,
+        cache=contextualizer.ContextCache(max_entries=len(pairs) * 2, path=""),
+    )
+    for label in ("async froid", "async chaud"):
+        started = time.perf_counter()
+        results = asyncio.run(ctx.contextualize(pairs))
+        _report(label, started)
+        assert all(ok for _, ok in results) and [r.split("\n---\n", 1)[1] for r, _ in results] == [c for _, c in pairs]
+    print(json.dumps(ctx.stats(), indent=1))
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
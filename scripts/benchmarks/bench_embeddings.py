@@ -0,0 +1,88 @@
+"""
+Benchmark du débit d'embedding Ollama : appels unitaires vs lots multi-entrées.
+
+Démarre un faux serveur Ollama local (`/api/embed` et `/api/embeddings`) avec une
+latence fixe par requête, pointe `OLLAMA_HOST` dessus et mesure le débit de
+`embeddings.embed_texts` pour différents nombres de chunks.
+
+Exemple :
+    python scripts/benchmarks/bench_embeddings.py --latency 0.05 --chunks 10 40 160 640
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src"))
+
+DIM = 768
+
+
+def _start_stub(latency: float, per_item: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):  # noqa: N802
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if self.path.endswith("/api/embed"):
+                inputs = body.get("input") or []
+                inputs = [inputs] if isinstance(inputs, str) else inputs
+                time.sleep(latency + per_item * len(inputs))
+                payload = {"model": body.get("model"), "embeddings": [[random.random()] * DIM for _ in inputs]}
+            else:
+                time.sleep(latency + per_item)
+                payload = {"embedding": [random.random()] * DIM}
+            data = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.05, help="latence fixe par requête (s)")
+    parser.add_argument("--per-item", type=float, default=0.002, help="coût par texte (s)")
+    parser.add_argument("--chunks", type=int, nargs="+", default=[10, 40, 160, 640])
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    server = _start_stub(args.latency, args.per_item)
+    os.environ["OLLAMA_HOST"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["EMBEDDING_PROVIDER"] = "ollama"
+    import embeddings  # noqa: E402  (OLLAMA_HOST doit être défini avant l'import d'ollama)
+
+    modes = {
+        "unitaire": (1, 1, embeddings._embed_ollama_each),
+        "lots": (args.batch_size, args.concurrency, embeddings._embed_ollama),
+    }
+    print(f"{'mode':<10}{'chunks':>8}{'durée (s)':>12}{'chunks/s':>12}")
+    for n in args.chunks:
+        texts = [f"chunk {i} " + "lorem ipsum " * 50 for i in range(n)]
+        for name, (batch_size, concurrency, fn) in modes.items():
+            embeddings._BATCH_SIZE, embeddings._CONCURRENCY = batch_size, concurrency
+            t0 = time.perf_counter()
+            vecs = fn(texts)
+            elapsed = time.perf_counter() - t0
+            assert len(vecs) == n
+            print(f"{name:<10}{n:>8}{elapsed:>12.2f}{n / elapsed:>12.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Micro-benchmark de l'extraction texte du crawler de secours :
+BeautifulSoup (arbre complet + get_text) vs extracteur incrémental `html_extract`.
+
+Le corpus est un répertoire de pages HTML sauvegardées (*.html, *.htm). Sans
+`--corpus`, des pages synthétiques de tailles croissantes sont générées.
+
+Exemple :
+    python scripts/benchmarks/bench_html_extract.py --corpus ./pages --max-chars 5000
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src"))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+import html_extract  # noqa: E402
+
+CHUNK = 64 * 1024
+
+
+def _synthetic_corpus() -> Dict[str, str]:
+    pages = {}
+    for kb in (50, 500, 5000):
+        body = "".join(
+            f"<div class='c'><h2>Section {i}</h2><p>Lorem ipsum dolor sit amet, consectetur adipiscing.</p>"
+            f"<script>var x{i} = {i};</script></div>"
+            for i in range(kb * 1024 // 130)
+        )
+        pages[f"synthetic_{kb}kb"] = (
+            "<html><head><title>Synthetic</title>"
+            "<meta name='description' content='Synthetic benchmark page'></head>"
+            f"<body>{body}</body></html>"
+        )
+    return pages
+
+
+def _load_corpus(path: Path) -> Dict[str, str]:
+    files = sorted(list(path.glob("*.html")) + list(path.glob("*.htm")))
+    return {f.name: f.read_text(encoding="utf-8", errors="replace") for f in files}
+
+
+def _bs4(html: str, max_chars: int) -> str:
+    soup = BeautifulSoup(html, "html.parser")
+    return soup.get_text(" ").strip()[:max_chars]
+
+
+def _streaming(html: str, max_chars: int) -> str:
+    chunks = (html[i:i + CHUNK] for i in range(0, len(html), CHUNK))
+    return html_extract.extract_text(chunks, max_chars).text
+
+
+def _measure(fn, html: str, max_chars: int, repeat: int) -> List[float]:
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn(html, max_chars)
+    elapsed = (time.perf_counter() - t0) / repeat
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return [elapsed * 1000, peak / (1024 * 1024)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", type=Path, help="répertoire de pages HTML sauvegardées")
+    parser.add_argument("--max-chars", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    corpus = _load_corpus(args.corpus) if args.corpus else _synthetic_corpus()
+    print(f"{'page':<28}{'taille':>10}{'bs4 ms':>10}{'bs4 MB':>9}{'stream ms':>11}{'stream MB':>11}")
+    for name, html in corpus.items():
+        bs_ms, bs_mb = _measure(_bs4, html, args.max_chars, args.repeat)
+        st_ms, st_mb = _measure(_streaming, html, args.max_chars, args.repeat)
+        size = f"{len(html) // 1024} KB"
+        print(f"{name[:27]:<28}{size:>10}{bs_ms:>10.1f}{bs_mb:>9.1f}{st_ms:>11.2f}{st_mb:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark du crawler de secours HTTP : `requests.get` bloquant vs client async partagé.
+
+Lance un serveur HTTP local qui répond avec une latence simulée, puis exécute N
+crawls de secours concurrents dans une seule boucle asyncio (comme un worker
+Uvicorn) et mesure le débit ainsi que la latence maximale de la boucle.
+
+Exemple :
+    python scripts/benchmarks/bench_http_fallback.py --delay 0.2 --levels 1 8 32 128
+"""
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "src"))
+
+import requests  # noqa: E402
+
+import http_fetch  # noqa: E402
+
+PAGE = ("<html><head><title>bench</title></head><body>"
+        + "<p>lorem ipsum dolor sit amet</p>" * 4000
+        + "</body></html>").encode()
+
+
+def _start_server(delay: float) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):  # noqa: N802
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(PAGE)))
+            self.end_headers()
+            self.wfile.write(PAGE)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def _loop_lag_probe(stop: asyncio.Event, samples: list) -> None:
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(0.01)
+        samples.append(time.perf_counter() - t0 - 0.01)
+
+
+async def _blocking_fallback(url: str) -> int:
+    r = requests.get(url, timeout=15)
+    r.raise_for_status()
+    return len(r.text)
+
+
+async def _async_fallback(url: str) -> int:
+    r = await http_fetch.fetch(url, timeout=15)
+    return len(r.text)
+
+
+async def _run(fn, url: str, concurrency: int) -> tuple:
+    stop = asyncio.Event()
+    lags: list = []
+    probe = asyncio.create_task(_loop_lag_probe(stop, lags))
+    t0 = time.perf_counter()
+    await asyncio.gather(*(fn(url) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await probe
+    return elapsed, max(lags) if lags else 0.0
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--delay", type=float, default=0.2, help="latence serveur simulée (s)")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 8, 32, 128])
+    args = parser.parse_args()
+
+    server = _start_server(args.delay)
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    print(f"{'mode':<10}{'concurrence':>12}{'durée (s)':>12}{'crawls/s':>12}{'lag max (ms)':>14}")
+    for level in args.levels:
+        for name, fn in (("requests", _blocking_fallback), ("httpx", _async_fallback)):
+            elapsed, lag = await _run(fn, url, level)
+            print(f"{name:<10}{level:>12}{elapsed:>12.2f}{level / elapsed:>12.1f}{lag * 1000:>14.1f}")
+    await http_fetch.aclose()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,123 @@
+"""
+Budget de démarrage à froid : temps entre le lancement du serveur HTTP et la première
+réponse 200 de /health, puis jusqu'à la fin des warm-ups en tâche de fond.
+
+Lance `--runs` fois un processus neuf depuis src/ avec l'environnement courant :
+`--entry script` (défaut) est le point d'entrée du Dockerfile, `python http_server.py`
+(HOST et PORT fixés par l'environnement) ; `--entry uvicorn` lance
+`uvicorn http_server:app`. /health est interrogé toutes les 20 ms. uvicorn ne répond
+qu'une fois tous les hooks de démarrage exécutés : la première réponse les inclut.
+Les warm-ups (pool de navigateurs, reranker, pool CPU dont chaque processus importe
+le module principal) tournent ensuite en tâche de fond avec STARTUP_WARMUP=background
+(défaut) ; la seconde colonne est le délai jusqu'à ce que /health les donne tous
+terminés (`details.warmup.ready`). Avec STARTUP_WARMUP=blocking ils entrent dans la
+première mesure. Le serveur est arrêté après chaque essai.
+
+Code de sortie 1 si la médiane de la première réponse dépasse `--budget-s` (1 s par
+défaut). `--cmd` remplace la commande de lancement (`{port}` est substitué), par
+exemple pour mesurer derrière gunicorn.
+
+Exemple :
+    python scripts/benchmarks/bench_startup.py --runs 5
+    python scripts/benchmarks/bench_startup.py --entry uvicorn
+    STARTUP_WARMUP=blocking python scripts/benchmarks/bench_startup.py --budget-s 10
+"""
+import argparse
+import json
+import os
+import shlex
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+SRC = Path(__file__).resolve().parents[2] / "src"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _health(url: str) -> Optional[dict]:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            if response.status == 200:
+                return json.loads(response.read() or b"{}")
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _measure(cmd: List[str], port: int, url: str, timeout: float) -> Tuple[Optional[float], Optional[float]]:
+    """Secondes jusqu'à la première réponse 200 de `url`, puis jusqu'à la fin des warm-ups
+    (None si le délai est dépassé)."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (str(SRC), env.get("PYTHONPATH", "")) if p)
+    env.update(HOST="127.0.0.1", PORT=str(port))
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=SRC, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    first = None
+    try:
+        while time.perf_counter() - t0 < timeout:
+            if proc.poll() is not None:
+                sys.stderr.write(proc.stderr.read().decode(errors="replace")[-2000:])
+                raise SystemExit(f"le serveur s'est arrêté (code {proc.returncode})")
+            body = _health(url)
+            if body is not None:
+                if first is None:
+                    first = time.perf_counter() - t0
+                if (body.get("details") or {}).get("warmup", {}).get("ready", True):
+                    return first, time.perf_counter() - t0
+            time.sleep(0.02)
+        return first, None
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--budget-s", type=float, default=1.0, help="budget de la médiane (s)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="abandon d'une mesure (s)")
+    parser.add_argument("--path", default="/health")
+    parser.add_argument("--entry", choices=["script", "uvicorn"], default="script",
+                        help="script : python http_server.py (Dockerfile), uvicorn : uvicorn http_server:app")
+    parser.add_argument("--cmd", help="commande de lancement, {port} est substitué (remplace --entry)")
+    args = parser.parse_args()
+    python = shlex.quote(sys.executable)
+    cmd = args.cmd or {
+        "script": f"{python} http_server.py",
+        "uvicorn": f"{python} -m uvicorn http_server:app --host 127.0.0.1 --port {{port}}",
+    }[args.entry]
+
+    timings, warm = [], []
+    print(f"{'essai':<8}{'/health (s)':>14}{'warm-ups (s)':>14}")
+    for run in range(1, args.runs + 1):
+        port = _free_port()
+        first, ready = _measure(shlex.split(cmd.format(port=port)), port, f"http://127.0.0.1:{port}{args.path}", args.timeout)
+        if first is None:
+            raise SystemExit(f"pas de réponse de {args.path} en {args.timeout:.0f} s")
+        timings.append(first)
+        if ready is not None:
+            warm.append(ready)
+        print(f"{run:<8}{first:>14.3f}{ready if ready is not None else float('nan'):>14.3f}")
+    median = statistics.median(timings)
+    warm_median = f"{statistics.median(warm):.3f} s" if warm else "non terminés"
+    print(f"médiane {median:.3f} s (warm-ups : {warm_median}), budget {args.budget_s:.3f} s")
+    if median > args.budget_s:
+        print("BUDGET DÉPASSÉ")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Rapport du temps d'import au démarrage (`python -X importtime`), résumé.
+
+Importe le module demandé (par défaut `http_server`, le point d'entrée uvicorn) dans un
+processus neuf avec `-X importtime`, puis affiche :
+  - le temps total d'import ;
+  - les paquets de premier niveau qui coûtent le plus (temps propre cumulé) ;
+  - les imports les plus lents, avec leur temps cumulé (dépendances comprises).
+
+`--budget-ms` fait échouer la commande (code 1) au-delà du budget, pour la CI ou un
+contrôle avant déploiement. L'environnement courant est transmis tel quel (VECTOR_BACKEND,
+USE_RERANKING, ...), le profil dépend donc de la configuration testée.
+
+Exemple :
+    python scripts/importtime.py
+    python scripts/importtime.py --module crawl4ai_mcp --top 30 --budget-ms 800
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+
+def profile(module: str) -> List[Tuple[str, int, int, int]]:
+    """(module, temps propre µs, temps cumulé µs, profondeur) pour chaque import, dans l'ordre."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (str(SRC), env.get("PYTHONPATH", "")) if p)
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        sys.stderr.write("\n".join(l for l in proc.stderr.splitlines() if not l.startswith("import time:")) + "\n")
+        raise SystemExit(f"échec de l'import de {module} (code {proc.returncode})")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="http_server", help="module à importer (depuis src/)")
+    parser.add_argument("--top", type=int, default=15, help="lignes par tableau")
+    parser.add_argument("--budget-ms", type=float, default=0.0, help="budget du temps total d'import, 0 = aucun")
+    args = parser.parse_args()
+
+    rows = profile(args.module)
+    total_ms = sum(r[1] for r in rows) / 1000
+    packages: Dict[str, int] = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        packages[name.split(".", 1)[0]] += self_us
+
+    print(f"import {args.module} : {total_ms:.0f} ms, {len(rows)} modules")
+    print(f"\n{'paquet':<32}{'ms':>10}{'%':>8}")
+    for name, self_us in sorted(packages.items(), key=lambda kv: -kv[1])[:args.top]:
+        print(f"{name:<32}{self_us / 1000:>10.1f}{100 * self_us / 1000 / total_ms:>8.1f}")
+    print(f"\n{'import le plus lent (cumulé)':<48}{'ms':>10}{'niveau':>8}")
+    for name, _, cumulative_us, depth in sorted(rows, key=lambda r: -r[2])[:args.top]:
+        print(f"{name:<48}{cumulative_us / 1000:>10.1f}{depth:>8}")
+
+    if args.budget_ms and total_ms > args.budget_ms:
+        print(f"\nBUDGET DÉPASSÉ : {total_ms:.0f} ms > {args.budget_ms:.0f} ms")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
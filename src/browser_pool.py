@@ -0,0 +1,284 @@
+"""
+Process-wide pool of warm Crawl4AI browsers.
+
+Each slot owns one started `AsyncWebCrawler`; a slot hands out up to
+`contexts_per_browser` concurrent leases. Slots are health-checked on lease and
+recycled after `max_pages` crawls or once their process tree exceeds `max_rss_mb`.
+Env:
+  - CRAWLER_POOL_SIZE: number of warm browsers (default: 2, 0 disables the pool)
+  - CRAWLER_POOL_CONTEXTS: concurrent leases per browser (default: 2)
+  - CRAWLER_POOL_MAX_PAGES: pages served before a browser is recycled (default: 200)
+  - CRAWLER_POOL_MAX_RSS_MB: RSS ceiling of a browser process tree (default: 1024)
+  - CRAWLER_POOL_ACQUIRE_TIMEOUT: seconds to wait for a free lease (default: 30)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, List, Optional, Set
+
+if TYPE_CHECKING:
+    from crawl4ai import AsyncWebCrawler, BrowserConfig
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = int(os.getenv("CRAWLER_POOL_SIZE", "2"))
+CONTEXTS_PER_BROWSER = int(os.getenv("CRAWLER_POOL_CONTEXTS", "2"))
+MAX_PAGES_PER_BROWSER = int(os.getenv("CRAWLER_POOL_MAX_PAGES", "200"))
+MAX_RSS_MB = int(os.getenv("CRAWLER_POOL_MAX_RSS_MB", "1024"))
+ACQUIRE_TIMEOUT = float(os.getenv("CRAWLER_POOL_ACQUIRE_TIMEOUT", "30"))
+
+
+def _child_pids() -> Set[int]:
+    try:
+        import psutil  # type: ignore
+        return {p.pid for p in psutil.Process().children(recursive=True)}
+    except Exception:
+        return set()
+
+
+def _tree_rss_mb(root_pids: Set[int]) -> float:
+    """Sum RSS of the given processes and all their descendants, in MB."""
+    if not root_pids:
+        return 0.0
+    try:
+        import psutil  # type: ignore
+    except Exception:
+        return 0.0
+    seen: Set[int] = set()
+    total = 0
+    for pid in root_pids:
+        try:
+            proc = psutil.Process(pid)
+            procs = [proc] + proc.children(recursive=True)
+        except Exception:
+            continue
+        for p in procs:
+            if p.pid in seen:
+                continue
+            seen.add(p.pid)
+            try:
+                total += p.memory_info().rss
+            except Exception:
+                pass
+    return total / (1024 * 1024)
+
+
+class _Slot:
+    """One warm browser and its bookkeeping."""
+
+    def __init__(self, slot_id: int, crawler: AsyncWebCrawler, pids: Set[int]):
+        self.slot_id = slot_id
+        self.crawler = crawler
+        self.pids = pids
+        self.pages = 0
+        self.active = 0
+        self.retiring = False
+        self.retire_reason = ""
+        self.started_at = time.monotonic()
+
+    def is_healthy(self) -> bool:
+        strategy = getattr(self.crawler, "crawler_strategy", None)
+        manager = getattr(strategy, "browser_manager", None)
+        browser = getattr(manager, "browser", None)
+        if browser is None or not hasattr(browser, "is_connected"):
+            # Managed/CDP setups may not expose the browser handle; assume healthy
+            return True
+        try:
+            return bool(browser.is_connected())
+        except Exception:
+            return False
+
+
+class BrowserPool:
+    """Lease warm `AsyncWebCrawler` instances instead of launching one per request."""
+
+    def __init__(
+        self,
+        config_factory: Callable[[], BrowserConfig],
+        *,
+        size: int = POOL_SIZE,
+        contexts_per_browser: int = CONTEXTS_PER_BROWSER,
+        max_pages: int = MAX_PAGES_PER_BROWSER,
+        max_rss_mb: int = MAX_RSS_MB,
+        acquire_timeout: float = ACQUIRE_TIMEOUT,
+    ):
+        self._config_factory = config_factory
+        self.size = max(0, size)
+        self.contexts_per_browser = max(1, contexts_per_browser)
+        self.max_pages = max_pages
+        self.max_rss_mb = max_rss_mb
+        self.acquire_timeout = acquire_timeout
+        self._tokens: "asyncio.Queue[_Slot]" = asyncio.Queue()
+        self._slots: Dict[int, _Slot] = {}
+        self._next_id = 0
+        self._spawn_lock = asyncio.Lock()
+        self._bg_tasks: Set["asyncio.Task[Any]"] = set()
+        self._closed = False
+        self.recycled = 0
+        self.leases = 0
+
+    async def _spawn(self) -> _Slot:
+        from crawl4ai import AsyncWebCrawler
+
+        # Launches are serialized so the new child pids can be attributed to this slot
+        async with self._spawn_lock:
+            before = _child_pids()
+            crawler = AsyncWebCrawler(config=self._config_factory())
+            await crawler.__aenter__()
+            pids = _child_pids() - before
+            slot = _Slot(self._next_id, crawler, pids)
+            self._next_id += 1
+        self._slots[slot.slot_id] = slot
+        for _ in range(self.contexts_per_browser):
+            self._tokens.put_nowait(slot)
+        logger.info("BrowserPool: slot %s started (pids=%s)", slot.slot_id, sorted(pids))
+        return slot
+
+    async def start(self) -> None:
+        for _ in range(self.size):
+            try:
+                await self._spawn()
+            except Exception as e:
+                logger.warning(f"BrowserPool: unable to start browser: {e}")
+        logger.info("BrowserPool: %s/%s browsers warm", len(self._slots), self.size)
+
+    async def _close_slot(self, slot: _Slot) -> None:
+        self._slots.pop(slot.slot_id, None)
+        try:
+            await slot.crawler.__aexit__(None, None, None)
+        except Exception as e:
+            logger.warning(f"BrowserPool: error closing slot {slot.slot_id}: {e}")
+
+    async def _recycle(self, slot: _Slot, reason: str) -> None:
+        logger.info("BrowserPool: recycling slot %s (%s, pages=%s)", slot.slot_id, reason, slot.pages)
+        self.recycled += 1
+        await self._close_slot(slot)
+        if self._closed:
+            return
+        delay = 1.0
+        for attempt in range(3):
+            try:
+                await self._spawn()
+                return
+            except Exception as e:
+                logger.warning(f"BrowserPool: respawn failed (attempt {attempt + 1}/3): {e}")
+                await asyncio.sleep(delay)
+                delay *= 2
+
+    def _schedule_recycle(self, slot: _Slot, reason: str) -> None:
+        task = asyncio.create_task(self._recycle(slot, reason))
+        self._bg_tasks.add(task)
+        task.add_done_callback(self._bg_tasks.discard)
+
+    def _retire(self, slot: _Slot, reason: str) -> None:
+        if slot.retiring:
+            return
+        slot.retiring = True
+        slot.retire_reason = reason
+        if slot.active == 0:
+            self._schedule_recycle(slot, reason)
+
+    async def _acquire(self) -> _Slot:
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise asyncio.TimeoutError("BrowserPool: no browser available")
+            slot = await asyncio.wait_for(self._tokens.get(), timeout=remaining)
+            if slot.retiring:
+                # Stale token from a browser being recycled; its replacement brings new tokens
+                continue
+            if not slot.is_healthy():
+                self._retire(slot, "unhealthy")
+                continue
+            slot.active += 1
+            self.leases += 1
+            return slot
+
+    def _release(self, slot: _Slot) -> None:
+        slot.active -= 1
+        slot.pages += 1
+        if slot.retiring:
+            # Retired while leased: the last lease out triggers the recycle
+            if slot.active == 0:
+                self._schedule_recycle(slot, slot.retire_reason)
+            return
+        if self.max_pages and slot.pages >= self.max_pages:
+            self._retire(slot, "max_pages")
+        elif self.max_rss_mb and _tree_rss_mb(slot.pids) > self.max_rss_mb:
+            self._retire(slot, "max_rss")
+        else:
+            self._tokens.put_nowait(slot)
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[AsyncWebCrawler]:
+        """Borrow a warm crawler for the duration of the block."""
+        slot = await self._acquire()
+        try:
+            yield slot.crawler
+        except Exception:
+            if not slot.is_healthy():
+                self._retire(slot, "crashed")
+            raise
+        finally:
+            self._release(slot)
+
+    @property
+    def available(self) -> bool:
+        return not self._closed and bool(self._slots)
+
+    def stats(self) -> Dict[str, Any]:
+        slots: List[Dict[str, Any]] = []
+        for s in self._slots.values():
+            slots.append({
+                "id": s.slot_id,
+                "pages": s.pages,
+                "active": s.active,
+                "retiring": s.retiring,
+                "rss_mb": round(_tree_rss_mb(s.pids), 1),
+            })
+        return {
+            "size": self.size,
+            "contexts_per_browser": self.contexts_per_browser,
+            "warm": len(self._slots),
+            "leases": self.leases,
+            "recycled": self.recycled,
+            "slots": slots,
+        }
+
+    async def close(self) -> None:
+        self._closed = True
+        for task in list(self._bg_tasks):
+            task.cancel()
+        for slot in list(self._slots.values()):
+            await self._close_slot(slot)
+        logger.info("BrowserPool: closed")
+
+
+_pool: Optional[BrowserPool] = None
+
+
+def get_pool() -> Optional[BrowserPool]:
+    return _pool
+
+
+async def start_pool(config_factory: Callable[[], BrowserConfig]) -> Optional[BrowserPool]:
+    """Create and warm the process-wide pool (no-op when CRAWLER_POOL_SIZE=0)."""
+    global _pool
+    if _pool is not None or POOL_SIZE <= 0:
+        return _pool
+    _pool = BrowserPool(config_factory)
+    await _pool.start()
+    return _pool
+
+
+async def stop_pool() -> None:
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
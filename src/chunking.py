@@ -1,29 +1,264 @@
-from typing import List, Dict
+"""
+Single-pass, token-aware markdown chunker.
+
+Lines are read once and grouped into blocks (heading, paragraph, fenced code,
+table); blocks are packed into chunks up to a token budget, estimated from the
+character count. Fenced code blocks and tables are never cut in the middle: a
+block larger than the budget is split on line boundaries, re-opening the fence or
+repeating the table header in every piece. When a chunk is full it ends at its last
+heading if that leaves at least `min_tokens` before it, so sections are packed
+together without being cut needlessly. Chunks may repeat trailing blocks of the
+previous chunk (`overlap_tokens`, never across a heading) and carry the heading
+path they start under.
+Env:
+  - CHUNK_MAX_TOKENS: token budget of a chunk (default: 512)
+  - CHUNK_MIN_TOKENS: a full chunk is only cut back to its last heading past this size (default: 128)
+  - CHUNK_OVERLAP_TOKENS: trailing tokens repeated at the start of the next chunk (default: 0)
+  - CHUNK_CHARS_PER_TOKEN: characters per token of the estimate (default: 4)
+"""
+
+from __future__ import annotations
+
+import operator
+import os
 import re
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "512"))
+MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "128"))
+OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "0"))
+CHARS_PER_TOKEN = float(os.getenv("CHUNK_CHARS_PER_TOKEN", "4"))
+
+_HEADING_RE = re.compile(r" {0,3}(#{1,6})(?:[ \t]+(.*?))?[ \t#]*$")
+_FENCE_RE = re.compile(r" {0,3}(`{3,}|~{3,})")
+_SETEXT_RE = re.compile(r" {0,3}(=+|-+)[ \t]*$")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+# First characters of a line that may start something other than paragraph text ("" is a blank line)
+_MARKERS = frozenset(("", "|", "`", "~", "#", "=", "-"))
+_RSTRIP_EOL = operator.methodcaller("rstrip", "\r\n")
+
+# Block kinds
+HEADING, PARAGRAPH, CODE, TABLE = "heading", "paragraph", "code", "table"
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast token estimate: characters / CHUNK_CHARS_PER_TOKEN (no tokenizer call)."""
+    return int(len(text) / CHARS_PER_TOKEN) + 1
 
-# Simple header/size-aware chunker
 
-def split_into_chunks(text: str, max_chars: int = 2000, min_chars: int = 500) -> List[Dict]:
+class _Block:
+    __slots__ = ("kind", "lines", "path", "text", "tokens")
+
+    def __init__(self, kind: str, lines: List[str], path: Tuple[str, ...]):
+        self.kind = kind
+        self.lines = lines
+        self.path = path
+        self.text = "\n".join(lines)
+        self.tokens = int(len(self.text) / CHARS_PER_TOKEN) + 1
+
+
+def _lines(source: Union[str, Iterable[str]]) -> Iterable[str]:
+    """Lines without their line break: a whole document is split at once, other sources
+    (an open file, ...) are read one line at a time."""
+    if not isinstance(source, str):
+        return map(_RSTRIP_EOL, source)
+    lines = source.split("\n")
+    if not lines[-1]:
+        lines.pop()
+    return [line.rstrip("\r") for line in lines] if "\r" in source else lines
+
+
+def iter_blocks(source: Union[str, Iterable[str]]) -> Iterator[_Block]:
+    """Group markdown (a whole document, or its lines) into blocks in one pass, tracking
+    the heading path."""
+    path: List[Tuple[int, str]] = []
+    para: List[str] = []
+    table: List[str] = []
+    fence: Optional[str] = None
+    code: List[str] = []
+    section: Tuple[str, ...] = ()
+
+    def enter(level: int, title: str) -> None:
+        nonlocal section
+        while path and path[-1][0] >= level:
+            path.pop()
+        path.append((level, f"{'#' * level} {title}"))
+        section = tuple(label for _, label in path)
+
+    for line in _lines(source):
+        if fence is not None:
+            code.append(line)
+            if fence[0] in line:
+                stripped = line.strip()
+                if stripped.startswith(fence) and not stripped.strip(fence[0]):
+                    yield _Block(CODE, code, section)
+                    fence, code = None, []
+            continue
+        # Regexes only run on lines whose first character can open a fence or heading
+        first = line[:1]
+        if first.isspace():
+            first = line.lstrip()[:1]
+        if first not in _MARKERS:
+            # Plain paragraph text, most lines
+            if table:
+                yield _Block(TABLE, table, section)
+                table = []
+            para.append(line)
+            continue
+        if table and first != "|":
+            yield _Block(TABLE, table, section)
+            table = []
+        if not first or first == "|":
+            if para:
+                yield _Block(PARAGRAPH, para, section)
+                para = []
+            if first:
+                table.append(line)
+            continue
+        if first in "`~":
+            opening = _FENCE_RE.match(line)
+            if opening:
+                if para:
+                    yield _Block(PARAGRAPH, para, section)
+                    para = []
+                fence, code = opening.group(1), [line]
+                continue
+        elif first == "#":
+            heading = _HEADING_RE.match(line)
+            if heading:
+                if para:
+                    yield _Block(PARAGRAPH, para, section)
+                    para = []
+                enter(len(heading.group(1)), (heading.group(2) or "").strip())
+                yield _Block(HEADING, [line], section)
+                continue
+        elif first in "=-" and len(para) == 1:
+            setext = _SETEXT_RE.match(line)
+            if setext:
+                # "Title\n=====" (level 1) / "Title\n-----" (level 2)
+                enter(1 if setext.group(1)[0] == "=" else 2, para[0].strip())
+                yield _Block(HEADING, [para[0], line], section)
+                para = []
+                continue
+        para.append(line)
+    if para:
+        yield _Block(PARAGRAPH, para, section)
+    if table:
+        yield _Block(TABLE, table, section)
+    if fence is not None:
+        # Unterminated fence: keep the code, close it so the chunk stays valid markdown
+        yield _Block(CODE, code + [fence], section)
+
+
+def _pieces(block: _Block, max_tokens: int) -> Iterator[_Block]:
+    """Split a block larger than `max_tokens` on line (then sentence) boundaries; code
+    pieces re-open the fence, table pieces repeat the header rows."""
+    if block.tokens <= max_tokens:
+        yield block
+        return
+    if block.kind == CODE:
+        head, body, tail = block.lines[:1], block.lines[1:-1], block.lines[-1:]
+    elif block.kind == TABLE:
+        split = 2 if len(block.lines) > 2 and set(block.lines[1].replace("|", "").strip()) <= set("-: ") else 1
+        head, body, tail = block.lines[:split], block.lines[split:], []
+    else:
+        head, body, tail = [], block.lines, []
+    fixed = estimate_tokens("\n".join(head + tail))
+    budget = max(1, max_tokens - fixed)
+    piece: List[str] = []
+    size = 0
+    for line in body:
+        parts = [line]
+        if estimate_tokens(line) > budget:
+            if block.kind == PARAGRAPH:
+                parts = _SENTENCE_RE.split(line)
+            # Still too long (minified code, no punctuation): hard split
+            limit = int(budget * CHARS_PER_TOKEN)
+            parts = [p[i:i + limit] for p in parts for i in range(0, len(p), limit)] or [""]
+        for part in parts:
+            cost = estimate_tokens(part)
+            if piece and size + cost > budget:
+                yield _Block(block.kind, head + piece + tail, block.path)
+                piece, size = [], 0
+            piece.append(part)
+            size += cost
+    if piece or not body:
+        yield _Block(block.kind, head + piece + tail, block.path)
+
+
+def iter_chunks(
+    source: Union[str, Iterable[str]],
+    max_tokens: int = MAX_TOKENS,
+    min_tokens: int = MIN_TOKENS,
+    overlap_tokens: int = OVERLAP_TOKENS,
+) -> Iterator[Dict]:
+    """Stream chunks from markdown, a whole document or its lines (an open file, ...):
+    {"chunk_number", "content", "header_path", "tokens"}."""
+    max_tokens = max(1, max_tokens)
+    # Overlap past half the budget would leave too little room for new content
+    overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2))
+    current: List[_Block] = []
+    size = 0
+    fresh = 0  # blocks of `current` not carried over from the previous chunk
+    cut = 0  # index of the last heading in `current` that may end the chunk
+    cut_size = 0  # tokens before it
+    number = 0
+
+    def emit(blocks: List[_Block], tokens: int) -> Dict:
+        nonlocal number
+        chunk = {
+            "chunk_number": number,
+            "content": "\n\n".join(b.text for b in blocks),
+            "header_path": list(blocks[0].path),
+            "tokens": tokens,
+        }
+        number += 1
+        return chunk
+
+    def carry() -> Tuple[List[_Block], int]:
+        kept: List[_Block] = []
+        total = 0
+        for b in reversed(current):
+            if b.kind == HEADING or total + b.tokens > overlap_tokens:
+                break
+            kept.append(b)
+            total += b.tokens
+        kept.reverse()
+        return kept, total
+
+    for block in iter_blocks(source):
+        if block.kind == HEADING:
+            if not fresh:
+                # Overlap does not cross into a new section
+                current, size = [], 0
+            elif size >= min_tokens:
+                cut, cut_size = len(current), size
+        # Only blocks over the budget go through _pieces
+        for piece in (block,) if block.tokens <= max_tokens else _pieces(block, max_tokens):
+            if fresh and size + piece.tokens > max_tokens and cut:
+                # Prefer ending the chunk at the last section boundary
+                yield emit(current[:cut], cut_size)
+                current, size = current[cut:], size - cut_size
+                fresh, cut = len(current), 0
+            if fresh and size + piece.tokens > max_tokens:
+                yield emit(current, size)
+                current, size = carry()
+                fresh, cut = 0, 0
+            if not fresh and size + piece.tokens > max_tokens:
+                current, size = [], 0
+            current.append(piece)
+            size += piece.tokens
+            fresh += 1
+    if fresh:
+        yield emit(current, size)
+
+
+def split_into_chunks(
+    text: str,
+    max_tokens: int = MAX_TOKENS,
+    min_tokens: int = MIN_TOKENS,
+    overlap_tokens: int = OVERLAP_TOKENS,
+) -> List[Dict]:
     if not text:
         return []
-    # Split by headings to preserve structure
-    sections = re.split(r"\n(?=#+\s)|\n(?=\w+\n[-=]{3,}\n)", text)
-    chunks: List[Dict] = []
-    buf = []
-    size = 0
-    idx = 0
-    for sec in sections:
-        s = sec.strip()
-        if not s:
-            continue
-        if size + len(s) + 1 > max_chars and size >= min_chars:
-            chunks.append({"chunk_number": len(chunks), "content": "\n".join(buf)})
-            buf = [s]
-            size = len(s)
-        else:
-            buf.append(s)
-            size += len(s) + 1
-        idx += 1
-    if buf:
-        chunks.append({"chunk_number": len(chunks), "content": "\n".join(buf)})
-    return chunks
+    return list(iter_chunks(text, max_tokens, min_tokens, overlap_tokens))
@@ -0,0 +1,139 @@
+"""
+Single-pass fenced code block extractor for markdown.
+
+Fence lines (``` or ~~~, any indentation) are located with `str.find` on the fence
+literal, never with a per-line regex, and the scan only moves forward: after an
+opening fence only the closing character is searched for. Pairing follows the
+CommonMark rules: a fence is closed by a line of the same character, at least as
+long, with nothing else on it, and fence-like lines inside a block are code. Blocks
+are yielded as offsets into the document (`CodeSpan`); the code and its context are
+only sliced when asked for, so blocks below `min_length` cost no string copies.
+Fences indented inside list items are supported: their content is dedented by the
+fence's indentation. An unterminated fence runs to the end of the document.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+CONTEXT_CHARS = 1000
+
+
+class CodeSpan:
+    """A fenced code block of `text`, as offsets; string properties slice on access."""
+
+    __slots__ = ("text", "start", "end", "code_start", "code_end", "indent", "info")
+
+    def __init__(self, text: str, start: int, end: int, code_start: int, code_end: int, indent: int, info: str):
+        self.text = text
+        self.start = start  # first character of the opening fence line
+        self.end = end  # end of the closing fence line (len(text) when unterminated)
+        self.code_start = code_start
+        self.code_end = code_end
+        self.indent = indent
+        self.info = info
+
+    @property
+    def language(self) -> str:
+        word = self.info.split(None, 1)[0] if self.info else ""
+        return word if len(word) < 20 else ""
+
+    @property
+    def max_length(self) -> int:
+        """Upper bound of `len(code)`, without slicing."""
+        return self.code_end - self.code_start
+
+    @property
+    def code(self) -> str:
+        body = self.text[self.code_start:self.code_end]
+        if self.indent:
+            body = "\n".join(_dedent(line, self.indent) for line in body.split("\n"))
+        return body.strip()
+
+    def context_before(self, chars: int = CONTEXT_CHARS) -> str:
+        return self.text[max(0, self.start - chars):self.start].strip()
+
+    def context_after(self, chars: int = CONTEXT_CHARS) -> str:
+        return self.text[self.end:self.end + chars].strip()
+
+
+def _dedent(line: str, indent: int) -> str:
+    i = 0
+    while i < indent and i < len(line) and line[i] in " \t":
+        i += 1
+    return line[i:]
+
+
+def _fence_line(text: str, char: str, pos: int, opening: bool) -> Optional[Tuple[int, int, int, int, int]]:
+    """The next line from `pos` whose first non-blank characters are a run of 3+ `char`:
+    (line start, indent width, run length, info start, line end), or None.
+
+    For an opening fence, a backtick info string cannot contain backticks (```inline```
+    is not a fence); a closing fence must have nothing after the run."""
+    fence = char * 3
+    pos = text.find(fence, pos)
+    while pos != -1:
+        line_start = text.rfind("\n", 0, pos) + 1
+        line_end = text.find("\n", pos)
+        if line_end == -1:
+            line_end = len(text)
+        if line_start == pos or text[line_start:pos].isspace():
+            run_end = pos + 3
+            while run_end < line_end and text[run_end] == char:
+                run_end += 1
+            rest = text[run_end:line_end]
+            if (not rest.strip()) if not opening else (char == "~" or "`" not in rest):
+                return line_start, len(text[line_start:pos].expandtabs(4)), run_end - pos, run_end, line_end
+        pos = text.find(fence, line_end)
+    return None
+
+
+def iter_code_spans(text: str) -> Iterator[CodeSpan]:
+    """Fenced code blocks of `text` in document order."""
+    n = len(text)
+    # Next candidate opener per fence character, refreshed only once the scan passes it,
+    # so a document without any ~~~ is searched for it once, not once per block
+    backtick = _fence_line(text, "`", 0, True)
+    tilde = _fence_line(text, "~", 0, True)
+    while backtick is not None or tilde is not None:
+        if tilde is None or (backtick is not None and backtick[0] < tilde[0]):
+            char, (start, indent, length, info_start, line_end) = "`", backtick
+        else:
+            char, (start, indent, length, info_start, line_end) = "~", tilde
+        code_start = min(line_end + 1, n)
+        # Only a line of the same character, at least as long, with nothing after it closes
+        # the block; any other fence-like line inside is code
+        end = code_end = n
+        closing = _fence_line(text, char, code_start, False)
+        while closing is not None and closing[2] < length:
+            closing = _fence_line(text, char, closing[4], False)
+        if closing is not None:
+            end, code_end = closing[4], max(code_start, closing[0] - 1)
+        yield CodeSpan(text, start, end, code_start, code_end, indent, text[info_start:line_end].strip())
+        if end >= n:
+            return
+        if backtick is not None and backtick[0] < end:
+            backtick = _fence_line(text, "`", end, True)
+        if tilde is not None and tilde[0] < end:
+            tilde = _fence_line(text, "~", end, True)
+
+
+def extract_code_blocks(markdown_content: str, min_length: int = 1000) -> List[Dict[str, Any]]:
+    """Code blocks of at least `min_length` characters with their surrounding context:
+    [{code, language, context_before, context_after, full_context}]."""
+    blocks: List[Dict[str, Any]] = []
+    for span in iter_code_spans(markdown_content):
+        if span.max_length < min_length:
+            continue
+        code = span.code
+        if len(code) < min_length:
+            continue
+        before, after = span.context_before(), span.context_after()
+        blocks.append({
+            "code": code,
+            "language": span.language,
+            "context_before": before,
+            "context_after": after,
+            "full_context": f"{before}\n\n{code}\n\n{after}",
+        })
+    return blocks
@@ -0,0 +1,324 @@
+"""
+Pipelined ingester for the `code_examples` table.
+
+Examples flow through three concurrent stages connected by asyncio queues:
+summaries (chat completions, generated in parallel for examples that have none),
+embeddings (texts batched across URLs, several batches in flight) and persistence
+(bulk upserts on the table's unique (url, chunk_number) key, so a retried batch
+is idempotent). Rows previously stored for the URLs are removed by one bulk
+delete over the URL set, started right away and awaited before the first upsert.
+Blocking calls (Supabase client, embedding function) run in threads; failed
+calls are retried with exponential backoff and full jitter without blocking the
+event loop.
+Env:
+  - CODE_SUMMARY_CONCURRENCY: summaries generated in parallel (default: 8)
+  - CODE_EMBED_CONCURRENCY: embedding batches in flight (default: 4)
+  - CODE_PERSIST_CONCURRENCY: upsert batches in flight (default: 2)
+  - CODE_RETRIES: attempts per embedding / delete / upsert call (default: 3)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+from urllib.parse import urlparse
+
+import contextualizer
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_CONCURRENCY = max(1, int(os.getenv("CODE_SUMMARY_CONCURRENCY", "8")))
+EMBED_CONCURRENCY = max(1, int(os.getenv("CODE_EMBED_CONCURRENCY", "4")))
+PERSIST_CONCURRENCY = max(1, int(os.getenv("CODE_PERSIST_CONCURRENCY", "2")))
+RETRIES = max(1, int(os.getenv("CODE_RETRIES", "3")))
+
+# PostgREST puts `in.(...)` filters in the URL: delete by groups of URLs
+_DELETE_URLS_PER_CALL = 50
+_DEFAULT_SUMMARY = "Code example for demonstration purposes."
+_SYSTEM = "You are a helpful assistant that provides concise code example summaries."
+_SUMMARY_PROMPT = """<context_before>
+{context_before}
+</context_before>
+
+<code_example>
+{code}
+</code_example>
+
+<context_after>
+{context_after}
+</context_after>
+
+Based on the code example and its surrounding context, provide a concise summary (2-3 sentences) that describes what this code example demonstrates and its purpose. Focus on the practical application and key concepts illustrated.
+"""
+
+T = TypeVar("T")
+_DONE = object()
+
+
+async def _retry(label: str, fn: Callable[..., T], *args: Any, attempts: int = RETRIES, base_delay: float = 0.5) -> T:
+    """`fn(*args)` in a thread, retried with exponential backoff and full jitter."""
+    for attempt in range(attempts):
+        try:
+            return await asyncio.to_thread(fn, *args)
+        except Exception as e:
+            if attempt == attempts - 1:
+                raise
+            delay = random.uniform(0, base_delay * 2 ** attempt)
+            logger.warning(f"{label} failed (attempt {attempt + 1}/{attempts}): {e}; retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+def _valid(embedding: Optional[Sequence[float]]) -> bool:
+    return bool(embedding) and any(v != 0.0 for v in embedding)  # type: ignore[union-attr]
+
+
+class CodeExampleIngester:
+    """One ingest run: `await run(...)` returns counts, per-stage seconds and examples/sec."""
+
+    def __init__(
+        self,
+        client: Any,
+        embed: Callable[[List[str]], List[List[float]]],
+        *,
+        table: str = "code_examples",
+        batch_size: int = 20,
+        model: Optional[str] = None,
+        base_url: Optional[str] = None,
+    ):
+        self.client = client
+        self.embed = embed
+        self.table = table
+        self.batch_size = max(1, batch_size)
+        self.model = model if model is not None else contextualizer.MODEL
+        self.base_url = base_url if base_url is not None else contextualizer.API_BASE
+        self.stage_seconds = {"summary": 0.0, "embed": 0.0, "persist": 0.0}
+        self.summaries_generated = 0
+        self.reembedded = 0
+        self.written = 0
+        self.failed = 0
+
+    # --- Stages ---
+
+    async def _summarize(self, chat: Any, limit: asyncio.Semaphore, code: str, before: str, after: str) -> str:
+        prompt = _SUMMARY_PROMPT.format(context_before=before[-500:], code=code[:1500], context_after=after[:500])
+        bucket = contextualizer.get_contextualizer().bucket
+        async with limit:
+            if bucket is not None:
+                await bucket.acquire()
+            t0 = time.perf_counter()
+            try:
+                response = await chat.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "system", "content": _SYSTEM}, {"role": "user", "content": prompt}],
+                    temperature=0.3,
+                    max_tokens=100,
+                )
+                return (response.choices[0].message.content or "").strip() or _DEFAULT_SUMMARY
+            except Exception as e:
+                logger.warning(f"Code example summary failed: {e}")
+                return _DEFAULT_SUMMARY
+            finally:
+                self.stage_seconds["summary"] += time.perf_counter() - t0
+
+    async def _summaries(
+        self,
+        items: List[Dict[str, Any]],
+        contexts: Sequence[Tuple[str, str]],
+        out: "asyncio.Queue[Any]",
+    ) -> None:
+        """Feed `out` with every item, generating missing summaries concurrently (in completion order)."""
+        missing = [i for i, item in enumerate(items) if not item["summary"]]
+        for item in items:
+            if item["summary"]:
+                await out.put(item)
+        chat = None
+        if missing:
+            try:
+                chat = contextualizer.chat_client(self.base_url)
+            except Exception as e:
+                logger.warning(f"Code example summaries disabled: {e}")
+                for i in missing:
+                    items[i]["summary"] = _DEFAULT_SUMMARY
+                    await out.put(items[i])
+        if chat is not None:
+            limit = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+
+            async def one(i: int) -> None:
+                before, after = contexts[i] if i < len(contexts) else ("", "")
+                items[i]["summary"] = await self._summarize(chat, limit, items[i]["content"], before, after)
+                self.summaries_generated += 1
+                await out.put(items[i])
+
+            try:
+                await asyncio.gather(*(one(i) for i in missing))
+            finally:
+                await chat.close()
+        await out.put(_DONE)
+
+    async def _embed_batch(self, batch: List[Dict[str, Any]], limit: asyncio.Semaphore, out: "asyncio.Queue[Any]") -> None:
+        texts = [f"{item['content']}\n\nSummary: {item['summary']}" for item in batch]
+        async with limit:
+            t0 = time.perf_counter()
+            try:
+                embeddings = await _retry("Code example embedding", self.embed, texts)
+                # Zero vectors are the embedder's failure placeholder: retry those together once
+                invalid = [j for j, e in enumerate(embeddings) if not _valid(e)]
+                if invalid:
+                    retried = await _retry("Code example re-embedding", self.embed, [texts[j] for j in invalid])
+                    for j, embedding in zip(invalid, retried):
+                        embeddings[j] = embedding
+                    self.reembedded += len(invalid)
+            except Exception as e:
+                logger.error(f"Embedding {len(batch)} code examples failed: {e}")
+                self.failed += len(batch)
+                return
+            finally:
+                self.stage_seconds["embed"] += time.perf_counter() - t0
+        for item, embedding in zip(batch, embeddings):
+            if _valid(embedding):
+                item["embedding"] = embedding
+                await out.put(item)
+            else:
+                self.failed += 1
+
+    async def _embeddings(self, inbox: "asyncio.Queue[Any]", out: "asyncio.Queue[Any]") -> None:
+        """Group items into embedding batches across URLs, several batches in flight."""
+        limit = asyncio.Semaphore(EMBED_CONCURRENCY)
+        tasks: List["asyncio.Task[None]"] = []
+        batch: List[Dict[str, Any]] = []
+        while True:
+            item = await inbox.get()
+            if item is not _DONE:
+                batch.append(item)
+            if batch and (item is _DONE or len(batch) >= self.batch_size):
+                tasks.append(asyncio.create_task(self._embed_batch(batch, limit, out)))
+                batch = []
+            if item is _DONE:
+                break
+        await asyncio.gather(*tasks)
+        await out.put(_DONE)
+
+    def _delete_urls(self, urls: List[str]) -> None:
+        self.client.table(self.table).delete().in_("url", urls).execute()
+
+    def _upsert(self, rows: List[Dict[str, Any]]) -> None:
+        self.client.table(self.table).upsert(rows, on_conflict="url,chunk_number").execute()
+
+    async def _persist_batch(
+        self, rows: List[Dict[str, Any]], limit: asyncio.Semaphore, deleted: "asyncio.Task[None]"
+    ) -> None:
+        # Old rows of these URLs must be gone before new ones land, or the delete would remove them
+        await deleted
+        async with limit:
+            t0 = time.perf_counter()
+            try:
+                await _retry("Code example upsert", self._upsert, rows)
+                self.written += len(rows)
+            except Exception as e:
+                logger.error(f"Upserting {len(rows)} code examples failed: {e}")
+                self.failed += len(rows)
+            finally:
+                self.stage_seconds["persist"] += time.perf_counter() - t0
+
+    async def _persistence(self, inbox: "asyncio.Queue[Any]", deleted: "asyncio.Task[None]") -> None:
+        limit = asyncio.Semaphore(PERSIST_CONCURRENCY)
+        tasks: List["asyncio.Task[None]"] = []
+        rows: List[Dict[str, Any]] = []
+        while True:
+            item = await inbox.get()
+            if item is not _DONE:
+                rows.append(item)
+            if rows and (item is _DONE or len(rows) >= self.batch_size):
+                tasks.append(asyncio.create_task(self._persist_batch(rows, limit, deleted)))
+                rows = []
+            if item is _DONE:
+                break
+        await asyncio.gather(*tasks)
+
+    async def _delete(self, urls: List[str]) -> None:
+        for i in range(0, len(urls), _DELETE_URLS_PER_CALL):
+            group = urls[i:i + _DELETE_URLS_PER_CALL]
+            try:
+                await _retry("Code example delete", self._delete_urls, group)
+            except Exception as e:
+                # Upserts still replace rows with the same (url, chunk_number)
+                logger.error(f"Deleting previous code examples of {len(group)} URLs failed: {e}")
+
+    # --- Run ---
+
+    async def run(
+        self,
+        urls: Sequence[str],
+        chunk_numbers: Sequence[int],
+        code_examples: Sequence[str],
+        summaries: Optional[Sequence[str]],
+        metadatas: Sequence[Dict[str, Any]],
+        contexts: Optional[Sequence[Tuple[str, str]]] = None,
+    ) -> Dict[str, Any]:
+        started = time.perf_counter()
+        items: List[Dict[str, Any]] = []
+        for i, url in enumerate(urls):
+            parsed = urlparse(url)
+            items.append({
+                "url": url,
+                "chunk_number": chunk_numbers[i],
+                "content": code_examples[i],
+                "summary": (summaries[i] if summaries is not None and i < len(summaries) else "") or "",
+                "metadata": dict(metadatas[i]) if i < len(metadatas) else {},
+                "source_id": parsed.netloc or parsed.path,
+            })
+        deleted = asyncio.create_task(self._delete(list(dict.fromkeys(urls))))
+        to_embed: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=self.batch_size * EMBED_CONCURRENCY * 2)
+        to_persist: "asyncio.Queue[Any]" = asyncio.Queue(maxsize=self.batch_size * PERSIST_CONCURRENCY * 2)
+        try:
+            await asyncio.gather(
+                self._summaries(items, contexts or (), to_embed),
+                self._embeddings(to_embed, to_persist),
+                self._persistence(to_persist, deleted),
+            )
+        finally:
+            await deleted
+        elapsed = time.perf_counter() - started
+        return {
+            "examples": len(items),
+            "written": self.written,
+            "failed": self.failed,
+            "summaries_generated": self.summaries_generated,
+            "reembedded": self.reembedded,
+            "seconds": round(elapsed, 3),
+            "examples_per_sec": round(len(items) / elapsed, 1) if elapsed > 0 else 0.0,
+            "stage_seconds": {k: round(v, 3) for k, v in self.stage_seconds.items()},
+        }
+
+
+def ingest_code_examples(
+    client: Any,
+    embed: Callable[[List[str]], List[List[float]]],
+    urls: Sequence[str],
+    chunk_numbers: Sequence[int],
+    code_examples: Sequence[str],
+    summaries: Optional[Sequence[str]],
+    metadatas: Sequence[Dict[str, Any]],
+    contexts: Optional[Sequence[Tuple[str, str]]] = None,
+    batch_size: int = 20,
+    base_url: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Synchronous entry point (runs its own event loop, in a helper thread when the
+    calling thread already runs one)."""
+
+    def run() -> Dict[str, Any]:
+        ingester = CodeExampleIngester(client, embed, batch_size=batch_size, base_url=base_url)
+        return asyncio.run(ingester.run(urls, chunk_numbers, code_examples, summaries, metadatas, contexts))
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return run()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(run).result()
@@ -0,0 +1,296 @@
+"""
+Async contextual-embedding generator (USE_CONTEXTUAL_EMBEDDINGS=true).
+
+Each chunk is prefixed with a short LLM-written context situating it in its
+document before it is embedded. Instead of resending up to 25,000 characters of
+the document with every chunk, a document summary is generated once per
+document (shared by its concurrent chunks) and each chunk prompt carries only
+that summary. The summary leads the prompt, so the chunk prompts of a document
+share a prefix that provider-side prompt caching can reuse. Requests go through
+an `AsyncOpenAI` client (any OpenAI-compatible endpoint, e.g. a local stub via
+CONTEXT_API_BASE), bounded by a concurrency limit and a token bucket. Summaries
+and chunk contexts are cached on (model, document hash, chunk hash).
+Env:
+  - USE_CONTEXTUAL_EMBEDDINGS: enable contextual embeddings (default: false)
+  - MODEL_CHOICE: chat model used for summaries and contexts
+  - CONTEXT_API_BASE: OpenAI-compatible base URL (default: OPENAI_BASE_URL or api.openai.com)
+  - CONTEXT_CONCURRENCY: chat completions in flight (default: 10)
+  - CONTEXT_RATE_LIMIT: chat completions per second, token bucket (default: 0, unlimited)
+  - CONTEXT_BURST: token bucket capacity (default: CONTEXT_CONCURRENCY)
+  - CONTEXT_DOC_CHARS: document characters sent to the summary prompt (default: 25000)
+  - CONTEXT_CACHE_SIZE: in-memory cached summaries/contexts (default: 10000, 0 disables the cache)
+  - CONTEXT_CACHE_PATH: SQLite file keeping them across restarts (default: unset, memory only)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from embedding_cache import text_digest
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("USE_CONTEXTUAL_EMBEDDINGS", "false").strip().lower() == "true"
+MODEL = os.getenv("MODEL_CHOICE", "").strip()
+API_BASE = os.getenv("CONTEXT_API_BASE", "").strip()
+CONCURRENCY = max(1, int(os.getenv("CONTEXT_CONCURRENCY", "10")))
+RATE_LIMIT = float(os.getenv("CONTEXT_RATE_LIMIT", "0"))
+BURST = int(os.getenv("CONTEXT_BURST", "0")) or CONCURRENCY
+DOC_CHARS = int(os.getenv("CONTEXT_DOC_CHARS", "25000"))
+CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", "10000"))
+CACHE_PATH = os.getenv("CONTEXT_CACHE_PATH", "").strip()
+
+_SYSTEM = "You are a helpful assistant that provides concise contextual information."
+_SUMMARY_PROMPT = """<document>
+{document}
+</document>
+Summarize this document in a few sentences: its subject, its structure and the main topics of its sections. The summary will be used to situate individual chunks of the document. Answer only with the summary."""
+_CHUNK_PROMPT = """<document_summary>
+{summary}
+</document_summary>
+Here is the chunk we want to situate within the whole document
+<chunk>
+{chunk}
+</chunk>
+Please give a short succinct context to situate this chunk within the overall document for the purposes of improving search retrieval of the chunk. Answer only with the succinct context and nothing else."""
+
+
+def chat_client(base_url: str = API_BASE) -> Any:
+    """`AsyncOpenAI` client for `base_url` (bound to the running event loop; close it after use)."""
+    import openai  # type: ignore
+
+    # A local OpenAI-compatible server usually needs no key, but the client requires one
+    api_key = os.getenv("OPENAI_API_KEY") or ("unused" if base_url else None)
+    return openai.AsyncOpenAI(base_url=base_url or None, api_key=api_key)
+
+
+class TokenBucket:
+    """`rate` acquisitions per second with bursts of up to `burst`. Thread-safe, so one
+    bucket limits every event loop (sync callers run their own loop per call)."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    async def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+                self.waited += wait
+            await asyncio.sleep(wait)
+
+
+class ContextCache:
+    """LRU of generated summaries/contexts with an optional SQLite layer. Thread-safe."""
+
+    def __init__(self, max_entries: int = CACHE_SIZE, path: str = CACHE_PATH):
+        self.max_entries = max_entries
+        self._lru: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        if path and max_entries > 0:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute("CREATE TABLE IF NOT EXISTS contexts (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+                self._db.commit()
+            except Exception as e:
+                logger.warning(f"Context cache: on-disk layer disabled ({path}): {e}")
+                self._db = None
+
+    def get(self, key: str) -> Optional[str]:
+        if self.max_entries <= 0:
+            return None
+        with self._lock:
+            value = self._lru.get(key)
+            if value is None and self._db is not None:
+                row = self._db.execute("SELECT value FROM contexts WHERE key=?", (key,)).fetchone()
+                if row is not None:
+                    value = row[0]
+                    self._remember(key, value)
+            if value is None:
+                self.misses += 1
+                return None
+            self._lru.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._remember(key, value)
+            if self._db is not None:
+                try:
+                    self._db.execute("INSERT OR REPLACE INTO contexts VALUES (?, ?)", (key, value))
+                    self._db.commit()
+                except Exception as e:
+                    logger.warning(f"Context cache: unable to persist an entry: {e}")
+
+    def _remember(self, key: str, value: str) -> None:
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._lru),
+            "max_entries": self.max_entries,
+            "persistent": self._db is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class Contextualizer:
+    def __init__(
+        self,
+        model: str = MODEL,
+        base_url: str = API_BASE,
+        concurrency: int = CONCURRENCY,
+        rate_limit: float = RATE_LIMIT,
+        burst: int = BURST,
+        doc_chars: int = DOC_CHARS,
+        cache: Optional[ContextCache] = None,
+    ):
+        self.model = model
+        self.base_url = base_url
+        self.concurrency = max(1, concurrency)
+        self.doc_chars = doc_chars
+        self.bucket = TokenBucket(rate_limit, burst) if rate_limit > 0 else None
+        self.cache = cache if cache is not None else ContextCache()
+        self.summaries = 0
+        self.contexts = 0
+        self.failures = 0
+        self.prompt_chars = 0
+
+    async def _complete(self, client: Any, limit: asyncio.Semaphore, prompt: str, max_tokens: int) -> str:
+        async with limit:
+            if self.bucket is not None:
+                await self.bucket.acquire()
+            self.prompt_chars += len(prompt)
+            response = await client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "system", "content": _SYSTEM}, {"role": "user", "content": prompt}],
+                temperature=0.3,
+                max_tokens=max_tokens,
+            )
+        return (response.choices[0].message.content or "").strip()
+
+    async def _summary(self, client: Any, limit: asyncio.Semaphore, document: str, doc_hash: str) -> str:
+        key = f"{self.model}:{doc_hash}:"
+        summary = self.cache.get(key)
+        if summary is None:
+            summary = await self._complete(
+                client, limit, _SUMMARY_PROMPT.format(document=document[: self.doc_chars]), 300
+            )
+            self.summaries += 1
+            self.cache.put(key, summary)
+        return summary
+
+    async def contextualize(self, pairs: Sequence[Tuple[str, str]]) -> List[Tuple[str, bool]]:
+        """For each (full_document, chunk): ("<context>\\n---\\n<chunk>", True), or (chunk, False)
+        when no context could be generated. Results are in input order."""
+        if not pairs:
+            return []
+        limit = asyncio.Semaphore(self.concurrency)
+        summaries: Dict[str, "asyncio.Task[str]"] = {}
+        client = None
+
+        async def one(document: str, chunk: str) -> Tuple[str, bool]:
+            nonlocal client
+            doc_hash = text_digest(document)
+            key = f"{self.model}:{doc_hash}:{text_digest(chunk)}"
+            context = self.cache.get(key)
+            if context is None:
+                try:
+                    if client is None:
+                        client = chat_client(self.base_url)
+                    summary = ""
+                    if document.strip():
+                        # One summary per document, shared by its chunks
+                        if doc_hash not in summaries:
+                            summaries[doc_hash] = asyncio.ensure_future(self._summary(client, limit, document, doc_hash))
+                        summary = await asyncio.shield(summaries[doc_hash])
+                    context = await self._complete(client, limit, _CHUNK_PROMPT.format(summary=summary, chunk=chunk), 200)
+                except Exception as e:
+                    self.failures += 1
+                    logger.warning(f"Contextual embedding failed, using the original chunk: {e}")
+                    return chunk, False
+                self.contexts += 1
+                self.cache.put(key, context)
+            return f"{context}\n---\n{chunk}", True
+
+        try:
+            return list(await asyncio.gather(*(one(doc, chunk) for doc, chunk in pairs)))
+        finally:
+            for task in summaries.values():
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # retrieved, so a failed summary is not reported twice
+            if client is not None:
+                await client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "concurrency": self.concurrency,
+            "rate_limit": self.bucket.rate if self.bucket is not None else None,
+            "rate_limited_seconds": round(self.bucket.waited, 3) if self.bucket is not None else 0.0,
+            "summaries": self.summaries,
+            "contexts": self.contexts,
+            "failures": self.failures,
+            "prompt_chars": self.prompt_chars,
+            "cache": self.cache.stats(),
+        }
+
+
+_contextualizer: Optional[Contextualizer] = None
+_contextualizer_lock = threading.Lock()
+
+
+def get_contextualizer() -> Contextualizer:
+    global _contextualizer
+    with _contextualizer_lock:
+        if _contextualizer is None:
+            _contextualizer = Contextualizer()
+        return _contextualizer
+
+
+def contextualize_sync(pairs: Sequence[Tuple[str, str]]) -> List[Tuple[str, bool]]:
+    """`Contextualizer.contextualize` for synchronous callers (runs its own event loop,
+    in a helper thread when called from a thread that already runs one)."""
+    def run() -> List[Tuple[str, bool]]:
+        return asyncio.run(get_contextualizer().contextualize(pairs))
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return run()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(run).result()
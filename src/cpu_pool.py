@@ -0,0 +1,181 @@
+"""
+Process pool for the CPU-bound stage of ingestion (chunking, hashing, per-chunk stats).
+
+Chunking a large crawl on the event loop thread (or in threads, which share the
+GIL) serializes it on one core. Here documents are sent to worker processes in
+batches, so a burst of pages is spread over every core while embedding and
+persistence stay async in the parent. Workers are shared-nothing: the task
+functions are pure functions of their arguments and only use `chunking` and
+`embedding_cache` (no database or HTTP client is used in a worker).
+
+Workers come from a fork server where the platform has one: forking the server
+process itself is unsafe once it runs threads (warm-ups, the default executor,
+the reranker, database drivers). The fork server is a fresh, single-threaded
+interpreter that preloads this module, and with it `chunking` and
+`embedding_cache`, so workers do not import them again. Like with `spawn`, each
+worker still imports the main module under `__mp_main__` (uvicorn's entry point,
+or `http_server` when started as `python src/http_server.py`).
+Env:
+  - INGEST_CPU_WORKERS: worker processes (default: CPU count; 0 runs the stage in a thread)
+  - INGEST_CPU_BATCH: documents sent to a worker in one task (default: 8)
+  - INGEST_CPU_START_METHOD: multiprocessing start method (default: forkserver, spawn where forkserver is unavailable)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from chunking import split_into_chunks
+from embedding_cache import text_digest
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("INGEST_CPU_WORKERS", str(os.cpu_count() or 1)))
+BATCH = max(1, int(os.getenv("INGEST_CPU_BATCH", "8")))
+START_METHOD = os.getenv("INGEST_CPU_START_METHOD", "").strip() or (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+_WORD_RE = re.compile(r"\w+")
+
+
+# --- Task functions (run in the worker processes) ---
+
+
+def prepare_chunks(content: str) -> List[Dict[str, Any]]:
+    """Chunk a document and compute each chunk's content hash and stats."""
+    chunks = split_into_chunks(content)
+    for ch in chunks:
+        text = ch["content"]
+        ch["content_hash"] = text_digest(text)
+        ch["char_count"] = len(text)
+        ch["word_count"] = sum(1 for _ in _WORD_RE.finditer(text))
+    return chunks
+
+
+def prepare_batch(contents: Sequence[str]) -> List[Tuple[Optional[List[Dict[str, Any]]], Optional[str], float]]:
+    """(chunks, error, seconds) per document; one bad document does not fail the batch."""
+    out: List[Tuple[Optional[List[Dict[str, Any]]], Optional[str], float]] = []
+    for content in contents:
+        t0 = time.perf_counter()
+        try:
+            out.append((prepare_chunks(content), None, time.perf_counter() - t0))
+        except Exception as e:
+            out.append((None, f"{type(e).__name__}: {e}", time.perf_counter() - t0))
+    return out
+
+
+def _warm_up(_: int) -> int:
+    return os.getpid()
+
+
+# --- Pool (parent process) ---
+
+
+class CpuPool:
+    def __init__(self, workers: int = WORKERS, start_method: str = START_METHOD):
+        self.workers = max(1, workers)
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.tasks = 0
+        self.documents = 0
+        self.cpu_seconds = 0.0
+        self.restarts = 0
+
+    def _create(self) -> ProcessPoolExecutor:
+        context = multiprocessing.get_context(self.start_method)
+        if self.start_method == "forkserver":
+            # Under the name the parent imported it as (cpu_pool or src.cpu_pool), which the
+            # pickled task functions refer to
+            context.set_forkserver_preload([__name__])
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+
+    async def start(self) -> None:
+        """Create the pool and start every worker, so the first crawl does not pay for spawning."""
+        self._executor = self._create()
+        loop = asyncio.get_running_loop()
+        t0 = time.perf_counter()
+        pids = await asyncio.gather(
+            *(loop.run_in_executor(self._executor, _warm_up, i) for i in range(self.workers))
+        )
+        logger.info(
+            f"CPU pool ready: {len(set(pids))} {self.start_method} workers in {time.perf_counter() - t0:.1f}s"
+        )
+
+    def stop(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    async def prepare(self, contents: Sequence[str]) -> List[Tuple[Optional[List[Dict[str, Any]]], Optional[str], float]]:
+        """Run `prepare_batch` on one worker; a crashed pool is replaced once and the batch retried."""
+        if self._executor is None:
+            raise RuntimeError("CPU pool is not started")
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            results = await loop.run_in_executor(executor, prepare_batch, list(contents))
+        except BrokenProcessPool as e:
+            # A worker died (OOM kill, segfault): every pending task of the pool is lost. Concurrent
+            # batches fail together; only the first one replaces the pool
+            if self._executor is executor:
+                logger.warning(f"CPU pool broken ({e}), restarting {self.workers} workers")
+                self.restarts += 1
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = self._create()
+            if self._executor is None:
+                raise
+            results = await loop.run_in_executor(self._executor, prepare_batch, list(contents))
+        self.tasks += 1
+        self.documents += len(results)
+        self.cpu_seconds += sum(r[2] for r in results)
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "start_method": self.start_method,
+            "batch": BATCH,
+            "tasks": self.tasks,
+            "documents": self.documents,
+            "cpu_seconds": round(self.cpu_seconds, 3),
+            "restarts": self.restarts,
+        }
+
+
+_pool: Optional[CpuPool] = None
+
+
+def get_cpu_pool() -> Optional[CpuPool]:
+    """The running pool, or None when INGEST_CPU_WORKERS=0 or it failed to start."""
+    return _pool
+
+
+async def start_cpu_pool() -> Optional[CpuPool]:
+    global _pool
+    if _pool is not None or WORKERS <= 0:
+        return _pool
+    pool = CpuPool()
+    try:
+        await pool.start()
+    except Exception as e:
+        logger.warning(f"CPU pool disabled, chunking runs in threads: {e}")
+        pool.stop()
+        return None
+    _pool = pool
+    return _pool
+
+
+async def stop_cpu_pool() -> None:
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await asyncio.to_thread(pool.stop)
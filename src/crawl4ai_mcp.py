@@ -7,13 +7,14 @@ Also includes AI hallucination detection and repository parsing tools using Neo4
 """
 import os
 import asyncio
+import importlib.util
 import sys
 import json
 from pathlib import Path
 from contextlib import asynccontextmanager
 from collections.abc import AsyncIterator
 from dataclasses import dataclass
-from typing import List, Dict, Any, Optional
+from typing import TYPE_CHECKING, List, Dict, Any, Optional
 from urllib.parse import urlparse, urldefrag
 from xml.etree import ElementTree
 import datetime
@@ -21,14 +22,22 @@ import datetime
 import requests
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP, Context
-from sentence_transformers import CrossEncoder
-from supabase import Client
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode, MemoryAdaptiveDispatcher
+
+# crawl4ai (Playwright), supabase and the knowledge-graph stack (neo4j) are imported where they
+# are first used, not at startup
+if TYPE_CHECKING:
+    from crawl4ai import AsyncWebCrawler
+    from supabase import Client
 
 # Add project root to sys.path to allow imports from other modules
 project_root_path = Path(__file__).resolve().parents[2]
 sys.path.append(str(project_root_path))
 
+try:
+    import reranker  # type: ignore
+except Exception:  # pragma: no cover
+    from src import reranker  # type: ignore
+
 # Add knowledge_graphs directory to sys.path
 knowledge_graphs_path = Path(__file__).resolve().parent / 'knowledge_graphs'
 if str(knowledge_graphs_path) not in sys.path:
@@ -58,28 +67,13 @@ except ImportError:
         return create_client(url, key)
     
     def smart_chunk_markdown(text: str, chunk_size: int = 5000) -> List[str]:
-        """Simple fallback chunking implementation."""
-        chunks = []
-        start = 0
-        text_length = len(text)
-        while start < text_length:
-            end = start + chunk_size
-            if end >= text_length:
-                chunks.append(text[start:].strip())
-                break
-            
-            chunk = text[start:end]
-            # Try to break at paragraph
-            if '\n\n' in chunk:
-                last_break = chunk.rfind('\n\n')
-                if last_break > chunk_size * 0.3:
-                    end = start + last_break
-            
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
-            start = end
-        return chunks
+        """Fallback chunking: the dependency-free chunker of the ingest path."""
+        try:
+            import chunking  # type: ignore
+        except ImportError:  # pragma: no cover
+            from src import chunking  # type: ignore
+        max_tokens = max(1, int(chunk_size / chunking.CHARS_PER_TOKEN))
+        return [c["content"] for c in chunking.split_into_chunks(text, max_tokens=max_tokens)]
     
     def extract_section_info(chunk: str) -> Dict[str, Any]:
         """Simple fallback for section info extraction."""
@@ -92,14 +86,10 @@ except ImportError:
             "word_count": len(chunk.split())
         }
 
-# Try to import knowledge graph modules
-try:
-    from knowledge_graphs import KnowledgeGraphValidator, AIScriptAnalyzer, HallucinationReporter
-    from knowledge_graphs.parse_repo_into_neo4j import DirectNeo4jExtractor
-    KNOWLEDGE_GRAPH_AVAILABLE = True
-except ImportError:
+# Knowledge graph modules are imported by the lifespan, only when enabled
+KNOWLEDGE_GRAPH_AVAILABLE = importlib.util.find_spec("neo4j") is not None
+if not KNOWLEDGE_GRAPH_AVAILABLE:
     print("[WARNING] Knowledge graph modules not available. Knowledge graph tools will be disabled.")
-    KNOWLEDGE_GRAPH_AVAILABLE = False
 
 # Global Settings
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
@@ -110,9 +100,9 @@ USE_KNOWLEDGE_GRAPH = os.getenv("USE_KNOWLEDGE_GRAPH", "false").lower() == "true
 @dataclass
 class Crawl4AIContext:
     """Holds all the resources initialized at startup."""
-    crawler: AsyncWebCrawler
-    supabase_client: Client
-    reranking_model: Optional[CrossEncoder] = None
+    crawler: "AsyncWebCrawler"
+    supabase_client: "Client"
+    reranker: Optional["reranker.RerankService"] = None
     knowledge_validator: Optional[Any] = None
     repo_extractor: Optional[Any] = None
 
@@ -126,19 +116,9 @@ def format_neo4j_error(error: Exception) -> str:
         return "Cannot connect to Neo4j. Check URI and ensure it's running."
     return f"Neo4j error: {str(error)}"
 
-def rerank_results(model: CrossEncoder, query: str, results: List[Dict[str, Any]], content_key: str = "content") -> List[Dict[str, Any]]:
-    """Reranks search results using a CrossEncoder model."""
-    if not model or not results:
-        return results
-    try:
-        pairs = [[query, res.get(content_key, "")] for res in results]
-        scores = model.predict(pairs)
-        for i, res in enumerate(results):
-            res["rerank_score"] = float(scores[i])
-        return sorted(results, key=lambda x: x.get("rerank_score", 0), reverse=True)
-    except Exception as e:
-        print(f"Error during reranking: {e}")
-        return results
+async def rerank_results(query: str, results: List[Dict[str, Any]], content_key: str = "content") -> List[Dict[str, Any]]:
+    """Reranks search results with the shared CrossEncoder service (batched, off the event loop)."""
+    return await reranker.rerank(query, results, content_key)
 
 def normalize_url(url: str, base_url: Optional[str] = None) -> str:
     """Normalizes a URL by resolving relative paths and removing fragments."""
@@ -154,6 +134,8 @@ async def crawl4ai_lifespan(server: FastMCP) -> AsyncIterator[Crawl4AIContext]:
     print("Initializing lifespan resources...")
     crawler = None
     try:
+        from crawl4ai import AsyncWebCrawler, BrowserConfig
+
         # Configure browser in headless mode
         browser_config = BrowserConfig(
             headless=True,
@@ -177,9 +159,8 @@ async def crawl4ai_lifespan(server: FastMCP) -> AsyncIterator[Crawl4AIContext]:
 
     supabase_client = get_supabase_client()
     
-    reranking_model = None
-    # Disable reranking for now due to permission issues
-    print("Reranking model loading is temporarily disabled due to permission issues.")
+    # Loaded and warmed up in its worker thread; None if disabled or the model cannot be loaded
+    rerank_service = await reranker.start_reranker() if USE_RERANKING else None
     
     knowledge_validator, repo_extractor = None, None
     if USE_KNOWLEDGE_GRAPH:
@@ -189,6 +170,8 @@ async def crawl4ai_lifespan(server: FastMCP) -> AsyncIterator[Crawl4AIContext]:
         if all([neo4j_uri, neo4j_user, neo4j_password]):
             try:
                 print("Initializing Neo4j components...")
+                from knowledge_graphs import KnowledgeGraphValidator
+                from knowledge_graphs.parse_repo_into_neo4j import DirectNeo4jExtractor
                 knowledge_validator = KnowledgeGraphValidator(neo4j_uri, neo4j_user, neo4j_password)
                 await knowledge_validator.initialize()
                 repo_extractor = DirectNeo4jExtractor(neo4j_uri, neo4j_user, neo4j_password)
@@ -205,7 +188,7 @@ async def crawl4ai_lifespan(server: FastMCP) -> AsyncIterator[Crawl4AIContext]:
     context = Crawl4AIContext(
         crawler=crawler,
         supabase_client=supabase_client,
-        reranking_model=reranking_model,
+        reranker=rerank_service,
         knowledge_validator=knowledge_validator,
         repo_extractor=repo_extractor
     )
@@ -224,6 +207,7 @@ async def crawl4ai_lifespan(server: FastMCP) -> AsyncIterator[Crawl4AIContext]:
                 await knowledge_validator.close()
             if repo_extractor and hasattr(repo_extractor, 'close'):
                 await repo_extractor.close()
+            await reranker.stop_reranker()
         except Exception as e:
             print(f"[WARNING] Error during resource cleanup: {str(e)}")
         print("Lifespan resources closed.")
@@ -256,7 +240,7 @@ async def health() -> Dict[str, Any]:
         "details": {
             "database": "connected" if os.getenv("SUPABASE_URL") else "disconnected",
             "knowledge_graph": "enabled" if USE_KNOWLEDGE_GRAPH else "disabled",
-            "reranking": "enabled" if USE_RERANKING else "disabled"
+            "reranking": reranker.get_reranker().stats() if reranker.get_reranker() else "disabled"
         }
     }
 
@@ -279,6 +263,7 @@ async def crawl_single_page(ctx: Context, url: str) -> str:
         supabase_client = ctx.request_context.lifespan_context.supabase_client
         
         # Configure the crawl
+        from crawl4ai import CrawlerRunConfig, CacheMode
         run_config = CrawlerRunConfig(cache_mode=CacheMode.BYPASS, stream=False)
         
         # Crawl the page
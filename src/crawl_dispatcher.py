@@ -0,0 +1,169 @@
+"""
+Memory-adaptive dispatcher for bulk crawls.
+
+Pages in flight are capped by a limit that adapts to memory pressure (additive
+increase, multiplicative decrease): each completed page raises the limit by one up
+to the maximum while memory use is under `CRAWL_MEMORY_THRESHOLD`, and halves it
+(at most once per sampling interval) above. While memory use is above
+`CRAWL_MEMORY_CRITICAL` no new page starts, except when nothing is in flight, so a
+batch always makes progress. Memory use is read from the cgroup
+(container limit) when there is one, else from psutil; without either the limit
+stays at its maximum. One dispatcher is shared by every batch of the process, as is
+the browser pool it feeds.
+Env:
+  - CRAWL_BATCH_CONCURRENCY: maximum pages in flight (default: 0, the browser pool capacity CRAWLER_POOL_SIZE x CRAWLER_POOL_CONTEXTS, or CRAWL_CONCURRENCY without a pool)
+  - CRAWL_MEMORY_THRESHOLD: memory use (%) above which the limit is halved (default: 80)
+  - CRAWL_MEMORY_CRITICAL: memory use (%) above which no new page starts (default: 90)
+  - CRAWL_MEMORY_INTERVAL: seconds between two memory samples (default: 0.5)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+import browser_pool
+import frontier
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENCY = int(os.getenv("CRAWL_BATCH_CONCURRENCY", "0"))
+MEMORY_THRESHOLD = float(os.getenv("CRAWL_MEMORY_THRESHOLD", "80"))
+MEMORY_CRITICAL = float(os.getenv("CRAWL_MEMORY_CRITICAL", "90"))
+MEMORY_INTERVAL = float(os.getenv("CRAWL_MEMORY_INTERVAL", "0.5"))
+
+
+def _read_int(path: str) -> Optional[int]:
+    try:
+        with open(path) as f:
+            value = f.read().strip()
+    except OSError:
+        return None
+    return int(value) if value.isdigit() else None
+
+
+def memory_percent() -> Optional[float]:
+    """Memory use of the container (cgroup v2, then v1) or of the host, in %; None if unknown."""
+    for limit_path, usage_path in (
+        ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current"),
+        ("/sys/fs/cgroup/memory/memory.limit_in_bytes", "/sys/fs/cgroup/memory/memory.usage_in_bytes"),
+    ):
+        limit, usage = _read_int(limit_path), _read_int(usage_path)
+        # cgroup v1 reports an unlimited group as a huge number
+        if limit and usage is not None and limit < 1 << 60:
+            return 100.0 * usage / limit
+    try:
+        import psutil  # type: ignore
+        return float(psutil.virtual_memory().percent)
+    except Exception:
+        return None
+
+
+def _default_concurrency() -> int:
+    if MAX_CONCURRENCY > 0:
+        return MAX_CONCURRENCY
+    if browser_pool.POOL_SIZE > 0:
+        return browser_pool.POOL_SIZE * max(1, browser_pool.CONTEXTS_PER_BROWSER)
+    return frontier.CRAWL_CONCURRENCY
+
+
+class MemoryAdaptiveDispatcher:
+    def __init__(
+        self,
+        max_concurrency: int = 0,
+        threshold: float = MEMORY_THRESHOLD,
+        critical: float = MEMORY_CRITICAL,
+        interval: float = MEMORY_INTERVAL,
+    ):
+        self.max_concurrency = max(1, max_concurrency or _default_concurrency())
+        self.threshold = threshold
+        self.critical = max(critical, threshold)
+        self.interval = interval
+        self.limit = self.max_concurrency
+        self.active = 0
+        self._cond = asyncio.Condition()
+        self._memory: Optional[float] = None
+        self._sampled_at = float("-inf")
+        self._decreased_at = float("-inf")
+        self.started = 0
+        self.decreases = 0
+        self.paused_s = 0.0
+
+    def _sample(self) -> Optional[float]:
+        now = time.monotonic()
+        if now - self._sampled_at >= self.interval:
+            self._memory = memory_percent()
+            self._sampled_at = now
+        return self._memory
+
+    def _may_start(self) -> bool:
+        if self.active == 0:
+            return True
+        if self.active >= self.limit:
+            return False
+        memory = self._sample()
+        return memory is None or memory < self.critical
+
+    async def acquire(self) -> None:
+        async with self._cond:
+            while not self._may_start():
+                paused = self.active < self.limit  # held back by memory, not by the limit
+                t0 = time.monotonic()
+                # Re-check memory every interval even if no page completes meanwhile
+                try:
+                    await asyncio.wait_for(self._cond.wait(), self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                if paused:
+                    self.paused_s += time.monotonic() - t0
+            self.active += 1
+            self.started += 1
+
+    async def release(self) -> None:
+        async with self._cond:
+            self.active -= 1
+            memory = self._sample()
+            now = time.monotonic()
+            if memory is not None and memory >= self.threshold:
+                if now - self._decreased_at >= self.interval and self.limit > 1:
+                    self.limit = max(1, self.limit // 2)
+                    self._decreased_at = now
+                    self.decreases += 1
+                    logger.info(f"Crawl dispatcher: memory at {memory:.0f}%, limit lowered to {self.limit}")
+            elif self.limit < self.max_concurrency:
+                self.limit += 1
+            self._cond.notify_all()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            await self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": self.limit,
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "memory_percent": None if self._memory is None else round(self._memory, 1),
+            "pages_started": self.started,
+            "limit_decreases": self.decreases,
+            "paused_s": round(self.paused_s, 3),
+        }
+
+
+_dispatcher: Optional[MemoryAdaptiveDispatcher] = None
+
+
+def get_dispatcher() -> MemoryAdaptiveDispatcher:
+    """The process-wide dispatcher, created on first use (on the serving event loop)."""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = MemoryAdaptiveDispatcher()
+    return _dispatcher
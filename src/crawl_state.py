@@ -0,0 +1,127 @@
+"""
+Per-URL crawl state used to skip unchanged pages on re-crawls.
+
+For every successfully ingested page we keep its HTTP validators (ETag,
+Last-Modified), the hash of the extracted content, the internal links found on it
+and the last crawl time. Re-crawls send a conditional request first and skip
+browser rendering on 304; pages that render to the same content hash skip ingest.
+Env:
+  - CRAWL_STATE_PATH: SQLite file holding the state (default: unset, kept in memory for the process lifetime)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STATE_PATH = os.getenv("CRAWL_STATE_PATH", "").strip()
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class PageState:
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    content_hash: Optional[str] = None
+    last_crawled: float = field(default_factory=time.time)
+    links: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_headers(cls, url: str, headers: Dict[str, Any], text: str, links: List[str]) -> "PageState":
+        lowered = {str(k).lower(): v for k, v in (headers or {}).items()}
+        return cls(
+            url=url,
+            etag=lowered.get("etag"),
+            last_modified=lowered.get("last-modified"),
+            content_hash=content_hash(text),
+            links=links,
+        )
+
+    def conditional_headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class CrawlStateStore:
+    """SQLite-backed URL -> PageState map. Thread-safe."""
+
+    def __init__(self, path: str = STATE_PATH):
+        target = path or ":memory:"
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(target, check_same_thread=False)
+        if path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS crawl_state ("
+            " url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, content_hash TEXT,"
+            " last_crawled REAL, links TEXT)"
+        )
+        self._db.commit()
+        self.durable = bool(path)
+
+    def get(self, url: str) -> Optional[PageState]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, etag, last_modified, content_hash, last_crawled, links FROM crawl_state WHERE url=?",
+                (url,),
+            ).fetchone()
+        if row is None:
+            return None
+        return PageState(
+            url=row[0], etag=row[1], last_modified=row[2], content_hash=row[3],
+            last_crawled=row[4] or 0.0, links=json.loads(row[5] or "[]"),
+        )
+
+    def record(self, state: PageState) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO crawl_state VALUES (?, ?, ?, ?, ?, ?)",
+                (state.url, state.etag, state.last_modified, state.content_hash,
+                 state.last_crawled, json.dumps(state.links)),
+            )
+            self._db.commit()
+
+    def touch(self, url: str) -> None:
+        with self._lock:
+            self._db.execute("UPDATE crawl_state SET last_crawled=? WHERE url=?", (time.time(), url))
+            self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            (count,) = self._db.execute("SELECT COUNT(*) FROM crawl_state").fetchone()
+        return {"durable": self.durable, "urls": count}
+
+
+_store: Optional[CrawlStateStore] = None
+_failed = False
+
+
+def get_store() -> Optional[CrawlStateStore]:
+    """Process-wide store, created on first use; None if it cannot be opened."""
+    global _store, _failed
+    if _store is None and not _failed:
+        try:
+            _store = CrawlStateStore()
+        except Exception as e:
+            _failed = True
+            logger.warning(f"Crawl state: store disabled ({STATE_PATH or 'memory'}): {e}")
+    return _store
@@ -0,0 +1,179 @@
+"""
+Content-addressed embedding cache shared by the ingest and query paths.
+
+Entries are keyed on (provider, model, sha256(text)). An in-process LRU holds
+float32 vectors; an optional SQLite file keeps them across restarts.
+Env:
+  - EMBEDDING_CACHE_SIZE: in-memory entries (default: 4096, 0 disables the cache)
+  - EMBEDDING_CACHE_PATH: SQLite file for the on-disk layer (default: unset, memory only)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "").strip()
+
+Key = Tuple[str, str, str]
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """Two-level (memory LRU + optional SQLite) vector cache. Thread-safe."""
+
+    def __init__(self, max_entries: int = CACHE_SIZE, path: str = CACHE_PATH):
+        self.max_entries = max_entries
+        self._lru: "OrderedDict[Key, array]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                self._db = sqlite3.connect(path, check_same_thread=False)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    " provider TEXT NOT NULL, model TEXT NOT NULL, digest TEXT NOT NULL,"
+                    " vector BLOB NOT NULL, PRIMARY KEY (provider, model, digest))"
+                )
+                self._db.commit()
+            except Exception as e:
+                logger.warning(f"Embedding cache: on-disk layer disabled ({path}): {e}")
+                self._db = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _remember(self, key: Key, vec: array) -> None:
+        self._lru[key] = vec
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def get_many(self, provider: str, model: str, digests: Sequence[str]) -> List[Optional[List[float]]]:
+        out: List[Optional[List[float]]] = [None] * len(digests)
+        missing: Dict[str, List[int]] = {}
+        with self._lock:
+            for i, d in enumerate(digests):
+                vec = self._lru.get((provider, model, d))
+                if vec is not None:
+                    self._lru.move_to_end((provider, model, d))
+                    out[i] = vec.tolist()
+                    self.hits += 1
+                else:
+                    missing.setdefault(d, []).append(i)
+            if missing and self._db is not None:
+                found = self._load(provider, model, list(missing))
+                for d, vec in found.items():
+                    self._remember((provider, model, d), vec)
+                    for i in missing.pop(d):
+                        out[i] = vec.tolist()
+                        self.disk_hits += 1
+            self.misses += sum(len(v) for v in missing.values())
+        return out
+
+    def _load(self, provider: str, model: str, digests: List[str]) -> Dict[str, array]:
+        found: Dict[str, array] = {}
+        assert self._db is not None
+        try:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(digests), 500):
+                part = digests[i:i + 500]
+                marks = ",".join("?" * len(part))
+                rows = self._db.execute(
+                    f"SELECT digest, vector FROM embeddings WHERE provider=? AND model=? AND digest IN ({marks})",
+                    (provider, model, *part),
+                ).fetchall()
+                for d, blob in rows:
+                    vec = array("f")
+                    vec.frombytes(blob)
+                    found[d] = vec
+        except Exception as e:
+            logger.warning(f"Embedding cache: disk read failed: {e}")
+        return found
+
+    def put_many(self, provider: str, model: str, digests: Sequence[str], vectors: Sequence[List[float]]) -> None:
+        rows = []
+        with self._lock:
+            for d, v in zip(digests, vectors):
+                # Never cache the zero vectors some callers return on failure
+                if not v or not any(v):
+                    continue
+                vec = array("f", v)
+                self._remember((provider, model, d), vec)
+                rows.append((provider, model, d, vec.tobytes()))
+            if rows and self._db is not None:
+                try:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO embeddings (provider, model, digest, vector) VALUES (?, ?, ?, ?)",
+                        rows,
+                    )
+                    self._db.commit()
+                except Exception as e:
+                    logger.warning(f"Embedding cache: disk write failed: {e}")
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._lru),
+            "max_entries": self.max_entries,
+            "disk": bool(self._db is not None),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+_cache = EmbeddingCache()
+
+
+def get_cache() -> EmbeddingCache:
+    return _cache
+
+
+def cached_embed(
+    provider: str,
+    model: str,
+    texts: List[str],
+    embed_fn: Callable[[List[str]], List[List[float]]],
+) -> List[List[float]]:
+    """Embed `texts`, calling `embed_fn` only for texts not already cached.
+    Duplicate texts within one call are embedded once.
+    """
+    if not texts:
+        return []
+    if not _cache.enabled:
+        return embed_fn(texts)
+    digests = [text_digest(t) for t in texts]
+    vectors = _cache.get_many(provider, model, digests)
+    todo: Dict[str, int] = {}
+    for i, (d, v) in enumerate(zip(digests, vectors)):
+        if v is None and d not in todo:
+            todo[d] = i
+    if todo:
+        fresh = embed_fn([texts[i] for i in todo.values()])
+        _cache.put_many(provider, model, list(todo), fresh)
+        by_digest = dict(zip(todo, fresh))
+        for i, d in enumerate(digests):
+            if vectors[i] is None:
+                vectors[i] = by_digest[d]
+    return vectors  # type: ignore[return-value]
@@ -1,35 +1,79 @@
+import logging
 import os
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 
+try:
+    from embedding_cache import cached_embed  # type: ignore
+except Exception:  # pragma: no cover
+    from src.embedding_cache import cached_embed  # type: ignore
+
+logger = logging.getLogger(__name__)
+
 # Enforce Ollama by default per project requirement
 _PROVIDER = os.getenv("EMBEDDING_PROVIDER", "ollama").strip().lower()
 _MODEL = os.getenv("EMBEDDING_MODEL", os.getenv("OLLAMA_EMBED_MODEL", "nomic-embed-text")).strip()
+_OPENAI_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
 _TARGET_DIM = int(os.getenv("SUPABASE_VECTOR_DIM", "1536"))
+# Texts per multi-input embed call, and how many of those calls may be in flight
+_BATCH_SIZE = max(1, int(os.getenv("EMBEDDING_BATCH_SIZE", "32")))
+_CONCURRENCY = max(1, int(os.getenv("EMBEDDING_CONCURRENCY", "4")))
 
 # Lazy imports
 _ollama = None
 _openai_client = None
 
 
-def _embed_ollama(texts: List[str]) -> List[List[float]]:
+def _ollama_client():
     global _ollama
     if _ollama is None:
         import ollama  # type: ignore
         _ollama = ollama
+    return _ollama
+
+
+def _embed_ollama_each(texts: List[str]) -> List[List[float]]:
+    client = _ollama_client()
     vectors: List[List[float]] = []
     for t in texts:
-        r = _ollama.embeddings(model=_MODEL, prompt=t)
+        r = client.embeddings(model=_MODEL, prompt=t)
         vectors.append(r["embedding"])  # type: ignore
     return vectors
 
 
+def _embed_ollama_batch(texts: List[str]) -> List[List[float]]:
+    """One round-trip to the multi-input /api/embed endpoint; per-item calls if it fails."""
+    try:
+        r = _ollama_client().embed(model=_MODEL, input=texts)
+        vectors = list(r["embeddings"])  # type: ignore
+        if len(vectors) != len(texts):
+            raise ValueError(f"expected {len(texts)} embeddings, got {len(vectors)}")
+        return vectors
+    except Exception as e:
+        logger.warning(f"Batched Ollama embed failed for {len(texts)} texts, retrying per item: {e}")
+        return _embed_ollama_each(texts)
+
+
+def _embed_ollama(texts: List[str]) -> List[List[float]]:
+    batches = [texts[i:i + _BATCH_SIZE] for i in range(0, len(texts), _BATCH_SIZE)]
+    if len(batches) == 1 or _CONCURRENCY == 1:
+        results = [_embed_ollama_batch(b) for b in batches]
+    else:
+        with ThreadPoolExecutor(max_workers=min(_CONCURRENCY, len(batches))) as ex:
+            results = list(ex.map(_embed_ollama_batch, batches))
+    vectors: List[List[float]] = []
+    for r in results:
+        vectors.extend(r)
+    return vectors
+
+
 def _embed_openai(texts: List[str]) -> List[List[float]]:
     # Optional fallback if explicitly requested via EMBEDDING_PROVIDER=openai
     global _openai_client
     if _openai_client is None:
         from openai import OpenAI
         _openai_client = OpenAI()
-    resp = _openai_client.embeddings.create(model=os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small"), input=texts)
+    resp = _openai_client.embeddings.create(model=_OPENAI_MODEL, input=texts)
     return [d.embedding for d in resp.data]
 
 
@@ -45,12 +89,18 @@ def pad_to_dim(vectors: List[List[float]], target_dim: int = _TARGET_DIM) -> Lis
     return padded
 
 
+def model_id() -> str:
+    """Provider and model the query vectors come from (cache keys that depend on them)."""
+    return f"openai:{_OPENAI_MODEL}" if _PROVIDER == "openai" else f"ollama:{_MODEL}"
+
+
 def embed_texts(texts: List[str]) -> List[List[float]]:
     if not texts:
         return []
+    # Unchanged texts (re-crawls, repeated queries) are served from the embedding cache
     if _PROVIDER == "openai":
-        vecs = _embed_openai(texts)
+        vecs = cached_embed("openai", _OPENAI_MODEL, texts, _embed_openai)
     else:
-        vecs = _embed_ollama(texts)
+        vecs = cached_embed("ollama", _MODEL, texts, _embed_ollama)
     # Return native dimension vectors; routing to the proper DB column is handled downstream
     return vecs
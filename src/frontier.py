@@ -0,0 +1,257 @@
+"""
+Crawl frontier for multi-page crawls.
+
+URLs are normalised and deduplicated through a compact set of 64-bit hashes,
+queued per host by (depth, discovery order), and handed to workers subject to
+per-host politeness (concurrency and minimum delay), `max_depth` and `max_pages`.
+Workers process results as they complete and push discovered links back, so
+there is no per-depth barrier.
+Env:
+  - CRAWL_CONCURRENCY: pages crawled in parallel (default: 4)
+  - CRAWL_HOST_CONCURRENCY: parallel requests per host (default: 2)
+  - CRAWL_HOST_DELAY: minimum seconds between two requests to the same host (default: 0.25)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import heapq
+import itertools
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from urllib.parse import urldefrag, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "4"))
+HOST_CONCURRENCY = int(os.getenv("CRAWL_HOST_CONCURRENCY", "2"))
+HOST_DELAY = float(os.getenv("CRAWL_HOST_DELAY", "0.25"))
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form used for deduplication: no fragment, lowercase scheme/host,
+    default port dropped, empty path as '/'."""
+    url = urldefrag(url.strip())[0]
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    netloc = host
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        netloc = f"{host}:{parts.port}"
+    if parts.username:
+        netloc = f"{parts.username}@{netloc}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+class SeenSet:
+    """Set of 64-bit URL digests: a few dozen bytes per URL instead of the full string."""
+
+    def __init__(self) -> None:
+        self._digests: Set[int] = set()
+
+    @staticmethod
+    def _key(url: str) -> int:
+        return int.from_bytes(hashlib.blake2b(url.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def add(self, url: str) -> bool:
+        """Record `url`; False if it was already seen."""
+        k = self._key(url)
+        if k in self._digests:
+            return False
+        self._digests.add(k)
+        return True
+
+    def __len__(self) -> int:
+        return len(self._digests)
+
+
+class _Host:
+    __slots__ = ("heap", "active", "next_allowed")
+
+    def __init__(self) -> None:
+        self.heap: List[Tuple[int, int, str]] = []
+        self.active = 0
+        self.next_allowed = 0.0
+
+
+class CrawlFrontier:
+    def __init__(
+        self,
+        *,
+        max_depth: int = 3,
+        max_pages: int = 100,
+        allowed_hosts: Optional[Iterable[str]] = None,
+        host_concurrency: int = HOST_CONCURRENCY,
+        host_delay: float = HOST_DELAY,
+    ):
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.allowed_hosts = {h.lower() for h in allowed_hosts} if allowed_hosts else None
+        self.host_concurrency = max(1, host_concurrency)
+        self.host_delay = max(0.0, host_delay)
+        self._hosts: Dict[str, _Host] = {}
+        self._seen = SeenSet()
+        self._seq = itertools.count()
+        self._cond = asyncio.Condition()
+        self._open_feeds = 0
+        self.pending = 0
+        self.in_flight = 0
+        self.dispatched = 0
+
+    @property
+    def _full(self) -> bool:
+        return self.dispatched + self.pending >= self.max_pages
+
+    async def add(self, url: str, depth: int = 0) -> bool:
+        """Queue `url` unless it is out of scope, already seen or the page budget is spent."""
+        if depth > self.max_depth or not url.lower().startswith(("http://", "https://")):
+            return False
+        try:
+            norm = normalize_url(url)
+            host = urlsplit(norm).netloc
+        except ValueError:
+            return False
+        if self.allowed_hosts is not None and (urlsplit(norm).hostname or "") not in self.allowed_hosts:
+            return False
+        async with self._cond:
+            if self._full or not self._seen.add(norm):
+                return False
+            h = self._hosts.setdefault(host, _Host())
+            heapq.heappush(h.heap, (depth, next(self._seq), norm))
+            self.pending += 1
+            self._cond.notify_all()
+        return True
+
+    def open_feed(self, urls: AsyncIterator[str], depth: int = 0, high_water: int = 1000) -> "asyncio.Task[int]":
+        """Pull seed URLs lazily from `urls` in a background task, never buffering more than
+        `high_water` pending URLs. The feed is registered before returning, so workers keep
+        waiting for seeds until it is exhausted.
+        """
+        self._open_feeds += 1
+        return asyncio.create_task(self._drain(urls, depth, high_water))
+
+    async def _drain(self, urls: AsyncIterator[str], depth: int, high_water: int) -> int:
+        added = 0
+        try:
+            async for u in urls:
+                async with self._cond:
+                    while self.pending >= high_water and not self._full:
+                        await self._cond.wait()
+                    if self._full:
+                        break
+                if await self.add(u, depth):
+                    added += 1
+        except Exception as e:
+            logger.warning(f"Frontier: seed feed failed: {e}")
+        finally:
+            aclose = getattr(urls, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            async with self._cond:
+                self._open_feeds -= 1
+                self._cond.notify_all()
+        return added
+
+    def _pick(self, now: float) -> Optional[Tuple[str, _Host]]:
+        best: Optional[Tuple[Tuple[int, int, str], _Host]] = None
+        for h in self._hosts.values():
+            if not h.heap or h.active >= self.host_concurrency or h.next_allowed > now:
+                continue
+            if best is None or h.heap[0] < best[0]:
+                best = (h.heap[0], h)
+        if best is None:
+            return None
+        return best[0][2], best[1]
+
+    def _next_ready_at(self) -> Optional[float]:
+        times = [h.next_allowed for h in self._hosts.values() if h.heap and h.active < self.host_concurrency]
+        return min(times) if times else None
+
+    async def next(self) -> Optional[Tuple[str, int]]:
+        """Wait for the next URL a worker may fetch; None once the crawl is finished."""
+        async with self._cond:
+            while True:
+                if self.dispatched >= self.max_pages:
+                    return None
+                now = time.monotonic()
+                picked = self._pick(now)
+                if picked is not None:
+                    _, h = picked
+                    depth, _, url = heapq.heappop(h.heap)
+                    h.active += 1
+                    h.next_allowed = now + self.host_delay
+                    self.pending -= 1
+                    self.in_flight += 1
+                    self.dispatched += 1
+                    self._cond.notify_all()
+                    return url, depth
+                if self.pending == 0 and self.in_flight == 0 and self._open_feeds == 0:
+                    self._cond.notify_all()
+                    return None
+                ready_at = self._next_ready_at()
+                timeout = max(0.0, ready_at - now) if ready_at is not None else None
+                try:
+                    await asyncio.wait_for(self._cond.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def done(self, url: str) -> None:
+        async with self._cond:
+            h = self._hosts.get(urlsplit(url).netloc)
+            if h is not None:
+                h.active -= 1
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "dispatched": self.dispatched,
+            "pending": self.pending,
+            "in_flight": self.in_flight,
+            "seen": len(self._seen),
+            "hosts": len(self._hosts),
+        }
+
+
+async def run_frontier(
+    frontier: CrawlFrontier,
+    process: Callable[[str, int], Awaitable[Optional[List[str]]]],
+    concurrency: int = CRAWL_CONCURRENCY,
+    dispatcher: Optional[Any] = None,
+    on_done: Optional[Callable[[str, int], Awaitable[None]]] = None,
+) -> None:
+    """Drive `concurrency` workers over the frontier until it is exhausted.
+    `process(url, depth)` crawls one page and returns the links discovered on it.
+    With a `dispatcher` (crawl_dispatcher.MemoryAdaptiveDispatcher), each page is
+    processed under one of its slots. `on_done(url, depth)` runs after a page was
+    processed successfully, once its slot is released: waiting there (e.g. on a slow
+    consumer) holds this worker back but not the other users of the dispatcher.
+    """
+
+    async def worker() -> None:
+        while True:
+            item = await frontier.next()
+            if item is None:
+                return
+            url, depth = item
+            try:
+                async with dispatcher.slot() if dispatcher is not None else contextlib.nullcontext():
+                    links = await process(url, depth)
+                # Links are queued before the page is marked done so the frontier never
+                # looks empty while work is still being discovered
+                for link in links or []:
+                    await frontier.add(link, depth + 1)
+                if on_done is not None:
+                    await on_done(url, depth)
+            except Exception as e:
+                logger.warning(f"Frontier: processing {url} failed: {e}")
+            finally:
+                await frontier.done(url)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
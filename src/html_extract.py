@@ -0,0 +1,140 @@
+"""
+Incremental HTML-to-text extraction for the HTTP fallback crawler.
+
+Built on the event-based `html.parser.HTMLParser`: chunks are fed as they arrive
+and parsing stops as soon as `max_chars` of visible text are collected, so a large
+page never needs a full DOM in memory.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from html.parser import HTMLParser
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+
+try:
+    import http_fetch  # type: ignore
+except Exception:  # pragma: no cover
+    from src import http_fetch  # type: ignore
+
+# Elements whose text is never visible
+_SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "iframe", "object"}
+
+
+@dataclass
+class ExtractedPage:
+    url: str
+    status_code: int
+    title: str
+    description: str
+    text: str
+    truncated: bool = False
+
+
+class StreamingTextExtractor(HTMLParser):
+    """Collect title, meta description and visible text until `max_chars` is reached."""
+
+    def __init__(self, max_chars: int = 5000):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.title = ""
+        self.description = ""
+        self.done = False
+        self._parts: List[str] = []
+        self._size = 0
+        self._skip_depth = 0
+        self._pending_sep = False
+        self._in_title = False
+        self._title_parts: List[str] = []
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        self._pending_sep = True
+        if tag == "title":
+            self._in_title = True
+        elif tag == "meta":
+            self._handle_meta(attrs)
+        elif tag in _SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        # Self-closing tags (<meta ... />) never open a skipped region
+        if tag == "meta":
+            self._handle_meta(attrs)
+
+    def handle_endtag(self, tag: str) -> None:
+        self._pending_sep = True
+        if tag == "title":
+            if self._in_title:
+                self.title = " ".join("".join(self._title_parts).split())
+            self._in_title = False
+        elif tag in _SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data: str) -> None:
+        if self._in_title:
+            self._title_parts.append(data)
+            return
+        if self._skip_depth or self.done:
+            return
+        # Text may arrive split across feed() chunks: only emit a separator where the
+        # source had whitespace or a tag boundary
+        core = " ".join(data.split())
+        if not core:
+            self._pending_sep = True
+            return
+        if self._parts and (self._pending_sep or data[0].isspace()):
+            core = " " + core
+        self._pending_sep = data[-1].isspace()
+        remaining = self.max_chars - self._size
+        if len(core) >= remaining:
+            core = core[:remaining]
+            self.done = True
+        self._parts.append(core)
+        self._size += len(core)
+
+    def _handle_meta(self, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if self.description:
+            return
+        a = {k.lower(): (v or "") for k, v in attrs}
+        name = (a.get("name") or a.get("property") or "").lower()
+        if name in ("description", "og:description"):
+            self.description = " ".join(a.get("content", "").split())
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts).strip()
+
+
+def extract_text(chunks: Iterable[str], max_chars: int = 5000) -> StreamingTextExtractor:
+    """Feed an iterable of HTML fragments, stopping once enough text is collected."""
+    parser = StreamingTextExtractor(max_chars)
+    for piece in chunks:
+        parser.feed(piece)
+        if parser.done:
+            break
+    parser.close()
+    return parser
+
+
+async def aextract_text(chunks: AsyncIterator[str], max_chars: int = 5000) -> StreamingTextExtractor:
+    parser = StreamingTextExtractor(max_chars)
+    async for piece in chunks:
+        parser.feed(piece)
+        if parser.done:
+            break
+    parser.close()
+    return parser
+
+
+async def fetch_and_extract(url: str, *, max_chars: int = 5000, timeout: float = 15.0) -> ExtractedPage:
+    """Stream `url` through the shared fallback client and extract its text."""
+    async with http_fetch.stream_text(url, timeout=timeout) as (resp, chunks):
+        parser = await aextract_text(chunks, max_chars)
+    return ExtractedPage(
+        url=url,
+        status_code=resp.status_code,
+        title=parser.title,
+        description=parser.description,
+        text=parser.text,
+        truncated=parser.done or resp.truncated,
+    )
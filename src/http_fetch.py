@@ -0,0 +1,219 @@
+"""
+Shared async HTTP client for the non-browser fallback crawler.
+
+One `httpx.AsyncClient` per worker keeps per-host keep-alive pools (HTTP/2 when the
+`h2` package is installed); a semaphore bounds in-flight fetches and bodies are
+streamed with a hard size cap so a huge page cannot exhaust memory.
+Env:
+  - HTTP_FALLBACK_MAX_CONNECTIONS: total pooled connections (default: 100)
+  - HTTP_FALLBACK_MAX_KEEPALIVE: idle keep-alive connections kept (default: 20)
+  - HTTP_FALLBACK_CONCURRENCY: concurrent fallback fetches (default: 32)
+  - HTTP_FALLBACK_MAX_BYTES: body size cap in bytes (default: 5 MB)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import codecs
+import logging
+import os
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+MAX_CONNECTIONS = int(os.getenv("HTTP_FALLBACK_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE = int(os.getenv("HTTP_FALLBACK_MAX_KEEPALIVE", "20"))
+CONCURRENCY = int(os.getenv("HTTP_FALLBACK_CONCURRENCY", "32"))
+MAX_BYTES = int(os.getenv("HTTP_FALLBACK_MAX_BYTES", str(5 * 1024 * 1024)))
+USER_AGENT = os.getenv("HTTP_FALLBACK_USER_AGENT", "Mozilla/5.0 (compatible; mcp-crawl4ai-rag)")
+
+_client: Optional[httpx.AsyncClient] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status_code: int
+    headers: Dict[str, str] = field(default_factory=dict)
+    content: bytes = b""
+    encoding: str = "utf-8"
+    truncated: bool = False
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # type: ignore  # noqa: F401
+        return True
+    except Exception:
+        return False
+
+
+def get_client() -> httpx.AsyncClient:
+    global _client, _semaphore
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=_http2_available(),
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE,
+            ),
+            headers={"User-Agent": USER_AGENT},
+        )
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(CONCURRENCY)
+    return _client
+
+
+async def aclose() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def fetch(
+    url: str,
+    *,
+    timeout: float = 15.0,
+    max_bytes: int = MAX_BYTES,
+    headers: Optional[Dict[str, str]] = None,
+) -> FetchResult:
+    """GET `url` without blocking the event loop.
+    Raises `httpx.HTTPStatusError` for non-2xx responses, like `requests.raise_for_status()`.
+    """
+    client = get_client()
+    assert _semaphore is not None
+    async with _semaphore:
+        async with client.stream("GET", url, timeout=timeout, headers=headers) as r:
+            r.raise_for_status()
+            buf = bytearray()
+            truncated = False
+            async for chunk in r.aiter_bytes():
+                buf.extend(chunk)
+                if len(buf) >= max_bytes:
+                    truncated = True
+                    del buf[max_bytes:]
+                    break
+            if truncated:
+                logger.info("HTTP fallback body truncated at %s bytes: %s", max_bytes, url)
+            return FetchResult(
+                url=str(r.url),
+                status_code=r.status_code,
+                headers=dict(r.headers),
+                content=bytes(buf),
+                encoding=r.charset_encoding or "utf-8",
+                truncated=truncated,
+            )
+
+
+
+async def probe(
+    url: str,
+    *,
+    timeout: float = 10.0,
+    headers: Optional[Dict[str, str]] = None,
+) -> FetchResult:
+    """GET `url` for its status and headers only; the body is never read.
+    Unlike `fetch`, non-2xx statuses (e.g. 304 to a conditional request) are returned, not raised.
+    """
+    client = get_client()
+    assert _semaphore is not None
+    async with _semaphore:
+        async with client.stream("GET", url, timeout=timeout, headers=headers) as r:
+            return FetchResult(
+                url=str(r.url),
+                status_code=r.status_code,
+                headers=dict(r.headers),
+                encoding=r.charset_encoding or "utf-8",
+            )
+
+@asynccontextmanager
+async def stream_text(
+    url: str,
+    *,
+    timeout: float = 15.0,
+    max_bytes: int = MAX_BYTES,
+    headers: Optional[Dict[str, str]] = None,
+) -> AsyncIterator[Tuple[FetchResult, AsyncIterator[str]]]:
+    """Open `url` and expose its body as incrementally decoded text chunks.
+    Leaving the block early closes the connection, so callers can stop reading as
+    soon as they have enough. The yielded `FetchResult` carries status and headers
+    only (no `content`).
+    """
+    client = get_client()
+    assert _semaphore is not None
+    async with _semaphore:
+        async with client.stream("GET", url, timeout=timeout, headers=headers) as r:
+            r.raise_for_status()
+            encoding = r.charset_encoding or "utf-8"
+            try:
+                decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            except LookupError:
+                encoding = "utf-8"
+                decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+            meta = FetchResult(
+                url=str(r.url),
+                status_code=r.status_code,
+                headers=dict(r.headers),
+                encoding=encoding,
+            )
+
+            async def _chunks() -> AsyncIterator[str]:
+                received = 0
+                async for chunk in r.aiter_bytes():
+                    remaining = max_bytes - received
+                    if len(chunk) >= remaining:
+                        meta.truncated = True
+                        yield decoder.decode(chunk[:remaining], final=True)
+                        return
+                    received += len(chunk)
+                    yield decoder.decode(chunk)
+                yield decoder.decode(b"", final=True)
+
+            yield meta, _chunks()
+
+
+@asynccontextmanager
+async def stream_bytes(
+    url: str,
+    *,
+    timeout: float = 15.0,
+    max_bytes: int = MAX_BYTES,
+    headers: Optional[Dict[str, str]] = None,
+) -> AsyncIterator[Tuple[FetchResult, AsyncIterator[bytes]]]:
+    """Like `stream_text` but yields the raw (transfer-decoded) body chunks, for
+    payloads that are not text, such as gzip'd sitemaps."""
+    client = get_client()
+    assert _semaphore is not None
+    async with _semaphore:
+        async with client.stream("GET", url, timeout=timeout, headers=headers) as r:
+            r.raise_for_status()
+            meta = FetchResult(
+                url=str(r.url),
+                status_code=r.status_code,
+                headers=dict(r.headers),
+                encoding=r.charset_encoding or "utf-8",
+            )
+
+            async def _chunks() -> AsyncIterator[bytes]:
+                received = 0
+                async for chunk in r.aiter_bytes():
+                    remaining = max_bytes - received
+                    if len(chunk) >= remaining:
+                        meta.truncated = True
+                        yield chunk[:remaining]
+                        return
+                    received += len(chunk)
+                    yield chunk
+
+            yield meta, _chunks()
@@ -7,36 +7,67 @@ import os
 import asyncio
 import json
 import logging
+import re
 import time
+from contextlib import asynccontextmanager
 from datetime import datetime
-from typing import Dict, Any, List, Optional, AsyncGenerator
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, AsyncGenerator, AsyncIterator, Callable, Tuple
 from pathlib import Path
 
 from fastapi import FastAPI, HTTPException, Response, Request
 from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import uvicorn
-from bs4 import BeautifulSoup  # fallback parsing
-import requests  # HTTP fallback for crawling
-import requests
-from crawl4ai import AsyncWebCrawler, BrowserConfig, CrawlerRunConfig, CacheMode
-import c4ai_firefox_guard  # noqa: F401 ensure Crawl4AI respects firefox config
-from crawl4ai.extraction_strategy import NoExtractionStrategy
+from pydantic import BaseModel, Field
 from urllib.parse import urlparse
 
+if TYPE_CHECKING:
+    from crawl4ai import AsyncWebCrawler, BrowserConfig
+
 # RAG modules (support both `python src/http_server.py` and `uvicorn src.http_server:app`)
 try:
     from ingest import upsert_document  # type: ignore
-    from embeddings import embed_texts  # type: ignore
-    from vector_store import list_sources as vs_list_sources, search as vs_search  # type: ignore
+    from embeddings import embed_texts, model_id as embed_model_id  # type: ignore
+    from vector_store import asource_stats as vs_source_stats, asearch_with_plan as vs_search_with_plan, ahybrid_search as vs_hybrid_search, close as vs_close  # type: ignore
+    import browser_pool  # type: ignore
+    import http_fetch  # type: ignore
+    import html_extract  # type: ignore
+    import embedding_cache  # type: ignore
+    import ingest_queue  # type: ignore
+    import frontier  # type: ignore
+    import sitemap  # type: ignore
+    import crawl_state  # type: ignore
+    import reranker  # type: ignore
+    import query_cache  # type: ignore
+    import warmup  # type: ignore
+    import crawl_dispatcher  # type: ignore
+    import cpu_pool  # type: ignore
 except Exception:  # pragma: no cover
     from src.ingest import upsert_document  # type: ignore
-    from src.embeddings import embed_texts  # type: ignore
-    from src.vector_store import list_sources as vs_list_sources, search as vs_search  # type: ignore
+    from src.embeddings import embed_texts, model_id as embed_model_id  # type: ignore
+    from src.vector_store import asource_stats as vs_source_stats, asearch_with_plan as vs_search_with_plan, ahybrid_search as vs_hybrid_search, close as vs_close  # type: ignore
+    from src import browser_pool  # type: ignore
+    from src import http_fetch  # type: ignore
+    from src import html_extract  # type: ignore
+    from src import embedding_cache  # type: ignore
+    from src import ingest_queue  # type: ignore
+    from src import frontier  # type: ignore
+    from src import sitemap  # type: ignore
+    from src import crawl_state  # type: ignore
+    from src import reranker  # type: ignore
+    from src import query_cache  # type: ignore
+    from src import warmup  # type: ignore
+    from src import crawl_dispatcher  # type: ignore
+    from src import cpu_pool  # type: ignore
+
+def _crawl4ai() -> Any:
+    """The crawl4ai package, imported on first use with the Firefox guard applied. It pulls in
+    Playwright and takes seconds to import, so it stays off the cold start path."""
+    import crawl4ai
+    import c4ai_firefox_guard  # noqa: F401 ensure Crawl4AI respects firefox config
+    return crawl4ai
 
 # Helper: build BrowserConfig from environment
-def build_browser_config(context: str) -> BrowserConfig:
+def build_browser_config(context: str) -> "BrowserConfig":
     """Construct a BrowserConfig honoring env vars and container constraints.
     Env:
       - CRAWLER_BROWSER_TYPE: 'chromium' | 'firefox' | 'webkit' (default: 'chromium')
@@ -61,7 +92,7 @@ def build_browser_config(context: str) -> BrowserConfig:
             "--disable-ipc-flooding-protection",
         ]
 
-    cfg = BrowserConfig(
+    cfg = _crawl4ai().BrowserConfig(
         browser_type=browser_type,
         headless=headless,
         browser_mode="dedicated",
@@ -148,6 +179,70 @@ async def _startup_prepare_crashpad():
     _ensure_crash_dumps_dir()
     logger.info("Startup: crashpad directories ensured")
 
+# Warm the shared browser pool once per worker instead of launching a browser per request.
+# Warm-ups run in the background (STARTUP_WARMUP) so /health answers before they finish.
+async def _warm_browser_pool():
+    try:
+        # Imported in a thread: the import alone would block the event loop for seconds
+        await asyncio.to_thread(_crawl4ai)
+        await browser_pool.start_pool(lambda: build_browser_config("browser_pool"))
+    except Exception as e:
+        logger.warning(f"Browser pool unavailable, falling back to per-request browsers: {e}")
+        raise
+
+@app.on_event("startup")
+async def _startup_browser_pool():
+    await warmup.run("browser_pool", _warm_browser_pool)
+
+@app.on_event("shutdown")
+async def _shutdown_warmup():
+    await warmup.stop()
+
+@app.on_event("shutdown")
+async def _shutdown_browser_pool():
+    await browser_pool.stop_pool()
+
+@app.on_event("shutdown")
+async def _shutdown_http_fetch():
+    await http_fetch.aclose()
+
+# Chunking, embeddings and Supabase writes run in the background ingest pipeline
+@app.on_event("startup")
+async def _startup_ingest_pipeline():
+    await ingest_queue.start_pipeline()
+    # Worker processes each import the main module: started in the background, documents
+    # are chunked in a thread until they are ready
+    if ingest_queue.MODE == "background" and cpu_pool.WORKERS > 0:
+        await warmup.run("cpu_pool", cpu_pool.start_cpu_pool)
+
+@app.on_event("shutdown")
+async def _shutdown_ingest_pipeline():
+    await ingest_queue.stop_pipeline()
+    # After the pipeline: its persist workers may still be writing
+    await asyncio.to_thread(vs_close)
+
+# Cross-encoder reranking (USE_RERANKING=true): model loaded and warmed in its worker thread;
+# until it is ready, results keep their vector order
+@app.on_event("startup")
+async def _startup_reranker():
+    if reranker.ENABLED:
+        await warmup.run("reranker", reranker.start_reranker)
+
+@app.on_event("shutdown")
+async def _shutdown_reranker():
+    await reranker.stop_reranker()
+
+@asynccontextmanager
+async def _crawler_session(context: str) -> AsyncIterator["AsyncWebCrawler"]:
+    """Lease a warm crawler from the pool, or launch a dedicated one if the pool is disabled."""
+    pool = browser_pool.get_pool()
+    if pool is not None and pool.available:
+        async with pool.lease() as crawler:
+            yield crawler
+        return
+    async with _crawl4ai().AsyncWebCrawler(config=build_browser_config(context)) as crawler:
+        yield crawler
+
 # Modèles Pydantic
 class HealthResponse(BaseModel):
     status: str
@@ -161,10 +256,39 @@ class CrawlRequest(BaseModel):
     extract_text: bool = True
     extract_metadata: bool = True
 
+class SmartCrawlRequest(CrawlRequest):
+    max_depth: int = 3
+    max_pages: int = 100
+    max_concurrent: int = 0  # 0 = CRAWL_CONCURRENCY
+    lastmod_since: Optional[str] = None  # sitemaps: skip entries whose <lastmod> is older (ISO date)
+    skip_unchanged: bool = True  # skip pages unchanged since the last crawl (304 / same content hash)
+
+class SmartCrawlResponse(BaseModel):
+    success: bool
+    url: str
+    crawl_type: str
+    pages_crawled: int = 0
+    pages_failed: int = 0
+    pages_not_modified: int = 0
+    pages_unchanged: int = 0
+    skip_ratio: float = 0.0
+    results: List[Dict[str, Any]] = []
+    error: Optional[str] = None
+
+class BatchCrawlRequest(BaseModel):
+    urls: List[str]
+    format: Optional[str] = None  # "ndjson" | "sse" (default: sse if Accept is text/event-stream, else ndjson)
+    max_concurrent: int = 0  # 0 = the dispatcher's maximum (CRAWL_BATCH_CONCURRENCY)
+    skip_unchanged: bool = False  # skip pages unchanged since the last crawl (304 / same content hash)
+
 class RAGQueryRequest(BaseModel):
     query: str
     max_results: int = 5
     filters: Dict[str, Any] = {}
+    ef_search: Optional[int] = Field(None, ge=1, le=1000)  # HNSW candidate list size, pgvector's range (default: VECTOR_EF_SEARCH)
+    probes: Optional[int] = None  # IVFFlat lists scanned (default: VECTOR_IVF_PROBES)
+    source_filter: Optional[str] = None  # restrict to one source_id (see get_available_sources)
+    mode: Optional[str] = None  # "vector" | "hybrid" (default: hybrid if USE_HYBRID_SEARCH=true)
 
 class CrawlResponse(BaseModel):
     success: bool
@@ -178,6 +302,8 @@ class RAGQueryResponse(BaseModel):
     query: str
     results: List[Dict[str, Any]] = []
     error: Optional[str] = None
+    plan: Optional[Dict[str, Any]] = None  # search plan chosen by the vector store, for diagnostics
+    cached: bool = False  # served from the query cache (or shared with an identical in-flight query)
 
 # Endpoints
 
@@ -192,6 +318,10 @@ async def health_check():
         active_vector = {"column": "embedding_1536", "dim": 1536}
     else:
         active_vector = {"column": "embedding_768", "dim": 768}
+    pool = browser_pool.get_pool()
+    pipeline = ingest_queue.get_pipeline()
+    state_store = crawl_state.get_store()
+    rerank_service = reranker.get_reranker()
     return HealthResponse(
         status="healthy",
         service="mcp-crawl4ai-rag",
@@ -203,8 +333,15 @@ async def health_check():
             "embedding_model": model,
             "vector_dim": env_dim,
             "active_vector": active_vector,
+            "browser_pool": pool.stats() if pool is not None else "disabled",
+            "embedding_cache": embedding_cache.get_cache().stats(),
+            "ingest": pipeline.stats() if pipeline is not None else {"mode": "inline"},
+            "crawl_state": state_store.stats() if state_store is not None else "disabled",
             "knowledge_graph": "disabled",
-            "reranking": "disabled"
+            "reranking": rerank_service.stats() if rerank_service is not None else "disabled",
+            "query_cache": query_cache.get_cache().stats(),
+            "warmup": warmup.stats(),
+            "crawl_dispatcher": crawl_dispatcher.get_dispatcher().stats(),
         }
     )
 
@@ -214,201 +351,477 @@ async def health_head():
     return Response(status_code=200)
 
 @app.get("/mcp/get_available_sources")
-async def get_available_sources():
+async def get_available_sources(limit: int = 100, offset: int = 0):
+    """Page of crawled sources with word/chunk counts, served from the `sources` table."""
     try:
-        sources = vs_list_sources()
-        return {"success": True, "sources": sources}
+        page = await vs_source_stats(limit, offset)
+        return {
+            "success": True,
+            "sources": page["sources"],
+            "count": len(page["sources"]),
+            "total": page["total"],
+            "limit": limit,
+            "offset": offset,
+        }
     except Exception as e:
         logger.error(f"list_sources failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/mcp/crawl_single_page", response_model=CrawlResponse)
-async def crawl_single_page(request: CrawlRequest):
+async def _ingest_document(
+    url: str,
+    content: str,
+    meta: Dict[str, Any],
+    label: str,
+    on_persisted: Optional[Callable[[], None]] = None,
+) -> None:
+    """Queue `content` for background ingestion (or ingest it inline off the event loop)
+    and record the outcome in `meta`. `on_persisted` runs once the document is stored.
     """
-    Crawl une page web RÉELLEMENT avec crawl4ai.
-    
-    Args:
-        request: Requête contenant l'URL à crawler
-        
-    Returns:
-        Réponse avec le contenu réel de la page
+    try:
+        pipeline = ingest_queue.get_pipeline()
+        if pipeline is not None:
+            job = await pipeline.submit(
+                url, meta.get("title", ""), content, meta,
+                on_done=(lambda _job: on_persisted()) if on_persisted else None,
+            )
+            meta.update({"ingest_job_id": job.job_id, "ingest_status": job.status})
+        else:
+            ingest_res = await asyncio.to_thread(upsert_document, url, meta.get("title", ""), content, dict(meta))
+            meta.update({"persisted": True, **ingest_res})
+            if on_persisted is not None:
+                on_persisted()
+    except Exception as e:
+        logger.error(f"Supabase upsert failed ({label}): {e}")
+        meta.update({"persisted": False, "error": str(e)})
+
+async def _http_fallback_crawl(url: str, label: str) -> Optional[CrawlResponse]:
+    """Fetch `url` over plain HTTP, extract its text and ingest it.
+    Returns None when the page has no extractable text; network errors propagate.
     """
+    page = await html_extract.fetch_and_extract(url, max_chars=5000, timeout=15)
+    content = page.text
+    if not content:
+        return None
+    meta = {
+        "source": "http_fallback",
+        "timestamp": datetime.utcnow().isoformat(),
+        "length": len(content),
+        "title": page.title,
+        "description": page.description,
+        "domain": urlparse(url).netloc or (url.split('/')[2] if '//' in url else "unknown"),
+    }
+    # Defaults to always expose stable keys
+    meta.setdefault("persisted", False)
+    meta.setdefault("chunks_count", 0)
+    await _ingest_document(url, content, meta, label)
+    return CrawlResponse(
+        success=True,
+        url=url,
+        content=content,
+        metadata=meta,
+    )
+
+async def _not_modified(url: str, previous: Optional["crawl_state.PageState"]) -> bool:
+    """Conditional GET with the validators recorded at the last crawl; True on 304."""
+    if previous is None or not (previous.etag or previous.last_modified):
+        return False
     try:
-        logger.info(f"REAL CRAWLING page: {request.url}")
+        res = await http_fetch.probe(url, headers=previous.conditional_headers())
+        return res.status_code == 304
+    except Exception as e:
+        logger.debug(f"Conditional request failed for {url}: {e}")
+        return False
+
+async def _crawl_page(url: str, context: str, conditional: bool = False) -> Tuple[CrawlResponse, List[str]]:
+    """Crawl one page with a pooled browser (HTTP fallback on failure) and queue it for ingestion.
+    Returns the response and the internal links found on the page.
+    With `conditional`, pages the crawl-state store knows to be unchanged (HTTP 304, or
+    same content hash after rendering) are not ingested again; `metadata.skipped` says why.
+    """
+    store = crawl_state.get_store()
+    previous = store.get(url) if store is not None and conditional else None
+    if await _not_modified(url, previous):
+        assert store is not None and previous is not None
+        store.touch(url)
+        return CrawlResponse(
+            success=True,
+            url=url,
+            metadata={"source": "crawl_state", "skipped": "not_modified", "persisted": True, "chunks_count": 0},
+        ), previous.links
+    try:
+        logger.info(f"REAL CRAWLING page: {url}")
         
         # Utiliser vraiment crawl4ai
         _ensure_crash_dumps_dir()
-        browser_config = build_browser_config("crawl_single_page")
-        async with AsyncWebCrawler(config=browser_config) as crawler:
+        # First crawl before the warm-up finished: import off the event loop
+        crawl4ai = await asyncio.to_thread(_crawl4ai)
+        from crawl4ai.extraction_strategy import NoExtractionStrategy
+        async with _crawler_session(context) as crawler:
             result = await crawler.arun(
-                url=request.url,
-                config=CrawlerRunConfig(
+                url=url,
+                config=crawl4ai.CrawlerRunConfig(
                     word_count_threshold=10,
                     extraction_strategy=NoExtractionStrategy(),
-                    cache_mode=CacheMode.BYPASS
+                    cache_mode=crawl4ai.CacheMode.BYPASS
                 )
             )
             
-            if result.success:
-                content = result.markdown or result.cleaned_html or "Pas de contenu disponible"
-                meta = {
-                    "source": "crawl4ai",
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "length": len(content),
-                    "title": result.metadata.get("title", ""),
-                    "description": result.metadata.get("description", ""),
-                    "domain": urlparse(request.url).netloc or (request.url.split('/')[2] if '//' in request.url else "unknown"),
-                }
-                # Defaults to always expose stable keys
-                meta.setdefault("persisted", False)
-                meta.setdefault("chunks_count", 0)
-                try:
-                    ingest_res = upsert_document(request.url, meta.get("title", ""), content, meta)
-                    meta.update({"persisted": True, **ingest_res})
-                except Exception as e:
-                    logger.error(f"Supabase upsert failed: {e}")
-                    meta.update({"persisted": False, "error": str(e)})
-                return CrawlResponse(
-                    success=True,
-                    url=request.url,
-                    content=content,
-                    metadata=meta,
-                )
+        if result.success:
+            content = result.markdown or result.cleaned_html or "Pas de contenu disponible"
+            meta = {
+                "source": "crawl4ai",
+                "timestamp": datetime.utcnow().isoformat(),
+                "length": len(content),
+                "title": result.metadata.get("title", ""),
+                "description": result.metadata.get("description", ""),
+                "domain": urlparse(url).netloc or (url.split('/')[2] if '//' in url else "unknown"),
+            }
+            # Defaults to always expose stable keys
+            meta.setdefault("persisted", False)
+            meta.setdefault("chunks_count", 0)
+            links = [l.get("href") for l in (result.links or {}).get("internal", []) if l.get("href")]
+            state = crawl_state.PageState.from_headers(url, getattr(result, "response_headers", None) or {}, content, links)
+            if previous is not None and previous.content_hash == state.content_hash:
+                meta.update({"skipped": "unchanged", "persisted": True})
+                store.record(state)
             else:
-                logger.error(f"Crawl failed for {request.url}: {result.error_message}")
-                # HTTP fallback when Playwright crawl fails
-                try:
-                    logger.info(f"HTTP fallback for {request.url}")
-                    r = requests.get(request.url, timeout=15)
-                    r.raise_for_status()
-                    soup = BeautifulSoup(r.text, "html.parser")
-                    text = soup.get_text(" ")
-                    content = text.strip()[:5000]
-                    if content:
-                        meta = {
-                            "source": "http_fallback",
-                            "timestamp": datetime.utcnow().isoformat(),
-                            "length": len(content),
-                            "title": soup.title.string if soup.title else "",
-                            "description": "",
-                            "domain": urlparse(request.url).netloc or (request.url.split('/')[2] if '//' in request.url else "unknown"),
-                        }
-                        # Defaults to always expose stable keys
-                        meta.setdefault("persisted", False)
-                        meta.setdefault("chunks_count", 0)
-                        try:
-                            ingest_res = upsert_document(request.url, meta.get("title", ""), content, meta)
-                            meta.update({"persisted": True, **ingest_res})
-                        except Exception as e2:
-                            logger.error(f"Supabase upsert failed (fallback): {e2}")
-                            meta.update({"persisted": False, "error": str(e2)})
-                        return CrawlResponse(
-                            success=True,
-                            url=request.url,
-                            content=content,
-                            metadata=meta,
-                        )
-                except Exception as e2:
-                    logger.error(f"HTTP fallback failed for {request.url}: {e2}")
-                return CrawlResponse(
-                    success=False,
-                    url=request.url,
-                    error=result.error_message or "Crawling failed"
+                await _ingest_document(
+                    url, content, meta, "crawl4ai",
+                    on_persisted=(lambda: store.record(state)) if store is not None else None,
                 )
+            return CrawlResponse(
+                success=True,
+                url=url,
+                content=content,
+                metadata=meta,
+            ), links
+        else:
+            logger.error(f"Crawl failed for {url}: {result.error_message}")
+            # HTTP fallback when Playwright crawl fails
+            try:
+                logger.info(f"HTTP fallback for {url}")
+                fallback = await _http_fallback_crawl(url, "fallback")
+                if fallback is not None:
+                    return fallback, []
+            except Exception as e2:
+                logger.error(f"HTTP fallback failed for {url}: {e2}")
+            return CrawlResponse(
+                success=False,
+                url=url,
+                error=result.error_message or "Crawling failed"
+            ), []
         
     except Exception as e:
-        logger.error(f"Erreur lors du crawling de {request.url}: {e}")
+        logger.error(f"Erreur lors du crawling de {url}: {e}")
         # Try HTTP fallback on exception too
         try:
-            logger.info(f"HTTP fallback (exception) for {request.url}")
-            r = requests.get(request.url, timeout=15)
-            r.raise_for_status()
-            soup = BeautifulSoup(r.text, "html.parser")
-            text = soup.get_text(" ")
-            content = text.strip()[:5000]
-            if content:
-                meta = {
-                    "source": "http_fallback",
-                    "timestamp": datetime.utcnow().isoformat(),
-                    "length": len(content),
-                    "title": soup.title.string if soup.title else "",
-                    "description": "",
-                    "domain": urlparse(request.url).netloc or (request.url.split('/')[2] if '//' in request.url else "unknown"),
-                }
-                # Defaults to always expose stable keys
-                meta.setdefault("persisted", False)
-                meta.setdefault("chunks_count", 0)
-                try:
-                    ingest_res = upsert_document(request.url, meta.get("title", ""), content, meta)
-                    meta.update({"persisted": True, **ingest_res})
-                except Exception as ie:
-                    logger.error(f"Supabase upsert failed (exception fallback): {ie}")
-                    meta.update({"persisted": False, "error": str(ie)})
-                return CrawlResponse(
-                    success=True,
-                    url=request.url,
-                    content=content,
-                    metadata=meta,
-                )
-                
+            logger.info(f"HTTP fallback (exception) for {url}")
+            fallback = await _http_fallback_crawl(url, "exception fallback")
+            if fallback is not None:
+                return fallback, []
         except Exception as e2:
-            logger.error(f"HTTP fallback (exception) failed for {request.url}: {e2}")
+            logger.error(f"HTTP fallback (exception) failed for {url}: {e2}")
         return CrawlResponse(
             success=False,
-            url=request.url,
+            url=url,
             error=str(e)
-        )
+        ), []
+
+@app.post("/mcp/crawl_single_page", response_model=CrawlResponse)
+async def crawl_single_page(request: CrawlRequest):
+    """
+    Crawl une page web RÉELLEMENT avec crawl4ai.
+    
+    Args:
+        request: Requête contenant l'URL à crawler
+        
+    Returns:
+        Réponse avec le contenu réel de la page
+    """
+    response, _ = await _crawl_page(request.url, "crawl_single_page")
+    return response
+
+# Default RAG search mode (the README's USE_HYBRID_SEARCH switch); per request via `mode`
+RAG_SEARCH_MODE = "hybrid" if os.getenv("USE_HYBRID_SEARCH", "false").strip().lower() == "true" else "vector"
+
+async def _rag_search(request: RAGQueryRequest, mode: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    logger.info(f"RAG DB query ({mode}): '{request.query}'")
+    qvec = (await asyncio.to_thread(embed_texts, [request.query]))[0]
+    search_kwargs = dict(
+        match_count=int(request.max_results or 5),
+        filter=request.filters or {},
+        source_filter=request.source_filter,
+        ef_search=request.ef_search,
+        probes=request.probes,
+    )
+    if mode == "hybrid":
+        found = await vs_hybrid_search(request.query, qvec, **search_kwargs)
+    else:
+        found = await vs_search_with_plan(qvec, **search_kwargs)
+    rows = found["results"]
+    fused = found["plan"].get("plan") == "hybrid"
+    results: List[Dict[str, Any]] = []
+    for r in rows:
+        url = r.get("url") or r.get("document_url") or ""
+        meta = r.get("metadata") or {}
+        title = (meta.get("title") if isinstance(meta, dict) else None) or meta or ""
+        snippet = r.get("content") or r.get("chunk") or ""
+        score = (r.get("score") if fused else r.get("similarity") or r.get("score")) or 0.0
+        item = {
+            "url": url,
+            "title": title,
+            "snippet": snippet[:800] + ("..." if len(snippet) > 800 else ""),
+            "content": snippet,
+            "score": float(score),
+            "metadata": meta if isinstance(meta, dict) else {"meta": meta},
+        }
+        if fused:
+            # Per-side evidence behind the RRF score (null when one side missed the chunk)
+            item["similarity"] = r.get("similarity")
+            item["keyword_rank"] = r.get("keyword_rank")
+        results.append(item)
+    results = await reranker.rerank(request.query, results)
+    return results, found["plan"]
 
 @app.post("/mcp/perform_rag_query", response_model=RAGQueryResponse)
 async def perform_rag_query(request: RAGQueryRequest):
     """
     DB-backed RAG query using Supabase + Ollama embeddings.
+    Answers are cached per (normalized query, parameters, embedding model), see query_cache.py.
     """
     try:
-        logger.info(f"RAG DB query: '{request.query}'")
-        qvec = embed_texts([request.query])[0]
-        rows = vs_search(qvec, match_count=int(request.max_results or 5), filter=request.filters or {}, source_filter=None)
-        results: List[Dict[str, Any]] = []
-        for r in rows:
-            url = r.get("url") or r.get("document_url") or ""
-            meta = r.get("metadata") or {}
-            title = (meta.get("title") if isinstance(meta, dict) else None) or meta or ""
-            snippet = r.get("content") or r.get("chunk") or ""
-            score = r.get("similarity") or r.get("score") or 0.0
-            results.append({
-                "url": url,
-                "title": title,
-                "snippet": snippet[:800] + ("..." if len(snippet) > 800 else ""),
-                "content": snippet,
-                "score": float(score),
-                "metadata": meta if isinstance(meta, dict) else {"meta": meta},
-            })
-        return RAGQueryResponse(success=True, query=request.query, results=results)
+        mode = (request.mode or RAG_SEARCH_MODE).strip().lower()
+        if mode not in ("vector", "hybrid"):
+            raise ValueError(f"unknown search mode '{request.mode}' (expected 'vector' or 'hybrid')")
+        key = query_cache.make_key(
+            request.query,
+            mode=mode,
+            filters=request.filters or {},
+            source=request.source_filter,
+            match_count=int(request.max_results or 5),
+            ef_search=request.ef_search,
+            probes=request.probes,
+            model=embed_model_id(),
+            rerank=reranker.get_reranker() is not None,
+        )
+        (results, plan), cached = await query_cache.get_cache().get_or_compute(
+            key, request.source_filter, lambda: _rag_search(request, mode)
+        )
+        return RAGQueryResponse(success=True, query=request.query, results=results, plan=plan, cached=cached)
     except Exception as e:
         logger.error(f"RAG DB query failed for '{request.query}': {e}")
         return RAGQueryResponse(success=False, query=request.query, error=str(e))
 
+@app.get("/mcp/ingest_status/{job_id}")
+async def ingest_status(job_id: str):
+    """Progress of a background ingest job returned by a crawl endpoint."""
+    pipeline = ingest_queue.get_pipeline()
+    job = pipeline.get(job_id) if pipeline is not None else None
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingest job: {job_id}")
+    return {"success": True, **job.to_dict()}
+
 # --- Additional tools to match upstream ---
-@app.post("/mcp/smart_crawl_url")
-async def smart_crawl_url(request: CrawlRequest):
-    """Smart crawl based on URL type (sitemap, llms-full.txt, or regular page).
-    Minimal implementation: for now, treat as single-page crawl; can be extended.
+SMART_CRAWL_TIMEOUT = float(os.getenv("SMART_CRAWL_TIMEOUT", "300"))
+_MD_LINK_RE = re.compile(r"\[[^\]]*\]\((https?://[^)\s]+)\)")
+
+def _smart_crawl_type(url: str) -> str:
+    path = urlparse(url).path.lower()
+    if (path.endswith(".xml") or path.endswith(".xml.gz")) and "sitemap" in path:
+        return "sitemap"
+    if path.endswith("llms.txt") or path.endswith("llms-full.txt"):
+        return "llms_txt"
+    if path.endswith(".txt"):
+        return "text_file"
+    return "recursive"
+
+@app.post("/mcp/smart_crawl_url", response_model=SmartCrawlResponse)
+async def smart_crawl_url(request: SmartCrawlRequest):
+    """Smart crawl based on URL type (sitemap, llms-full.txt, text file or regular site).
+    Pages are scheduled through a crawl frontier: deduplicated, polite per host, and
+    processed as they complete instead of depth by depth.
     """
+    crawl_type = _smart_crawl_type(request.url)
+    results: List[Dict[str, Any]] = []
+    seed_host = urlparse(request.url).hostname or ""
+    crawl = frontier.CrawlFrontier(
+        max_depth=request.max_depth if crawl_type == "recursive" else (1 if crawl_type == "llms_txt" else 0),
+        max_pages=max(1, request.max_pages),
+        allowed_hosts=[seed_host] if crawl_type == "recursive" else None,
+    )
+
+    async def process(url: str, depth: int) -> List[str]:
+        # The llms.txt index itself is always fetched: its links come from its content
+        conditional = request.skip_unchanged and not (crawl_type == "llms_txt" and depth == 0)
+        page, links = await _crawl_page(url, "smart_crawl_url", conditional=conditional)
+        results.append({
+            "url": url,
+            "depth": depth,
+            "success": page.success,
+            "skipped": page.metadata.get("skipped"),
+            "length": page.metadata.get("length", 0),
+            "persisted": page.metadata.get("persisted", False),
+            "ingest_job_id": page.metadata.get("ingest_job_id"),
+            "error": page.error,
+        })
+        if crawl_type == "recursive":
+            return links
+        if crawl_type == "llms_txt" and depth == 0 and page.content:
+            return _MD_LINK_RE.findall(page.content)
+        return []
+
+    since = sitemap.parse_lastmod(request.lastmod_since)
+    if request.lastmod_since and since is None:
+        return SmartCrawlResponse(success=False, url=request.url, crawl_type=crawl_type,
+                                  error=f"Invalid lastmod_since: {request.lastmod_since}")
+
+    feed: Optional["asyncio.Task[int]"] = None
     try:
-        return await crawl_single_page(request)
+        if crawl_type == "sitemap":
+            feed = crawl.open_feed(sitemap.iter_sitemap(request.url, since=since))
+        else:
+            await crawl.add(request.url, 0)
+        await frontier.run_frontier(crawl, process, request.max_concurrent or frontier.CRAWL_CONCURRENCY)
+        if feed is not None:
+            await feed
+        crawled = sum(1 for r in results if r["success"])
+        not_modified = sum(1 for r in results if r["skipped"] == "not_modified")
+        unchanged = sum(1 for r in results if r["skipped"] == "unchanged")
+        skip_ratio = round((not_modified + unchanged) / len(results), 4) if results else 0.0
+        logger.info(
+            f"smart_crawl_url {request.url} ({crawl_type}): {crawled}/{len(results)} pages, "
+            f"skipped {not_modified} not modified + {unchanged} unchanged (ratio {skip_ratio}), {crawl.stats()}"
+        )
+        return SmartCrawlResponse(
+            success=crawled > 0,
+            url=request.url,
+            crawl_type=crawl_type,
+            pages_crawled=crawled,
+            pages_failed=len(results) - crawled,
+            pages_not_modified=not_modified,
+            pages_unchanged=unchanged,
+            skip_ratio=skip_ratio,
+            results=results,
+            error=None if crawled else "No page could be crawled",
+        )
     except Exception as e:
         logger.error(f"smart_crawl_url failed for {request.url}: {e}")
-        return CrawlResponse(success=False, url=request.url, error=str(e))
+        return SmartCrawlResponse(success=False, url=request.url, crawl_type=crawl_type, results=results, error=str(e))
+    finally:
+        if feed is not None and not feed.done():
+            feed.cancel()
 
-@app.get("/mcp/get_available_sources")
-async def get_available_sources():
-    """Return available sources (domains) in storage.
-    Placeholder: return empty list until storage is wired.
+CRAWL_BATCH_MAX_URLS = int(os.getenv("CRAWL_BATCH_MAX_URLS", "10000"))
+
+def _batch_line(payload: Dict[str, Any], fmt: str) -> str:
+    data = json.dumps(payload, ensure_ascii=False)
+    if fmt == "sse":
+        return f"event: {payload['event']}\ndata: {data}\n\n"
+    return data + "\n"
+
+@app.post("/mcp/crawl_batch")
+async def crawl_batch(request: BatchCrawlRequest, http_request: Request):
+    """Crawl a list of URLs through the browser pool and stream one line per page, in
+    completion order, as NDJSON or SSE, then a summary line.
+    Pages are fed to a frontier (deduplicated, polite per host) and started under the
+    process-wide memory-adaptive dispatcher. Nothing is accumulated per page: the stream
+    is backpressured by the client, so memory does not grow with the batch size.
     """
-    try:
-        return {"success": True, "sources": []}
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+    accept = http_request.headers.get("accept", "")
+    fmt = (request.format or ("sse" if "text/event-stream" in accept else "ndjson")).strip().lower()
+    if fmt not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail=f"Unknown format '{request.format}' (expected 'ndjson' or 'sse')")
+    if not request.urls:
+        raise HTTPException(status_code=400, detail="No URL to crawl")
+    if len(request.urls) > CRAWL_BATCH_MAX_URLS:
+        raise HTTPException(status_code=413, detail=f"Too many URLs: {len(request.urls)} > {CRAWL_BATCH_MAX_URLS}")
+
+    dispatcher = crawl_dispatcher.get_dispatcher()
+    workers = max(1, request.max_concurrent or dispatcher.max_concurrency)
+    crawl = frontier.CrawlFrontier(max_depth=0, max_pages=len(request.urls))
+    # Bounded: a slow client slows the crawl down instead of buffering results
+    lines: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue(maxsize=2 * workers)
+    counts = {"ok": 0, "failed": 0, "skipped": 0}
+    started = time.monotonic()
+    errors: List[str] = []
+    # Result lines of pages crawled but not yet streamed, at most one per worker
+    done: Dict[str, Dict[str, Any]] = {}
+
+    async def process(url: str, depth: int) -> List[str]:
+        t0 = time.monotonic()
+        page, _ = await _crawl_page(url, "crawl_batch", conditional=request.skip_unchanged)
+        meta = page.metadata
+        status = "skipped" if meta.get("skipped") else ("ok" if page.success else "failed")
+        counts[status] += 1
+        now = time.monotonic()
+        done[url] = {
+            "event": "result",
+            "url": url,
+            "status": status,
+            "skipped": meta.get("skipped"),
+            "source": meta.get("source"),
+            "length": meta.get("length", 0),
+            "duration_ms": round((now - t0) * 1000, 1),
+            "elapsed_ms": round((now - started) * 1000, 1),
+            "ingest": {
+                "persisted": meta.get("persisted", False),
+                "chunks_count": meta.get("chunks_count", 0),
+                "job_id": meta.get("ingest_job_id"),
+                "status": meta.get("ingest_status"),
+                "error": meta.get("error"),
+            },
+            "error": page.error,
+        }
+        return []
+
+    async def emit(url: str, depth: int) -> None:
+        # Outside the dispatcher slot: a slow client must not hold pages of other batches back
+        await lines.put(done.pop(url))
+
+    async def seeds() -> AsyncIterator[str]:
+        for url in request.urls:
+            yield url
+
+    async def run() -> None:
+        feed = crawl.open_feed(seeds())
+        try:
+            await frontier.run_frontier(crawl, process, workers, dispatcher=dispatcher, on_done=emit)
+            await feed
+        except Exception as e:
+            logger.error(f"crawl_batch failed: {e}")
+            errors.append(str(e))
+        finally:
+            if not feed.done():
+                feed.cancel()
+        # Not reached on cancellation (client gone): nobody reads the queue any more
+        await lines.put(None)
+
+    async def stream() -> AsyncGenerator[str, None]:
+        runner = asyncio.create_task(run())
+        try:
+            while True:
+                item = await lines.get()
+                if item is None:
+                    break
+                yield _batch_line(item, fmt)
+            yield _batch_line({
+                "event": "summary",
+                "urls": len(request.urls),
+                "rejected": len(request.urls) - crawl.dispatched,  # duplicates and invalid URLs
+                **counts,
+                "duration_ms": round((time.monotonic() - started) * 1000, 1),
+                "dispatcher": dispatcher.stats(),
+                "error": errors[0] if errors else None,
+            }, fmt)
+            logger.info(f"crawl_batch: {len(request.urls)} URLs, {counts}, {crawl.stats()}")
+        finally:
+            if not runner.done():
+                logger.info(f"crawl_batch: client disconnected after {sum(counts.values())} pages, cancelling")
+                runner.cancel()
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    media_type = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type, headers=headers)
 
 @app.get("/sse")
 async def sse_endpoint(request: Request):
@@ -508,7 +921,12 @@ async def messages(request: Request):
                         "properties": {
                             "url": {"type": "string"},
                             "extract_text": {"type": "boolean", "default": True},
-                            "extract_metadata": {"type": "boolean", "default": True}
+                            "extract_metadata": {"type": "boolean", "default": True},
+                            "max_depth": {"type": "integer", "default": 3},
+                            "max_pages": {"type": "integer", "default": 100},
+                            "max_concurrent": {"type": "integer", "default": 0},
+                            "lastmod_since": {"type": "string", "description": "Sitemaps only: skip entries last modified before this ISO date"},
+                            "skip_unchanged": {"type": "boolean", "default": True}
                         },
                         "required": ["url"]
                     }
@@ -516,14 +934,27 @@ async def messages(request: Request):
                 {
                     "name": "get_available_sources",
                     "description": "List available sources (domains) in the database for filtering.",
-                    "inputSchema": {"type": "object", "properties": {}}
+                    "inputSchema": {
+                        "type": "object",
+                        "properties": {
+                            "limit": {"type": "integer", "default": 100},
+                            "offset": {"type": "integer", "default": 0}
+                        }
+                    }
                 },
                 {
                     "name": "perform_rag_query",
                     "description": "Perform a basic RAG-style web query with crawling of known references.",
                     "inputSchema": {
                         "type": "object",
-                        "properties": {"query": {"type": "string"}, "max_results": {"type": "integer", "default": 5}},
+                        "properties": {
+                            "query": {"type": "string"},
+                            "max_results": {"type": "integer", "default": 5},
+                            "ef_search": {"type": "integer", "minimum": 1, "maximum": 1000, "description": "HNSW recall/latency knob"},
+                            "probes": {"type": "integer", "description": "IVFFlat recall/latency knob"},
+                            "source_filter": {"type": "string", "description": "Only search this source_id"},
+                            "mode": {"type": "string", "enum": ["vector", "hybrid"], "description": "hybrid adds full-text ranking fused with RRF"}
+                        },
                         "required": ["query"]
                     }
                 }
@@ -559,17 +990,12 @@ async def messages(request: Request):
                     if hasattr(res, "success") and not res.success:
                         logging.warning("crawl_single_page returned success=false; using HTTP fallback url=%s", req.url)
                         try:
-                            r = requests.get(req.url, timeout=20)
-                            r.raise_for_status()
-                            html = r.text
-                            soup = BeautifulSoup(html, "html.parser")
-                            title = (soup.title.string.strip() if soup.title and soup.title.string else "")
-                            text = soup.get_text(" ")
+                            page = await html_extract.fetch_and_extract(req.url, max_chars=1000, timeout=20)
                             fallback_content = {
                                 "url": req.url,
-                                "status_code": r.status_code,
-                                "title": title,
-                                "excerpt": (text[:1000] if text else ""),
+                                "status_code": page.status_code,
+                                "title": page.title,
+                                "excerpt": page.text,
                                 "note": "playwright unsuccessful; returned fallback extraction",
                             }
                             response_payload = ok({"content": [{"type": "text", "text": json.dumps(fallback_content)}]})
@@ -590,21 +1016,16 @@ async def messages(request: Request):
                     # Fallback handled below
                     pass
                 except Exception:
-                    logging.exception("crawl_single_page failed, falling back to requests for url=%s", req.url)
-                    logging.exception("crawl_single_page failed, falling back to requests for url=%s", req.url)
+                    logging.exception("crawl_single_page failed, falling back to HTTP fetch for url=%s", req.url)
+                    logging.exception("crawl_single_page failed, falling back to HTTP fetch for url=%s", req.url)
                     # Fallback: basic HTTP GET + HTML extraction
                     try:
-                        r = requests.get(req.url, timeout=20)
-                        r.raise_for_status()
-                        html = r.text
-                        soup = BeautifulSoup(html, "html.parser")
-                        title = (soup.title.string.strip() if soup.title and soup.title.string else "")
-                        text = soup.get_text(" ")
+                        page = await html_extract.fetch_and_extract(req.url, max_chars=1000, timeout=20)
                         fallback_content = {
                             "url": req.url,
-                            "status_code": r.status_code,
-                            "title": title,
-                            "excerpt": (text[:1000] if text else ""),
+                            "status_code": page.status_code,
+                            "title": page.title,
+                            "excerpt": page.text,
                             "note": "playwright failed; returned fallback extraction",
                         }
                         response_payload = ok({"type": "result", "content": fallback_content})
@@ -617,21 +1038,26 @@ async def messages(request: Request):
                         return response_payload
             elif name == "smart_crawl_url":
                 try:
-                    req = CrawlRequest(
+                    req = SmartCrawlRequest(
                         url=str(arguments.get("url", "")),
                         extract_text=bool(arguments.get("extract_text", True)),
                         extract_metadata=bool(arguments.get("extract_metadata", True)),
+                        max_depth=int(arguments.get("max_depth", 3)),
+                        max_pages=int(arguments.get("max_pages", 100)),
+                        max_concurrent=int(arguments.get("max_concurrent", 0)),
+                        lastmod_since=arguments.get("lastmod_since"),
+                        skip_unchanged=bool(arguments.get("skip_unchanged", True)),
                     )
                 except Exception as e:
                     return err(-32602, "Invalid params for smart_crawl_url", str(e))
                 try:
-                    res = await asyncio.wait_for(smart_crawl_url(req), timeout=90)
+                    res = await asyncio.wait_for(smart_crawl_url(req), timeout=SMART_CRAWL_TIMEOUT)
                     result_payload = res.model_dump() if hasattr(res, "model_dump") else res.dict()
                     response_payload = ok({"content": [{"type": "text", "text": json.dumps(result_payload)}]})
                     await _mcp_response_queue.put(response_payload)
                     return response_payload
                 except asyncio.TimeoutError:
-                    logging.error("smart_crawl_url timeout after 90s: url=%s", req.url)
+                    logging.error("smart_crawl_url timeout after %ss: url=%s", SMART_CRAWL_TIMEOUT, req.url)
                     response_payload = err(-32003, "smart_crawl_url timeout", req.url)
                     await _mcp_response_queue.put(response_payload)
                     return response_payload
@@ -642,7 +1068,10 @@ async def messages(request: Request):
                     return response_payload
             elif name == "get_available_sources":
                 try:
-                    response_payload = ok({"content": [{"type": "text", "text": json.dumps({"success": True, "sources": []})}]})
+                    result_payload = await get_available_sources(
+                        limit=int(arguments.get("limit", 100)), offset=int(arguments.get("offset", 0))
+                    )
+                    response_payload = ok({"content": [{"type": "text", "text": json.dumps(result_payload)}]})
                     await _mcp_response_queue.put(response_payload)
                     return response_payload
                 except Exception as e:
@@ -654,7 +1083,11 @@ async def messages(request: Request):
                     req = RAGQueryRequest(
                         query=str(arguments.get("query", "")),
                         max_results=int(arguments.get("max_results", 5)),
-                        filters=arguments.get("filters", {}) or {}
+                        filters=arguments.get("filters", {}) or {},
+                        ef_search=arguments.get("ef_search"),
+                        probes=arguments.get("probes"),
+                        source_filter=arguments.get("source_filter") or arguments.get("source"),
+                        mode=arguments.get("mode"),
                     )
                 except Exception as e:
                     return err(-32602, "Invalid params for perform_rag_query", str(e))
@@ -723,6 +1156,7 @@ def main():
     print("="*70 + "\n")
     
     # Démarrer le serveur Uvicorn
+    import uvicorn
     uvicorn.run(
         app,
         host=HOST,
@@ -1,9 +1,12 @@
-from typing import Any, Dict
+import logging
+from typing import Any, Dict, List
 from urllib.parse import urlparse
 
-from chunking import split_into_chunks
+from cpu_pool import prepare_chunks
 from embeddings import embed_texts
-from vector_store import upsert_chunks
+from vector_store import chunk_hashes, delete_chunks_from, upsert_chunks
+
+logger = logging.getLogger(__name__)
 
 
 def _source_id_from_url(url: str) -> str:
@@ -14,9 +17,32 @@ def _source_id_from_url(url: str) -> str:
         return "unknown"
 
 
-def upsert_document(url: str, title: str, content: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
-    chunks = split_into_chunks(content)
-    embeddings = embed_texts([c["content"] for c in chunks]) if chunks else []
+def plan_document(url: str, content: str) -> Dict[str, Any]:
+    """Chunk `content` and diff it against the hashes stored for `url`."""
+    return diff_chunks(url, prepare_chunks(content))
+
+
+def diff_chunks(url: str, chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Plan for already prepared chunks (see `cpu_pool.prepare_chunks`): which ones to write."""
+    # Diff against what is stored for this URL: only new or changed chunks are embedded and written
+    try:
+        stored = chunk_hashes(url)
+    except Exception as e:
+        logger.warning(f"Unable to read stored chunk hashes for {url}, re-ingesting all chunks: {e}")
+        stored = {}
+    changed = [ch for ch in chunks if stored.get(ch["chunk_number"]) != ch["content_hash"]]
+    return {"chunks": chunks, "changed": changed, "stored": stored}
+
+
+def persist_document(
+    url: str,
+    title: str,
+    metadata: Dict[str, Any],
+    plan: Dict[str, Any],
+    embeddings: List[List[float]],
+) -> Dict[str, Any]:
+    """Write the changed chunks of a planned document and drop its stale trailing chunks."""
+    chunks, changed, stored = plan["chunks"], plan["changed"], plan["stored"]
     source_id = metadata.get("domain") or _source_id_from_url(url)
     # Prepare metadata that will be persisted alongside chunks
     enriched_meta = dict(metadata)
@@ -26,8 +52,27 @@ def upsert_document(url: str, title: str, content: str, metadata: Dict[str, Any]
         source_id=source_id,
         url=url,
         title=title,
-        chunks=chunks,
+        chunks=changed,
         embeddings=embeddings,
         extra_metadata=enriched_meta,
     )
-    return {"persisted": bool(count > 0), "chunks_count": count, "source_id": source_id}
+    # Trailing chunk_numbers that no longer exist in the new version of the page
+    stale = [n for n in stored if n >= len(chunks)]
+    if stale:
+        delete_chunks_from(url, len(chunks), source_id=source_id)
+    unchanged = len(chunks) - len(changed)
+    return {
+        "persisted": bool(count > 0 or (chunks and unchanged == len(chunks))),
+        "chunks_count": len(chunks),
+        "chunks_written": count,
+        "chunks_unchanged": unchanged,
+        "chunks_deleted": len(stale),
+        "source_id": source_id,
+    }
+
+
+def upsert_document(url: str, title: str, content: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+    plan = plan_document(url, content)
+    changed = plan["changed"]
+    embeddings = embed_texts([c["content"] for c in changed]) if changed else []
+    return persist_document(url, title, metadata, plan, embeddings)
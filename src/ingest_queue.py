@@ -0,0 +1,388 @@
+"""
+In-process background ingest pipeline: chunk -> embed -> persist.
+
+Stages are connected by bounded asyncio queues, so a burst of crawls applies
+backpressure to `submit()` instead of piling up unbounded work. Chunking is
+CPU-bound: queued documents are drained in batches and prepared in the process
+pool of `cpu_pool` (one chunk worker per process, so a large crawl uses every
+core). I/O-bound work (hash diff, embedding, Supabase calls) runs in worker
+threads, never on the event loop. Each submitted document is tracked as a job
+whose progress, including the time spent in each stage, can be polled by id.
+Env:
+  - INGEST_MODE: 'background' | 'inline' (default: 'background')
+  - INGEST_QUEUE_SIZE: capacity of each inter-stage queue (default: 64)
+  - INGEST_EMBED_WORKERS: concurrent embedding workers (default: 2)
+  - INGEST_PERSIST_WORKERS: concurrent persistence workers (default: 2)
+  - INGEST_JOBS_RETAINED: finished jobs kept in memory for status queries (default: 1000)
+  - INGEST_QUEUE_PATH: SQLite file making jobs durable across restarts (default: unset)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+import cpu_pool
+from embeddings import embed_texts
+from ingest import diff_chunks, persist_document
+
+logger = logging.getLogger(__name__)
+
+MODE = os.getenv("INGEST_MODE", "background").strip().lower()
+QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "64"))
+EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "2"))
+PERSIST_WORKERS = int(os.getenv("INGEST_PERSIST_WORKERS", "2"))
+JOBS_RETAINED = int(os.getenv("INGEST_JOBS_RETAINED", "1000"))
+QUEUE_PATH = os.getenv("INGEST_QUEUE_PATH", "").strip()
+
+_FINISHED = ("done", "failed")
+
+
+@dataclass
+class IngestJob:
+    job_id: str
+    url: str
+    title: str
+    content: str
+    metadata: Dict[str, Any]
+    status: str = "queued"
+    progress: Dict[str, Any] = field(default_factory=dict)
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    # Stage hand-off state, never persisted
+    plan: Optional[Dict[str, Any]] = field(default=None, repr=False)
+    embeddings: Optional[List[List[float]]] = field(default=None, repr=False)
+    on_done: Optional[Callable[["IngestJob"], None]] = field(default=None, repr=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "url": self.url,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+
+class _JobStore:
+    """Optional SQLite persistence so queued jobs survive a restart."""
+
+    def __init__(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS ingest_jobs ("
+            " job_id TEXT PRIMARY KEY, url TEXT NOT NULL, title TEXT, content TEXT,"
+            " metadata TEXT, status TEXT NOT NULL, progress TEXT, result TEXT, error TEXT,"
+            " created_at REAL, updated_at REAL)"
+        )
+        self._db.commit()
+
+    def insert(self, job: IngestJob) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO ingest_jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job.job_id, job.url, job.title, job.content, json.dumps(job.metadata), job.status,
+             json.dumps(job.progress), json.dumps(job.result), job.error, job.created_at, job.updated_at),
+        )
+        self._db.commit()
+
+    def update(self, job: IngestJob) -> None:
+        # Content is only needed until the job finishes
+        content = None if job.status in _FINISHED else job.content
+        self._db.execute(
+            "UPDATE ingest_jobs SET status=?, progress=?, result=?, error=?, updated_at=?, content=? WHERE job_id=?",
+            (job.status, json.dumps(job.progress), json.dumps(job.result), job.error, job.updated_at,
+             content, job.job_id),
+        )
+        self._db.commit()
+
+    def _row_to_job(self, row: Any) -> IngestJob:
+        return IngestJob(
+            job_id=row[0], url=row[1], title=row[2] or "", content=row[3] or "",
+            metadata=json.loads(row[4] or "{}"), status=row[5],
+            progress=json.loads(row[6] or "{}"), result=json.loads(row[7] or "null"),
+            error=row[8], created_at=row[9], updated_at=row[10],
+        )
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        row = self._db.execute("SELECT * FROM ingest_jobs WHERE job_id=?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def pending(self) -> List[IngestJob]:
+        rows = self._db.execute(
+            "SELECT * FROM ingest_jobs WHERE status NOT IN ('done', 'failed') ORDER BY created_at"
+        ).fetchall()
+        return [self._row_to_job(r) for r in rows]
+
+
+class IngestPipeline:
+    def __init__(
+        self,
+        *,
+        queue_size: int = QUEUE_SIZE,
+        embed_workers: int = EMBED_WORKERS,
+        persist_workers: int = PERSIST_WORKERS,
+        store_path: str = QUEUE_PATH,
+    ):
+        self._chunk_q: "asyncio.Queue[IngestJob]" = asyncio.Queue(maxsize=queue_size)
+        self._embed_q: "asyncio.Queue[IngestJob]" = asyncio.Queue(maxsize=queue_size)
+        self._persist_q: "asyncio.Queue[IngestJob]" = asyncio.Queue(maxsize=queue_size)
+        self._embed_workers = max(1, embed_workers)
+        self._persist_workers = max(1, persist_workers)
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._tasks: List["asyncio.Task[None]"] = []
+        self._store: Optional[_JobStore] = None
+        self._stage_seconds: Dict[str, float] = {}
+        self._stage_jobs: Dict[str, int] = {}
+        self.completed = 0
+        self.failed = 0
+        if store_path:
+            try:
+                self._store = _JobStore(store_path)
+            except Exception as e:
+                logger.warning(f"Ingest queue: durable store disabled ({store_path}): {e}")
+
+    async def start(self) -> None:
+        pool = cpu_pool.get_cpu_pool()
+        # One batch in flight per worker process keeps every core busy
+        for _ in range(pool.workers if pool is not None else 1):
+            self._tasks.append(asyncio.create_task(self._chunk_worker()))
+        for _ in range(self._embed_workers):
+            self._tasks.append(asyncio.create_task(self._embed_worker()))
+        for _ in range(self._persist_workers):
+            self._tasks.append(asyncio.create_task(self._persist_worker()))
+        if self._store is not None:
+            pending = self._store.pending()
+            if pending:
+                logger.info("Ingest queue: resuming %s jobs from %s", len(pending), QUEUE_PATH)
+                # Re-enqueue from a task so a full queue cannot block startup
+                self._tasks.append(asyncio.create_task(self._resume(pending)))
+
+    async def _resume(self, jobs: List[IngestJob]) -> None:
+        for job in jobs:
+            self._remember(job)
+            self._update(job, "queued")
+            await self._chunk_q.put(job)
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+    def _remember(self, job: IngestJob) -> None:
+        self._jobs[job.job_id] = job
+        # Evict the oldest finished jobs beyond the retention bound
+        if len(self._jobs) > JOBS_RETAINED:
+            for jid in [j for j, v in self._jobs.items() if v.status in _FINISHED]:
+                if len(self._jobs) <= JOBS_RETAINED:
+                    break
+                del self._jobs[jid]
+
+    def _update(self, job: IngestJob, status: str, **progress: Any) -> None:
+        job.status = status
+        job.progress.update(progress)
+        job.updated_at = time.time()
+        if self._store is not None:
+            try:
+                self._store.update(job)
+            except Exception as e:
+                logger.warning(f"Ingest queue: unable to persist job {job.job_id}: {e}")
+
+    def _timing(self, job: IngestJob, stage: str, seconds: float) -> None:
+        job.progress.setdefault("timings_ms", {})[stage] = round(seconds * 1000, 1)
+        self._stage_seconds[stage] = self._stage_seconds.get(stage, 0.0) + seconds
+        self._stage_jobs[stage] = self._stage_jobs.get(stage, 0) + 1
+
+    def _fail(self, job: IngestJob, stage: str, e: Exception) -> None:
+        logger.error(f"Ingest job {job.job_id} failed during {stage} for {job.url}: {e}")
+        job.error = str(e)
+        job.plan = job.embeddings = None
+        self.failed += 1
+        self._update(job, "failed", failed_stage=stage)
+
+    async def submit(
+        self,
+        url: str,
+        title: str,
+        content: str,
+        metadata: Dict[str, Any],
+        on_done: Optional[Callable[[IngestJob], None]] = None,
+    ) -> IngestJob:
+        """Queue a document for ingestion; waits while the pipeline is saturated.
+        `on_done` is called once the document is persisted (not for jobs resumed after a restart).
+        """
+        job = IngestJob(
+            job_id=uuid.uuid4().hex, url=url, title=title, content=content, metadata=dict(metadata), on_done=on_done
+        )
+        self._remember(job)
+        if self._store is not None:
+            try:
+                self._store.insert(job)
+            except Exception as e:
+                logger.warning(f"Ingest queue: unable to persist job {job.job_id}: {e}")
+        await self._chunk_q.put(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        job = self._jobs.get(job_id)
+        if job is None and self._store is not None:
+            job = self._store.get(job_id)
+        return job
+
+    async def _chunk_worker(self) -> None:
+        while True:
+            batch = [await self._chunk_q.get()]
+            # Take what is already queued, up to a batch, so one pool task carries several documents
+            while len(batch) < cpu_pool.BATCH:
+                try:
+                    batch.append(self._chunk_q.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                await self._chunk_batch(batch)
+            finally:
+                for _ in batch:
+                    self._chunk_q.task_done()
+
+    async def _chunk_batch(self, batch: List[IngestJob]) -> None:
+        for job in batch:
+            self._update(job, "chunking")
+        contents = [job.content for job in batch]
+        pool = cpu_pool.get_cpu_pool()
+        try:
+            if pool is not None:
+                prepared = await pool.prepare(contents)
+            else:
+                prepared = await asyncio.to_thread(cpu_pool.prepare_batch, contents)
+        except Exception as e:
+            for job in batch:
+                self._fail(job, "chunking", e)
+            return
+        await asyncio.gather(*(self._plan(job, *result) for job, result in zip(batch, prepared)))
+
+    async def _plan(
+        self, job: IngestJob, chunks: Optional[List[Dict[str, Any]]], error: Optional[str], seconds: float
+    ) -> None:
+        try:
+            if error is not None or chunks is None:
+                raise RuntimeError(error or "no chunks returned")
+            self._timing(job, "chunk", seconds)
+            t0 = time.perf_counter()
+            job.plan = await asyncio.to_thread(diff_chunks, job.url, chunks)
+            self._timing(job, "diff", time.perf_counter() - t0)
+            self._update(
+                job, "embedding_queued",
+                chunks_total=len(job.plan["chunks"]),
+                chunks_changed=len(job.plan["changed"]),
+            )
+            await self._embed_q.put(job)
+        except Exception as e:
+            self._fail(job, "chunking", e)
+
+    async def _embed_worker(self) -> None:
+        while True:
+            job = await self._embed_q.get()
+            try:
+                assert job.plan is not None
+                changed = job.plan["changed"]
+                self._update(job, "embedding")
+                t0 = time.perf_counter()
+                job.embeddings = (
+                    await asyncio.to_thread(embed_texts, [c["content"] for c in changed]) if changed else []
+                )
+                self._timing(job, "embed", time.perf_counter() - t0)
+                self._update(job, "persist_queued", chunks_embedded=len(job.embeddings))
+                await self._persist_q.put(job)
+            except Exception as e:
+                self._fail(job, "embedding", e)
+            finally:
+                self._embed_q.task_done()
+
+    async def _persist_worker(self) -> None:
+        while True:
+            job = await self._persist_q.get()
+            try:
+                assert job.plan is not None and job.embeddings is not None
+                self._update(job, "persisting")
+                t0 = time.perf_counter()
+                job.result = await asyncio.to_thread(
+                    persist_document, job.url, job.title, job.metadata, job.plan, job.embeddings
+                )
+                self._timing(job, "persist", time.perf_counter() - t0)
+                job.plan = job.embeddings = None
+                self.completed += 1
+                self._update(job, "done", chunks_written=job.result.get("chunks_written", 0))
+                if job.on_done is not None:
+                    try:
+                        job.on_done(job)
+                    except Exception as e:
+                        logger.warning(f"Ingest job {job.job_id}: completion callback failed: {e}")
+            except Exception as e:
+                self._fail(job, "persisting", e)
+            finally:
+                self._persist_q.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        pool = cpu_pool.get_cpu_pool()
+        return {
+            "mode": MODE,
+            "durable": self._store is not None,
+            "queued": {
+                "chunk": self._chunk_q.qsize(),
+                "embed": self._embed_q.qsize(),
+                "persist": self._persist_q.qsize(),
+            },
+            "completed": self.completed,
+            "failed": self.failed,
+            "stages": {
+                stage: {
+                    "jobs": self._stage_jobs[stage],
+                    "seconds": round(total, 3),
+                    "avg_ms": round(total * 1000 / self._stage_jobs[stage], 1),
+                }
+                for stage, total in self._stage_seconds.items()
+            },
+            "cpu_pool": pool.stats() if pool is not None else "disabled",
+        }
+
+
+_pipeline: Optional[IngestPipeline] = None
+
+
+def get_pipeline() -> Optional[IngestPipeline]:
+    return _pipeline
+
+
+async def start_pipeline() -> Optional[IngestPipeline]:
+    """Start the process-wide pipeline (no-op when INGEST_MODE=inline). The CPU pool is
+    started separately (cpu_pool.start_cpu_pool, a background warm-up of the server); until
+    it is, documents are chunked in a thread."""
+    global _pipeline
+    if _pipeline is not None or MODE != "background":
+        return _pipeline
+    _pipeline = IngestPipeline()
+    await _pipeline.start()
+    return _pipeline
+
+
+async def stop_pipeline() -> None:
+    global _pipeline
+    if _pipeline is not None:
+        await _pipeline.stop()
+        _pipeline = None
+    await cpu_pool.stop_cpu_pool()
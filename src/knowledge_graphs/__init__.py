@@ -2,14 +2,25 @@
 Package knowledge_graphs
 
 Ce package contient les modules pour la validation et l'analyse du graphe de connaissances.
+
+Les classes sont importées au premier accès (PEP 562) : importer `knowledge_graphs.utils`
+ne charge ni neo4j ni les analyseurs.
 """
 
-from knowledge_graphs.knowledge_graph_validator import KnowledgeGraphValidator
-from knowledge_graphs.ai_script_analyzer import AIScriptAnalyzer
-from knowledge_graphs.hallucination_reporter import HallucinationReporter
+import importlib
+
+_EXPORTS = {
+    'KnowledgeGraphValidator': 'knowledge_graphs.knowledge_graph_validator',
+    'AIScriptAnalyzer': 'knowledge_graphs.ai_script_analyzer',
+    'HallucinationReporter': 'knowledge_graphs.hallucination_reporter',
+}
+
+__all__ = list(_EXPORTS)
+
 
-__all__ = [
-    'KnowledgeGraphValidator',
-    'AIScriptAnalyzer',
-    'HallucinationReporter'
-]
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
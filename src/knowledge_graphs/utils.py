@@ -1,16 +1,32 @@
 """
 Utility functions for the Crawl4AI MCP server.
 """
+from __future__ import annotations
+
 import os
-import concurrent.futures
-from typing import List, Dict, Any, Optional, Tuple
+import hashlib
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, Tuple
 import json
-from supabase import create_client, Client
 from urllib.parse import urlparse
 import re
 import time
 import requests # Ajout pour les appels à Ollama
-import openai   # Réintroduit pour la génération contextuelle (Chat Completions)
+
+try:
+    from embedding_cache import cached_embed
+    import chunking
+    import contextualizer
+    import code_examples as code_examples_ingest
+    import code_blocks
+except ImportError:
+    from src.embedding_cache import cached_embed
+    from src import chunking
+    from src import contextualizer
+    from src import code_examples as code_examples_ingest
+    from src import code_blocks
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 # Configuration pour Ollama (pour les embeddings)
 # Les variables OLLAMA_ENDPOINT_URL et OLLAMA_EMBEDDING_MODEL doivent être dans le .env
@@ -21,8 +37,13 @@ if os.getenv("USE_CONTEXTUAL_EMBEDDINGS", "false").lower() == "true" or os.geten
     openai_api_key = os.getenv("OPENAI_API_KEY")
     if not openai_api_key:
         print("AVERTISSEMENT: OPENAI_API_KEY n'est pas définie, la génération contextuelle via OpenAI échouera si activée.")
-    else:
-        openai.api_key = openai_api_key
+
+def _openai():
+    """The `openai` module (Chat Completions), imported on first use: it is slow to import."""
+    import openai
+    if os.getenv("OPENAI_API_KEY"):
+        openai.api_key = os.getenv("OPENAI_API_KEY")
+    return openai
 
 def get_supabase_client(max_retries: int = 3, retry_delay: int = 2) -> Client:
     """
@@ -53,6 +74,7 @@ def get_supabase_client(max_retries: int = 3, retry_delay: int = 2) -> Client:
         try:
             print(f"[INFO] Attempting to connect to Supabase (attempt {attempt}/{max_retries})...")
             # Just create the client without testing the connection
+            from supabase import create_client
             client = create_client(url, key)
             print("[INFO] Successfully created Supabase client")
             return client
@@ -70,6 +92,7 @@ def get_supabase_client(max_retries: int = 3, retry_delay: int = 2) -> Client:
 def create_embeddings_batch(texts: List[str]) -> List[List[float]]:
     """
     Create embeddings for multiple texts in a single API call.
+    Texts already embedded with the same model are served from the shared embedding cache.
     
     Args:
         texts: List of texts to create embeddings for
@@ -79,7 +102,11 @@ def create_embeddings_batch(texts: List[str]) -> List[List[float]]:
     """
     if not texts:
         return []
-    
+    model = os.getenv("OLLAMA_EMBEDDING_MODEL") or ""
+    return cached_embed("ollama", model, texts, _create_embeddings_batch_uncached)
+
+def _create_embeddings_batch_uncached(texts: List[str]) -> List[List[float]]:
+    """Call Ollama for every text (see `create_embeddings_batch`)."""
     max_retries = 3
     retry_delay = 1.0  # Start with 1 second delay
     
@@ -169,6 +196,7 @@ def create_embedding(text: str) -> List[float]:
 def generate_contextual_embedding(full_document: str, chunk: str) -> Tuple[str, bool]:
     """
     Generate contextual information for a chunk within a document to improve retrieval.
+    Goes through the shared contextualizer (document summary + cache, see contextualizer.py).
     
     Args:
         full_document: The complete document text
@@ -179,46 +207,11 @@ def generate_contextual_embedding(full_document: str, chunk: str) -> Tuple[str,
         - The contextual text that situates the chunk within the document
         - Boolean indicating if contextual embedding was performed
     """
-    model_choice = os.getenv("MODEL_CHOICE")
-    
-    try:
-        # Create the prompt for generating contextual information
-        prompt = f"""<document> 
-{full_document[:25000]} 
-</document>
-Here is the chunk we want to situate within the whole document 
-<chunk> 
-{chunk}
-</chunk> 
-Please give a short succinct context to situate this chunk within the overall document for the purposes of improving search retrieval of the chunk. Answer only with the succinct context and nothing else."""
-
-        # Call the OpenAI API to generate contextual information
-        response = openai.chat.completions.create(
-            model=model_choice,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that provides concise contextual information."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=200
-        )
-        
-        # Extract the generated context
-        context = response.choices[0].message.content.strip()
-        
-        # Combine the context with the original chunk
-        contextual_text = f"{context}\n---\n{chunk}"
-        
-        return contextual_text, True
-    
-    except Exception as e:
-        print(f"Error generating contextual embedding: {e}. Using original chunk instead.")
-        return chunk, False
+    return contextualizer.contextualize_sync([(full_document, chunk)])[0]
 
 def process_chunk_with_context(args):
     """
     Process a single chunk with contextual embedding.
-    This function is designed to be used with concurrent.futures.
     
     Args:
         args: Tuple containing (url, content, full_document)
@@ -231,6 +224,59 @@ def process_chunk_with_context(args):
     url, content, full_document = args
     return generate_contextual_embedding(full_document, content)
 
+def _fetch_chunk_hashes(client: Client, table: str, urls: List[str]) -> Optional[Dict[Tuple[str, int], str]]:
+    """
+    Fetch the stored content hash of every chunk of the given URLs.
+    
+    Returns:
+        Mapping of (url, chunk_number) to content hash, or None if the hashes could not be read
+    """
+    hashes: Dict[Tuple[str, int], str] = {}
+    page_size = 1000  # PostgREST default max rows per response
+    try:
+        for i in range(0, len(urls), 50):
+            offset = 0
+            while True:
+                result = (
+                    client.table(table)
+                    .select("url,chunk_number,content_hash")
+                    .in_("url", urls[i:i + 50])
+                    .order("id")
+                    .range(offset, offset + page_size - 1)
+                    .execute()
+                )
+                rows = result.data or []
+                for row in rows:
+                    hashes[(row["url"], int(row["chunk_number"]))] = row.get("content_hash") or ""
+                if len(rows) < page_size:
+                    break
+                offset += page_size
+    except Exception as e:
+        print(f"Could not read stored chunk hashes from {table}: {e}")
+        return None
+    return hashes
+
+def _delete_trailing_chunks(
+    client: Client,
+    table: str,
+    urls: List[str],
+    chunk_numbers: List[int],
+    existing: Dict[Tuple[str, int], str]
+) -> None:
+    """Delete stored chunks whose chunk_number is past the end of the new version of their URL."""
+    last_chunk: Dict[str, int] = {}
+    for url, number in zip(urls, chunk_numbers):
+        last_chunk[url] = max(number, last_chunk.get(url, -1))
+    last_stored: Dict[str, int] = {}
+    for url, number in existing:
+        last_stored[url] = max(number, last_stored.get(url, -1))
+    for url, last in last_chunk.items():
+        if last_stored.get(url, -1) > last:
+            try:
+                client.table(table).delete().eq("url", url).gt("chunk_number", last).execute()
+            except Exception as e:
+                print(f"Error deleting stale chunks for URL {url}: {e}")
+
 def add_documents_to_supabase(
     client: Client, 
     urls: List[str], 
@@ -243,7 +289,10 @@ def add_documents_to_supabase(
 ) -> None:
     """
     Add documents to the Supabase crawled_pages table in batches.
-    Deletes existing records with the same URLs before inserting to prevent duplicates.
+    Chunks are hashed and diffed against the hashes stored for their URL: only new or
+    changed chunks are embedded and upserted, and trailing chunk numbers that no longer
+    exist are deleted. If the stored hashes cannot be read, every existing record for
+    the URLs is deleted and all chunks are re-inserted.
     
     Args:
         client: Supabase client
@@ -254,28 +303,56 @@ def add_documents_to_supabase(
         url_to_full_document: Dictionary mapping URLs to their full document content
         batch_size: Size of each batch for insertion
     """
-    # Get unique URLs to delete existing records
+    # Get unique URLs to diff against existing records
     unique_urls = list(set(urls))
-    
-    # Delete existing records for these URLs in a single operation
-    try:
-        if unique_urls:
-            # Use the .in_() filter to delete all records with matching URLs
-            client.table("crawled_pages").delete().in_("url", unique_urls).execute()
-    except Exception as e:
-        print(f"Batch delete failed: {e}. Trying one-by-one deletion as fallback.")
-        # Fallback: delete records one by one
-        for url in unique_urls:
-            try:
-                client.table("crawled_pages").delete().eq("url", url).execute()
-            except Exception as inner_e:
-                print(f"Error deleting record for URL {url}: {inner_e}")
-                # Continue with the next URL even if one fails
+    content_hashes = [hashlib.sha256(c.encode("utf-8")).hexdigest() for c in contents]
+    
+    existing = _fetch_chunk_hashes(client, "crawled_pages", unique_urls)
+    if existing is not None:
+        changed = [
+            i for i in range(len(contents))
+            if existing.get((urls[i], chunk_numbers[i])) != content_hashes[i]
+        ]
+        _delete_trailing_chunks(client, "crawled_pages", urls, chunk_numbers, existing)
+        print(f"Incremental ingest: {len(changed)}/{len(contents)} chunks new or changed")
+        urls = [urls[i] for i in changed]
+        chunk_numbers = [chunk_numbers[i] for i in changed]
+        contents = [contents[i] for i in changed]
+        metadatas = [metadatas[i] for i in changed]
+        content_hashes = [content_hashes[i] for i in changed]
+    else:
+        # Delete existing records for these URLs in a single operation
+        try:
+            if unique_urls:
+                # Use the .in_() filter to delete all records with matching URLs
+                client.table("crawled_pages").delete().in_("url", unique_urls).execute()
+        except Exception as e:
+            print(f"Batch delete failed: {e}. Trying one-by-one deletion as fallback.")
+            # Fallback: delete records one by one
+            for url in unique_urls:
+                try:
+                    client.table("crawled_pages").delete().eq("url", url).execute()
+                except Exception as inner_e:
+                    print(f"Error deleting record for URL {url}: {inner_e}")
+                    # Continue with the next URL even if one fails
     
     # Check if MODEL_CHOICE is set for contextual embeddings
     use_contextual_embeddings = os.getenv("USE_CONTEXTUAL_EMBEDDINGS", "false") == "true"
     print(f"\n\nUse contextual embeddings: {use_contextual_embeddings}\n\n")
     
+    # Contextualize every changed chunk at once: requests run concurrently (rate-limited), each
+    # document is summarized once for all its chunks, and results come back in input order
+    contextualized: List[Tuple[str, bool]] = []
+    if use_contextual_embeddings and contents:
+        started = time.perf_counter()
+        contextualized = contextualizer.contextualize_sync(
+            [(url_to_full_document.get(url, ""), content) for url, content in zip(urls, contents)]
+        )
+        print(
+            f"Contextualized {sum(ok for _, ok in contextualized)}/{len(contents)} chunks "
+            f"in {time.perf_counter() - started:.1f}s: {contextualizer.get_contextualizer().stats()}"
+        )
+    
     # Process in batches to avoid memory issues
     for i in range(0, len(contents), batch_size):
         batch_end = min(i + batch_size, len(contents))
@@ -286,40 +363,12 @@ def add_documents_to_supabase(
         batch_contents = contents[i:batch_end]
         batch_metadatas = metadatas[i:batch_end]
         
-        # Apply contextual embedding to each chunk if MODEL_CHOICE is set
-        if use_contextual_embeddings:
-            # Prepare arguments for parallel processing
-            process_args = []
-            for j, content in enumerate(batch_contents):
-                url = batch_urls[j]
-                full_document = url_to_full_document.get(url, "")
-                process_args.append((url, content, full_document))
-            
-            # Process in parallel using ThreadPoolExecutor
+        if contextualized:
             contextual_contents = []
-            with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-                # Submit all tasks and collect results
-                future_to_idx = {executor.submit(process_chunk_with_context, arg): idx 
-                                for idx, arg in enumerate(process_args)}
-                
-                # Process results as they complete
-                for future in concurrent.futures.as_completed(future_to_idx):
-                    idx = future_to_idx[future]
-                    try:
-                        result, success = future.result()
-                        contextual_contents.append(result)
-                        if success:
-                            batch_metadatas[idx]["contextual_embedding"] = True
-                    except Exception as e:
-                        print(f"Error processing chunk {idx}: {e}")
-                        # Use original content as fallback
-                        contextual_contents.append(batch_contents[idx])
-            
-            # Sort results back into original order if needed
-            if len(contextual_contents) != len(batch_contents):
-                print(f"Warning: Expected {len(batch_contents)} results but got {len(contextual_contents)}")
-                # Use original contents as fallback
-                contextual_contents = batch_contents
+            for j, (text, success) in enumerate(contextualized[i:batch_end]):
+                contextual_contents.append(text)
+                if success:
+                    batch_metadatas[j]["contextual_embedding"] = True
         else:
             # If not using contextual embeddings, use original contents
             contextual_contents = batch_contents
@@ -351,6 +400,7 @@ def add_documents_to_supabase(
                     **batch_metadatas[j]
                 },
                 "source_id": source_id,  # Add source_id field
+                "content_hash": content_hashes[i + j],  # Hash of the original chunk, for incremental re-ingest
                 "embedding": batch_embeddings[j]  # Use embedding from contextual content
             }
             
@@ -362,7 +412,7 @@ def add_documents_to_supabase(
         
         for retry in range(max_retries):
             try:
-                client.table("crawled_pages").insert(batch_data).execute()
+                client.table("crawled_pages").upsert(batch_data, on_conflict="url,chunk_number").execute()
                 # Success - break out of retry loop
                 break
             except Exception as e:
@@ -379,7 +429,7 @@ def add_documents_to_supabase(
                     successful_inserts = 0
                     for record in batch_data:
                         try:
-                            client.table("crawled_pages").insert(record).execute()
+                            client.table("crawled_pages").upsert(record, on_conflict="url,chunk_number").execute()
                             successful_inserts += 1
                         except Exception as individual_error:
                             print(f"Failed to insert individual record for URL {record['url']}: {individual_error}")
@@ -439,75 +489,8 @@ def extract_code_blocks(markdown_content: str, min_length: int = 1000) -> List[D
     Returns:
         List of dictionaries containing code blocks and their context
     """
-    code_blocks = []
-    
-    # Skip if content starts with triple backticks (edge case for files wrapped in backticks)
-    content = markdown_content.strip()
-    start_offset = 0
-    if content.startswith('```'):
-        # Skip the first triple backticks
-        start_offset = 3
-        print("Skipping initial triple backticks")
-    
-    # Find all occurrences of triple backticks
-    backtick_positions = []
-    pos = start_offset
-    while True:
-        pos = markdown_content.find('```', pos)
-        if pos == -1:
-            break
-        backtick_positions.append(pos)
-        pos += 3
-    
-    # Process pairs of backticks
-    i = 0
-    while i < len(backtick_positions) - 1:
-        start_pos = backtick_positions[i]
-        end_pos = backtick_positions[i + 1]
-        
-        # Extract the content between backticks
-        code_section = markdown_content[start_pos+3:end_pos]
-        
-        # Check if there's a language specifier on the first line
-        lines = code_section.split('\n', 1)
-        if len(lines) > 1:
-            # Check if first line is a language specifier (no spaces, common language names)
-            first_line = lines[0].strip()
-            if first_line and not ' ' in first_line and len(first_line) < 20:
-                language = first_line
-                code_content = lines[1].strip() if len(lines) > 1 else ""
-            else:
-                language = ""
-                code_content = code_section.strip()
-        else:
-            language = ""
-            code_content = code_section.strip()
-        
-        # Skip if code block is too short
-        if len(code_content) < min_length:
-            i += 2  # Move to next pair
-            continue
-        
-        # Extract context before (1000 chars)
-        context_start = max(0, start_pos - 1000)
-        context_before = markdown_content[context_start:start_pos].strip()
-        
-        # Extract context after (1000 chars)
-        context_end = min(len(markdown_content), end_pos + 3 + 1000)
-        context_after = markdown_content[end_pos + 3:context_end].strip()
-        
-        code_blocks.append({
-            'code': code_content,
-            'language': language,
-            'context_before': context_before,
-            'context_after': context_after,
-            'full_context': f"{context_before}\n\n{code_content}\n\n{context_after}"
-        })
-        
-        # Move to next pair (skip the closing backtick we just processed)
-        i += 2
-    
-    return code_blocks
+    # Single pass over the fences; strings are only built for blocks that pass min_length
+    return code_blocks.extract_code_blocks(markdown_content, min_length)
 
 
 def generate_code_example_summary(code: str, context_before: str, context_after: str) -> str:
@@ -541,7 +524,7 @@ Based on the code example and its surrounding context, provide a concise summary
 """
     
     try:
-        response = openai.chat.completions.create(
+        response = _openai().chat.completions.create(
             model=model_choice,
             messages=[
                 {"role": "system", "content": "You are a helpful assistant that provides concise code example summaries."},
@@ -563,111 +546,41 @@ def add_code_examples_to_supabase(
     urls: List[str],
     chunk_numbers: List[int],
     code_examples: List[str],
-    summaries: List[str],
+    summaries: Optional[List[str]],
     metadatas: List[Dict[str, Any]],
-    batch_size: int = 20
-):
+    batch_size: int = 20,
+    contexts: Optional[List[Tuple[str, str]]] = None
+) -> Dict[str, Any]:
     """
-    Add code examples to the Supabase code_examples table in batches.
+    Add code examples to the Supabase code_examples table.
+    Runs the pipelined ingester of code_examples.py: missing summaries are generated in
+    parallel, embeddings are batched across URLs, previous rows of the URLs are removed
+    with one bulk delete and rows are upserted in bulk on (url, chunk_number).
     
     Args:
         client: Supabase client
         urls: List of URLs
         chunk_numbers: List of chunk numbers
         code_examples: List of code example contents
-        summaries: List of code example summaries
+        summaries: List of code example summaries (None or empty entries are generated)
         metadatas: List of metadata dictionaries
-        batch_size: Size of each batch for insertion
+        batch_size: Size of each embedding / upsert batch
+        contexts: Optional (context_before, context_after) per example, used to generate summaries
+        
+    Returns:
+        Counts, per-stage seconds and examples_per_sec of the run
     """
     if not urls:
-        return
-        
-    # Delete existing records for these URLs
-    unique_urls = list(set(urls))
-    for url in unique_urls:
-        try:
-            client.table('code_examples').delete().eq('url', url).execute()
-        except Exception as e:
-            print(f"Error deleting existing code examples for {url}: {e}")
-    
-    # Process in batches
-    total_items = len(urls)
-    for i in range(0, total_items, batch_size):
-        batch_end = min(i + batch_size, total_items)
-        batch_texts = []
-        
-        # Create combined texts for embedding (code + summary)
-        for j in range(i, batch_end):
-            combined_text = f"{code_examples[j]}\n\nSummary: {summaries[j]}"
-            batch_texts.append(combined_text)
-        
-        # Create embeddings for the batch
-        embeddings = create_embeddings_batch(batch_texts)
-        
-        # Check if embeddings are valid (not all zeros)
-        valid_embeddings = []
-        for embedding in embeddings:
-            if embedding and not all(v == 0.0 for v in embedding):
-                valid_embeddings.append(embedding)
-            else:
-                print(f"Warning: Zero or invalid embedding detected, creating new one...")
-                # Try to create a single embedding as fallback
-                single_embedding = create_embedding(batch_texts[len(valid_embeddings)])
-                valid_embeddings.append(single_embedding)
-        
-        # Prepare batch data
-        batch_data = []
-        for j, embedding in enumerate(valid_embeddings):
-            idx = i + j
-            
-            # Extract source_id from URL
-            parsed_url = urlparse(urls[idx])
-            source_id = parsed_url.netloc or parsed_url.path
-            
-            current_metadata = metadatas[idx].copy()
-            current_metadata['collection_id'] = collection_id
-            
-            batch_data.append({
-                'url': urls[idx],
-                'chunk_number': chunk_numbers[idx],
-                'content': code_examples[idx],
-                'summary': summaries[idx],
-                'metadata': current_metadata,  # Store as JSON object, not string
-                'source_id': source_id,
-                'embedding': embedding
-            })
-        
-        # Insert batch into Supabase with retry logic
-        max_retries = 3
-        retry_delay = 1.0  # Start with 1 second delay
-        
-        for retry in range(max_retries):
-            try:
-                client.table('code_examples').insert(batch_data).execute()
-                # Success - break out of retry loop
-                break
-            except Exception as e:
-                if retry < max_retries - 1:
-                    print(f"Error inserting batch into Supabase (attempt {retry + 1}/{max_retries}): {e}")
-                    print(f"Retrying in {retry_delay} seconds...")
-                    time.sleep(retry_delay)
-                    retry_delay *= 2  # Exponential backoff
-                else:
-                    # Final attempt failed
-                    print(f"Failed to insert batch after {max_retries} attempts: {e}")
-                    # Optionally, try inserting records one by one as a last resort
-                    print("Attempting to insert records individually...")
-                    successful_inserts = 0
-                    for record in batch_data:
-                        try:
-                            client.table('code_examples').insert(record).execute()
-                            successful_inserts += 1
-                        except Exception as individual_error:
-                            print(f"Failed to insert individual record for URL {record['url']}: {individual_error}")
-                    
-                    if successful_inserts > 0:
-                        print(f"Successfully inserted {successful_inserts}/{len(batch_data)} records individually")
-        print(f"Inserted batch {i//batch_size + 1} of {(total_items + batch_size - 1)//batch_size} code examples")
+        return {"examples": 0, "written": 0, "failed": 0, "examples_per_sec": 0.0}
+    report = code_examples_ingest.ingest_code_examples(
+        client, create_embeddings_batch, urls, chunk_numbers, code_examples, summaries, metadatas,
+        contexts=contexts, batch_size=batch_size
+    )
+    print(
+        f"Stored {report['written']}/{report['examples']} code examples in {report['seconds']}s "
+        f"({report['examples_per_sec']} examples/s, {report['failed']} failed, stages: {report['stage_seconds']})"
+    )
+    return report
 
 
 def update_source_info(client: Client, source_id: str, summary: str, word_count: int):
@@ -678,13 +591,12 @@ def update_source_info(client: Client, source_id: str, summary: str, word_count:
         client: Supabase client
         source_id: The source ID (domain)
         summary: Summary of the source
-        word_count: Total word count for the source
+        word_count: Unused: sources.total_word_count is maintained from the chunks (migrations/008)
     """
     try:
         # Try to update existing source
         result = client.table('sources').update({
             'summary': summary,
-            'total_word_count': word_count,
             'updated_at': 'now()'
         }).eq('source_id', source_id).execute()
         
@@ -692,8 +604,7 @@ def update_source_info(client: Client, source_id: str, summary: str, word_count:
         if not result.data:
             client.table('sources').insert({
                 'source_id': source_id,
-                'summary': summary,
-                'total_word_count': word_count
+                'summary': summary
             }).execute()
             print(f"Created new source: {source_id}")
         else:
@@ -739,7 +650,7 @@ The above content is from the documentation for '{source_id}'. Please provide a
     
     try:
         # Call the OpenAI API to generate the summary
-        response = openai.chat.completions.create(
+        response = _openai().chat.completions.create(
             model=model_choice,
             messages=[
                 {"role": "system", "content": "You are a helpful assistant that provides concise library/tool/framework summaries."},
@@ -825,37 +736,9 @@ def smart_chunk_markdown(text: str, chunk_size: int = 5000) -> List[str]:
     Returns:
         List of text chunks
     """
-    chunks = []
-    start = 0
-    text_length = len(text)
-    
-    # If the text is already smaller than chunk_size, return it as is
-    if text_length <= chunk_size:
-        return [text]
-    
-    while start < text_length:
-        # Calculate end position
-        end = start + chunk_size
-        
-        # If we're at the end of the text, just take what's left
-        if end >= text_length:
-            chunks.append(text[start:].strip())
-            break
-            
-        # Try to find a good breaking point (end of paragraph or code block)
-        # Look for the last newline in the chunk
-        newline_pos = text.rfind('\n', start, end)
-        
-        # If we found a newline, use it as the breaking point
-        if newline_pos > start:
-            chunks.append(text[start:newline_pos].strip())
-            start = newline_pos + 1
-        else:
-            # If no newline found, just split at chunk_size
-            chunks.append(text[start:end].strip())
-            start = end
-    
-    return chunks
+    # Single pass over the markdown; fences and tables are kept whole (see chunking.py)
+    max_tokens = max(1, int(chunk_size / chunking.CHARS_PER_TOKEN))
+    return [c["content"] for c in chunking.split_into_chunks(text, max_tokens=max_tokens)]
 
 
 def extract_section_info(chunk: str) -> Dict[str, Any]:
@@ -0,0 +1,566 @@
+"""
+Embedded vector backend for `vector_store` (VECTOR_BACKEND=local), for air-gapped
+and edge deployments that run without Supabase or Postgres.
+
+Vectors live in one memory-mapped matrix per embedding dimension, rows
+L2-normalized so cosine similarity is a dot product, and are indexed by an HNSW
+graph (hnswlib, optional: without it searches scan the matrix with numpy).
+Content, metadata and sources live in a SQLite side table whose rows point at
+their matrix slot. Slots are append-only: an updated chunk gets a new slot and
+its old one is tombstoned, a deleted chunk is only tombstoned. Once tombstones
+exceed LOCAL_COMPACT_RATIO of a matrix, a background thread rewrites its live
+rows into a new generation of files and swaps it in.
+Env:
+  - LOCAL_STORE_PATH: directory holding the store (default: data/vector_store)
+  - LOCAL_STORE_DTYPE: float32 | float16 storage of the matrices (default: float32)
+  - LOCAL_HNSW_M / LOCAL_HNSW_EF_CONSTRUCTION: HNSW build parameters (default: 16 / 200)
+  - LOCAL_COMPACT_RATIO: tombstone fraction that triggers compaction (default: 0.2)
+  - LOCAL_EXACT_THRESHOLD: filtered searches over at most this many chunks scan them exactly (default: 2000)
+"""
+
+from __future__ import annotations
+
+import glob
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    import hnswlib  # type: ignore
+except ImportError:  # pragma: no cover
+    hnswlib = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+STORE_PATH = os.getenv("LOCAL_STORE_PATH", "data/vector_store").strip()
+STORE_DTYPE = os.getenv("LOCAL_STORE_DTYPE", "float32").strip().lower()
+HNSW_M = int(os.getenv("LOCAL_HNSW_M", "16"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("LOCAL_HNSW_EF_CONSTRUCTION", "200"))
+COMPACT_RATIO = float(os.getenv("LOCAL_COMPACT_RATIO", "0.2"))
+EXACT_THRESHOLD = int(os.getenv("LOCAL_EXACT_THRESHOLD", "2000"))
+
+# Same columns as crawled_pages rows built by vector_store._chunk_rows
+EMBEDDING_COLUMNS = {768: "embedding_768", 1536: "embedding_1536"}
+_MIN_CAPACITY = 1024
+_COMPACT_MIN_TOMBSTONES = 1024
+_SCAN_BLOCK = 65536
+
+
+# sources.chunk_count / total_word_count follow the chunks, as in migrations/008. The
+# upsert's conflict branch fires the update trigger, compaction (slot moves) none.
+_SOURCE_COUNTERS = (
+    "CREATE TRIGGER IF NOT EXISTS chunks_source_counters_insert AFTER INSERT ON chunks BEGIN"
+    " UPDATE sources SET chunk_count = chunk_count + 1,"
+    " total_word_count = total_word_count + COALESCE(json_extract(NEW.metadata, '$.word_count'), 0)"
+    " WHERE source_id = NEW.source_id; END;"
+    "CREATE TRIGGER IF NOT EXISTS chunks_source_counters_delete AFTER DELETE ON chunks BEGIN"
+    " UPDATE sources SET chunk_count = chunk_count - 1,"
+    " total_word_count = total_word_count - COALESCE(json_extract(OLD.metadata, '$.word_count'), 0)"
+    " WHERE source_id = OLD.source_id; END;"
+    "CREATE TRIGGER IF NOT EXISTS chunks_source_counters_update AFTER UPDATE OF metadata, source_id ON chunks BEGIN"
+    " UPDATE sources SET chunk_count = chunk_count - 1,"
+    " total_word_count = total_word_count - COALESCE(json_extract(OLD.metadata, '$.word_count'), 0)"
+    " WHERE source_id = OLD.source_id;"
+    " UPDATE sources SET chunk_count = chunk_count + 1,"
+    " total_word_count = total_word_count + COALESCE(json_extract(NEW.metadata, '$.word_count'), 0)"
+    " WHERE source_id = NEW.source_id; END;"
+)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _normalize(vecs: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vecs / norms
+
+
+def _contains(value: Any, pattern: Any) -> bool:
+    """jsonb `@>` semantics for the metadata filter."""
+    if isinstance(pattern, dict):
+        return isinstance(value, dict) and all(k in value and _contains(value[k], v) for k, v in pattern.items())
+    if isinstance(pattern, list):
+        return isinstance(value, list) and all(any(_contains(v, p) for v in value) for p in pattern)
+    return value == pattern
+
+
+class _Matrix:
+    """Append-only memory-mapped rows of one dimension, with a tombstone mask."""
+
+    def __init__(self, root: str, dim: int, dtype: str, generation: int, count: int):
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.generation = generation
+        self.path = os.path.join(root, f"vectors_{dim}.g{generation}.{self.dtype.name}")
+        self.count = count
+        self.alive = np.zeros(0, dtype=bool)
+        self.data: Optional[np.memmap] = None
+        existing = os.path.getsize(self.path) // (dim * self.dtype.itemsize) if os.path.exists(self.path) else 0
+        self._map(max(existing, count, _MIN_CAPACITY))
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self.data is None else self.data.shape[0]
+
+    @property
+    def tombstones(self) -> int:
+        return self.count - int(self.alive[: self.count].sum())
+
+    def _map(self, capacity: int) -> None:
+        size = capacity * self.dim * self.dtype.itemsize
+        with open(self.path, "ab") as f:
+            if f.tell() < size:
+                f.truncate(size)
+        if self.data is not None:
+            self.data.flush()
+        # Readers holding the previous map keep a valid view of the rows it covered
+        self.data = np.memmap(self.path, dtype=self.dtype, mode="r+", shape=(capacity, self.dim))
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: len(self.alive)] = self.alive[:capacity]
+        self.alive = alive
+
+    def append(self, vecs: np.ndarray) -> np.ndarray:
+        end = self.count + len(vecs)
+        if end > self.capacity:
+            self._map(max(end, self.capacity * 2))
+        self.data[self.count:end] = vecs
+        slots = np.arange(self.count, end)
+        self.alive[slots] = True
+        self.count = end
+        return slots
+
+    def flush(self) -> None:
+        if self.data is not None:
+            self.data.flush()
+
+
+class _Graph:
+    """hnswlib index over a matrix's slots (labels = slots); inner product on normalized rows."""
+
+    def __init__(self, path: str, dim: int, capacity: int):
+        self.path = path
+        self.index = hnswlib.Index(space="ip", dim=dim)
+        if os.path.exists(path):
+            self.index.load_index(path, max_elements=capacity)
+        else:
+            self.index.init_index(max_elements=capacity, ef_construction=HNSW_EF_CONSTRUCTION, M=HNSW_M)
+
+    @property
+    def size(self) -> int:
+        return self.index.get_current_count()
+
+    def add(self, vecs: np.ndarray, slots: np.ndarray) -> None:
+        if len(slots) == 0:
+            return
+        needed = int(slots.max()) + 1
+        if needed > self.index.get_max_elements():
+            self.index.resize_index(max(needed, self.index.get_max_elements() * 2))
+        self.index.add_items(np.asarray(vecs, dtype=np.float32), slots)
+
+    def delete(self, slot: int) -> None:
+        try:
+            self.index.mark_deleted(int(slot))
+        except RuntimeError:
+            pass  # already deleted
+
+    def query(self, vec: np.ndarray, k: int, ef: int, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        self.index.set_ef(max(ef, k))
+        flt = (lambda label: bool(allowed[label])) if allowed is not None else None
+        labels, distances = self.index.knn_query(vec.reshape(1, -1), k=k, filter=flt)
+        return labels[0], 1.0 - distances[0]
+
+    def save(self) -> None:
+        self.index.save_index(self.path)
+
+
+class LocalBackend:
+    """Matrices + graphs + SQLite side table under one directory. Thread-safe."""
+
+    def __init__(self, path: str = STORE_PATH, dtype: str = STORE_DTYPE):
+        if dtype not in ("float32", "float16"):
+            raise RuntimeError(f"LOCAL_STORE_DTYPE must be float32 or float16, not '{dtype}'")
+        os.makedirs(path, exist_ok=True)
+        self.root = path
+        self.dtype = dtype
+        self._lock = threading.RLock()
+        self._compacting: Dict[int, threading.Thread] = {}
+        self._db = sqlite3.connect(os.path.join(path, "store.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            " source_id TEXT PRIMARY KEY, summary TEXT, total_word_count INTEGER DEFAULT 0,"
+            " chunk_count INTEGER DEFAULT 0, created_at TEXT, updated_at TEXT);"
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT NOT NULL, chunk_number INTEGER NOT NULL,"
+            " content TEXT, metadata TEXT, source_id TEXT, content_hash TEXT,"
+            " dim INTEGER NOT NULL, slot INTEGER NOT NULL, created_at TEXT, UNIQUE (url, chunk_number));"
+            "CREATE INDEX IF NOT EXISTS idx_chunks_slot ON chunks (dim, slot);"
+            "CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks (source_id);"
+            "CREATE TABLE IF NOT EXISTS matrices ("
+            " dim INTEGER PRIMARY KEY, generation INTEGER NOT NULL, count INTEGER NOT NULL);"
+        )
+        if "chunk_count" not in {r[1] for r in self._db.execute("PRAGMA table_info(sources)")}:
+            # Store created before the counters: add them and count the existing chunks once
+            self._db.execute("ALTER TABLE sources ADD COLUMN chunk_count INTEGER DEFAULT 0")
+            self._db.execute(
+                "UPDATE sources SET"
+                " chunk_count = (SELECT COUNT(*) FROM chunks c WHERE c.source_id = sources.source_id),"
+                " total_word_count = (SELECT COALESCE(SUM(json_extract(c.metadata, '$.word_count')), 0)"
+                " FROM chunks c WHERE c.source_id = sources.source_id)"
+            )
+        self._db.executescript(_SOURCE_COUNTERS)
+        self._db.commit()
+        self._matrices: Dict[int, _Matrix] = {}
+        self._graphs: Dict[int, _Graph] = {}
+        for dim, generation, count in self._db.execute("SELECT dim, generation, count FROM matrices").fetchall():
+            self._open(dim, generation, count)
+        if hnswlib is None:
+            logger.info("Local vector store: hnswlib not installed, searches scan the matrices exactly")
+
+    # --- Storage ---
+
+    def _graph_path(self, dim: int, generation: int) -> str:
+        return os.path.join(self.root, f"hnsw_{dim}.g{generation}.bin")
+
+    def _open(self, dim: int, generation: int, count: int) -> _Matrix:
+        # Files of other generations are leftovers of an interrupted compaction
+        for stale in glob.glob(os.path.join(self.root, f"*_{dim}.g*.*")):
+            if f".g{generation}." not in os.path.basename(stale):
+                os.remove(stale)
+        for existing in glob.glob(os.path.join(self.root, f"vectors_{dim}.g{generation}.*")):
+            if not existing.endswith(f".{self.dtype}"):
+                raise RuntimeError(f"{existing} does not match LOCAL_STORE_DTYPE={self.dtype}")
+        matrix = _Matrix(self.root, dim, self.dtype, generation, count)
+        for (slot,) in self._db.execute("SELECT slot FROM chunks WHERE dim=?", (dim,)):
+            matrix.alive[slot] = True
+        self._matrices[dim] = matrix
+        if hnswlib is not None:
+            graph = _Graph(self._graph_path(dim, generation), dim, matrix.capacity)
+            # The graph is saved on close: add the rows written since, drop the tombstones
+            for start in range(graph.size, count, _SCAN_BLOCK):
+                end = min(start + _SCAN_BLOCK, count)
+                graph.add(matrix.data[start:end], np.arange(start, end))
+            for slot in np.flatnonzero(~matrix.alive[:count]):
+                graph.delete(slot)
+            self._graphs[dim] = graph
+        return matrix
+
+    def _matrix(self, dim: int) -> _Matrix:
+        matrix = self._matrices.get(dim)
+        if matrix is None:
+            self._db.execute("INSERT INTO matrices (dim, generation, count) VALUES (?, 0, 0)", (dim,))
+            matrix = self._open(dim, 0, 0)
+        return matrix
+
+    def _tombstone(self, dim: int, slot: int) -> None:
+        self._matrices[dim].alive[slot] = False
+        graph = self._graphs.get(dim)
+        if graph is not None:
+            graph.delete(slot)
+
+    def upsert_sources(self, sources: Sequence[Dict[str, Any]]) -> None:
+        if not sources:
+            return
+        now = _now()
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO sources (source_id, summary, created_at, updated_at) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (source_id) DO UPDATE SET summary = excluded.summary, updated_at = excluded.updated_at",
+                [(s["source_id"], s.get("summary") or s["source_id"], now, now) for s in sources],
+            )
+            self._db.commit()
+
+    def upsert_rows(self, rows: Sequence[Dict[str, Any]]) -> int:
+        """Upsert crawled_pages-shaped rows (as built by vector_store) on (url, chunk_number)."""
+        by_dim: Dict[int, List[Dict[str, Any]]] = {}
+        for row in rows:
+            dim = next((d for d, c in EMBEDDING_COLUMNS.items() if c in row), None)
+            if dim is not None:
+                by_dim.setdefault(dim, []).append(row)
+        if not by_dim:
+            return 0
+        now = _now()
+        written = 0
+        with self._lock:
+            for dim, batch in by_dim.items():
+                matrix = self._matrix(dim)
+                vecs = _normalize(np.asarray([r[EMBEDDING_COLUMNS[dim]] for r in batch], dtype=np.float32))
+                # Vectors first: rows past the committed count are overwritten after a crash
+                slots = matrix.append(vecs.astype(matrix.dtype))
+                matrix.flush()
+                for row in batch:
+                    old = self._db.execute(
+                        "SELECT dim, slot FROM chunks WHERE url=? AND chunk_number=?", (row["url"], row["chunk_number"])
+                    ).fetchone()
+                    if old is not None:
+                        self._tombstone(*old)
+                self._db.executemany(
+                    "INSERT INTO chunks (url, chunk_number, content, metadata, source_id, content_hash, dim, slot, created_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (url, chunk_number) DO UPDATE SET"
+                    " content = excluded.content, metadata = excluded.metadata, source_id = excluded.source_id,"
+                    " content_hash = excluded.content_hash, dim = excluded.dim, slot = excluded.slot",
+                    [
+                        (r["url"], r["chunk_number"], r.get("content", ""), json.dumps(r.get("metadata") or {}),
+                         r.get("source_id"), r.get("content_hash"), dim, int(s), now)
+                        for r, s in zip(batch, slots)
+                    ],
+                )
+                self._db.execute("UPDATE matrices SET count=? WHERE dim=?", (matrix.count, dim))
+                self._db.executemany(
+                    "UPDATE sources SET updated_at=? WHERE source_id=?", [(now, s) for s in {r.get("source_id") for r in batch}]
+                )
+                self._db.commit()
+                graph = self._graphs.get(dim)
+                if graph is not None:
+                    graph.add(vecs, slots)
+                written += len(batch)
+            for dim in by_dim:
+                self._maybe_compact(dim)
+        return written
+
+    def chunk_hashes(self, url: str) -> Dict[int, str]:
+        with self._lock:
+            rows = self._db.execute("SELECT chunk_number, content_hash FROM chunks WHERE url=?", (url,)).fetchall()
+        return {int(n): (h or "") for n, h in rows}
+
+    def delete_chunks_from(self, url: str, first_chunk_number: int) -> None:
+        with self._lock:
+            gone = self._db.execute(
+                "SELECT dim, slot FROM chunks WHERE url=? AND chunk_number>=?", (url, first_chunk_number)
+            ).fetchall()
+            self._db.execute("DELETE FROM chunks WHERE url=? AND chunk_number>=?", (url, first_chunk_number))
+            self._db.commit()
+            for dim, slot in gone:
+                self._tombstone(dim, slot)
+            for dim in {d for d, _ in gone}:
+                self._maybe_compact(dim)
+
+    def list_sources(self) -> List[str]:
+        with self._lock:
+            return [r[0] for r in self._db.execute("SELECT source_id FROM sources ORDER BY source_id")]
+
+    def source_stats(self, limit: int, offset: int) -> List[Dict[str, Any]]:
+        """Same rows as the list_source_stats SQL function (migrations/008): sources only."""
+        with self._lock:
+            (total,) = self._db.execute("SELECT COUNT(*) FROM sources").fetchone()
+            rows = self._db.execute(
+                "SELECT source_id, summary, total_word_count, chunk_count, created_at, updated_at"
+                " FROM sources ORDER BY source_id LIMIT ? OFFSET ?",
+                (limit, offset),
+            ).fetchall()
+        keys = ("source_id", "summary", "total_words", "chunk_count", "created_at", "updated_at")
+        return [dict(zip(keys, r), total_sources=total) for r in rows]
+
+    # --- Search ---
+
+    def _exact(self, matrix: _Matrix, vec: np.ndarray, k: int, slots: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        if slots is None:
+            scores = np.full(matrix.count, -np.inf, dtype=np.float32)
+            for start in range(0, matrix.count, _SCAN_BLOCK):
+                end = min(start + _SCAN_BLOCK, matrix.count)
+                scores[start:end] = matrix.data[start:end].astype(np.float32) @ vec
+            scores[~matrix.alive[: matrix.count]] = -np.inf
+            slots = np.arange(matrix.count)
+        else:
+            scores = matrix.data[slots].astype(np.float32) @ vec
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return slots[top], scores[top]
+
+    def _allowed_slots(self, dim: int, filter: Optional[Dict[str, Any]], source_filter: Optional[str]) -> np.ndarray:
+        sql, args = "SELECT slot, metadata FROM chunks WHERE dim=?", [dim]
+        if source_filter is not None:
+            sql += " AND source_id=?"
+            args.append(source_filter)
+        rows = self._db.execute(sql, args).fetchall()
+        if filter:
+            rows = [r for r in rows if _contains(json.loads(r[1] or "{}"), filter)]
+        return np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows))
+
+    def search(
+        self,
+        query_embedding: Sequence[float],
+        match_count: int = 10,
+        filter: Optional[Dict[str, Any]] = None,
+        source_filter: Optional[str] = None,
+        ef_search: Optional[int] = None,
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Nearest chunks and the plan used: hnsw, hnsw_filtered or exact (small filtered
+        sets, or no hnswlib), mirroring match_crawled_pages_filtered."""
+        dim = len(query_embedding)
+        vec = _normalize(np.asarray([query_embedding], dtype=np.float32))[0]
+        with self._lock:
+            matrix = self._matrices.get(dim)
+            if matrix is None or matrix.count == 0:
+                return [], {"plan": "exact", "prefilter_rows": 0}
+            graph = self._graphs.get(dim)
+            ef = ef_search or 0
+            plan: Dict[str, Any]
+            if filter or source_filter is not None:
+                allowed = self._allowed_slots(dim, filter, source_filter)
+                plan = {"prefilter_rows": len(allowed)}
+                if graph is None or len(allowed) <= EXACT_THRESHOLD:
+                    slots, scores = self._exact(matrix, vec, match_count, allowed)
+                    plan["plan"] = "exact"
+                else:
+                    mask = np.zeros(matrix.count, dtype=bool)
+                    mask[allowed] = True
+                    try:
+                        slots, scores = graph.query(vec, min(match_count, len(allowed)), ef, mask)
+                        plan["plan"] = "hnsw_filtered"
+                    except RuntimeError:
+                        # hnswlib could not reach k matching rows: scan them
+                        slots, scores = self._exact(matrix, vec, match_count, allowed)
+                        plan["plan"] = "exact"
+            else:
+                live = matrix.count - matrix.tombstones
+                plan = {"plan": "hnsw" if graph is not None else "exact"}
+                try:
+                    if graph is None:
+                        raise RuntimeError("no graph")
+                    slots, scores = graph.query(vec, min(match_count, live), ef) if live else ([], [])
+                except RuntimeError:
+                    slots, scores = self._exact(matrix, vec, match_count, None)
+                    plan["plan"] = "exact"
+            results = self._rows(dim, slots, scores)
+        return results, plan
+
+    def _rows(self, dim: int, slots: Sequence[int], scores: Sequence[float]) -> List[Dict[str, Any]]:
+        if len(slots) == 0:
+            return []
+        similarity = {int(s): float(v) for s, v in zip(slots, scores)}
+        marks = ",".join("?" * len(similarity))
+        rows = self._db.execute(
+            f"SELECT id, url, chunk_number, content, metadata, source_id, slot FROM chunks"
+            f" WHERE dim=? AND slot IN ({marks})",
+            [dim, *similarity],
+        ).fetchall()
+        out = [
+            {
+                "id": r[0], "url": r[1], "chunk_number": r[2], "content": r[3],
+                "metadata": json.loads(r[4] or "{}"), "source_id": r[5], "similarity": similarity[r[6]],
+            }
+            for r in rows
+        ]
+        out.sort(key=lambda r: r["similarity"], reverse=True)
+        return out
+
+    # --- Compaction ---
+
+    def _maybe_compact(self, dim: int) -> None:
+        matrix = self._matrices[dim]
+        dead = matrix.tombstones
+        if dead < _COMPACT_MIN_TOMBSTONES or dead < COMPACT_RATIO * matrix.count:
+            return
+        running = self._compacting.get(dim)
+        if running is not None and running.is_alive():
+            return
+        thread = threading.Thread(target=self.compact, args=(dim,), name=f"local-store-compact-{dim}", daemon=True)
+        self._compacting[dim] = thread
+        thread.start()
+
+    def compact(self, dim: int) -> None:
+        """Rewrite the live rows of a matrix (and its graph) into a new file generation."""
+        generation = self._matrices[dim].generation + 1
+        try:
+            self._compact(dim, generation)
+        except Exception as e:
+            logger.warning(f"Local vector store: compaction of dim {dim} failed: {e}")
+            for path in glob.glob(os.path.join(self.root, f"*_{dim}.g{generation}.*")):
+                os.remove(path)
+
+    def _compact(self, dim: int, generation: int) -> None:
+        # Slots are append-only, so the bulk copy and the graph build run without the
+        # lock on a snapshot; rows appended or tombstoned meanwhile are applied when
+        # swapping, under the lock.
+        with self._lock:
+            old = self._matrices[dim]
+            data, snapshot = old.data, old.count
+            live = np.flatnonzero(old.alive[:snapshot])
+        new = _Matrix(self.root, dim, self.dtype, generation, 0)
+        graph = _Graph(self._graph_path(dim, generation), dim, max(len(live), _MIN_CAPACITY)) if hnswlib else None
+        for start in range(0, len(live), _SCAN_BLOCK):
+            block = data[live[start:start + _SCAN_BLOCK]]
+            slots = new.append(block)
+            if graph is not None:
+                graph.add(block.astype(np.float32), slots)
+
+        with self._lock:
+            old = self._matrices[dim]
+            remap = np.full(old.count, -1, dtype=np.int64)
+            remap[live] = np.arange(len(live))
+            appended = snapshot + np.flatnonzero(old.alive[snapshot:old.count])
+            if len(appended):
+                block = old.data[appended]
+                remap[appended] = new.append(block)
+                if graph is not None:
+                    graph.add(block.astype(np.float32), remap[appended])
+            for slot in live[~old.alive[live]]:
+                new.alive[remap[slot]] = False
+                if graph is not None:
+                    graph.delete(remap[slot])
+            new.flush()
+            if graph is not None:
+                graph.save()
+            moved = [(int(remap[s]), dim, int(s)) for s in np.flatnonzero(old.alive[:old.count]) if remap[s] != s]
+            # Ascending old slots: a new slot never collides with a row not yet renumbered
+            self._db.executemany("UPDATE chunks SET slot=? WHERE dim=? AND slot=?", moved)
+            self._db.execute("UPDATE matrices SET generation=?, count=? WHERE dim=?", (generation, new.count, dim))
+            self._db.commit()
+            self._matrices[dim] = new
+            if graph is not None:
+                self._graphs[dim] = graph
+            for path in (old.path, self._graph_path(dim, old.generation)):
+                if os.path.exists(path):
+                    os.remove(path)
+        logger.info(f"Local vector store: compacted dim {dim}, {old.count} -> {new.count} slots")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                str(dim): {"slots": m.count, "tombstones": m.tombstones, "generation": m.generation}
+                for dim, m in self._matrices.items()
+            }
+
+    def close(self) -> None:
+        for thread in list(self._compacting.values()):
+            thread.join()
+        with self._lock:
+            for dim, matrix in self._matrices.items():
+                matrix.flush()
+                graph = self._graphs.get(dim)
+                if graph is not None:
+                    graph.save()
+            self._db.close()
+
+
+_backend: Optional[LocalBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> LocalBackend:
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = LocalBackend()
+            logger.info(f"Local vector backend ready ({STORE_PATH}, {STORE_DTYPE}, hnsw={'yes' if hnswlib else 'no'})")
+        return _backend
+
+
+def close_backend() -> None:
+    global _backend
+    with _backend_lock:
+        if _backend is not None:
+            _backend.close()
+            _backend = None
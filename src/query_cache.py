@@ -0,0 +1,181 @@
+"""
+Result cache for `/mcp/perform_rag_query`.
+
+Entries are keyed on the normalized query and every parameter that changes the
+answer (filters, source, match count, search knobs, embedding model), bounded by
+a TTL and an LRU size. `vector_store` invalidates them when it writes: a write to
+a source drops the entries scoped to that source and all unscoped entries (their
+results may span every source). Identical queries already in flight share one
+computation (single-flight) instead of each embedding and searching.
+Env:
+  - QUERY_CACHE_SIZE: cached responses (default: 1024, 0 disables the cache)
+  - QUERY_CACHE_TTL: seconds an entry stays valid (default: 300)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "300"))
+
+T = TypeVar("T")
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+def make_key(query: str, **params: Any) -> Tuple[str, str]:
+    """(normalized query, canonical JSON of the other parameters)."""
+    return normalize_query(query), json.dumps(params, sort_keys=True, default=str)
+
+
+class QueryCache:
+    """TTL + LRU response cache with per-source invalidation and single-flight. Thread-safe
+    for invalidation (ingest workers); `get_or_compute` runs on the event loop."""
+
+    def __init__(self, max_entries: int = CACHE_SIZE, ttl: float = CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[float, Optional[str], Any]]" = OrderedDict()
+        self._by_scope: Dict[Optional[str], Set[Hashable]] = {}
+        # Bumped on every invalidation of a scope (_epoch: of everything), so results computed
+        # across a write are not stored
+        self._generation: Dict[Optional[str], int] = {}
+        self._epoch = 0
+        self._inflight: Dict[Hashable, "asyncio.Future[Any]"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _get(self, key: Hashable) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            if entry[0] <= time.monotonic():
+                self._drop(key)
+                return False, None
+            self._entries.move_to_end(key)
+            return True, entry[2]
+
+    def _drop(self, key: Hashable) -> None:
+        _, scope, _ = self._entries.pop(key)
+        keys = self._by_scope.get(scope)
+        if keys is not None:
+            keys.discard(key)
+
+    def _put(self, key: Hashable, scope: Optional[str], value: Any, generation: Tuple[int, int]) -> None:
+        with self._lock:
+            if generation != self._generations(scope):
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl, scope, value)
+            self._by_scope.setdefault(scope, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _generations(self, scope: Optional[str]) -> Tuple[int, int]:
+        return self._generation.get(scope, 0), self._epoch
+
+    async def get_or_compute(self, key: Hashable, scope: Optional[str], compute: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Cached value for `key`, or the result of `compute()` (shared with concurrent
+        callers of the same key). Returns (value, served_from_cache). Exceptions are
+        propagated to every waiter and never cached."""
+        if not self.enabled:
+            return await compute(), False
+        found, value = self._get(key)
+        if found:
+            self.hits += 1
+            return value, True
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight), True
+        self.misses += 1
+        with self._lock:
+            generation = self._generations(scope)
+        future: "asyncio.Future[Any]" = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieved here so asyncio does not warn when nobody else was waiting
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        future.set_result(value)
+        self._put(key, scope, value, generation)
+        return value, False
+
+    def invalidate_source(self, source_id: Optional[str]) -> None:
+        """Drop entries scoped to `source_id` and all unscoped ones (None: drop everything)."""
+        with self._lock:
+            if source_id is None:
+                dropped = len(self._entries)
+                self._entries.clear()
+                self._by_scope.clear()
+                self._epoch += 1
+            else:
+                dropped = 0
+                for scope in (source_id, None):
+                    for key in self._by_scope.pop(scope, ()):
+                        if self._entries.pop(key, None) is not None:
+                            dropped += 1
+                    self._generation[scope] = self._generation.get(scope, 0) + 1
+            self.invalidations += dropped
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.coalesced + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidated": self.invalidations,
+        }
+
+
+_cache: Optional[QueryCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> QueryCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = QueryCache()
+        return _cache
+
+
+def invalidate_source(source_id: Optional[str]) -> None:
+    get_cache().invalidate_source(source_id)
@@ -0,0 +1,263 @@
+"""
+Cross-encoder reranking service (USE_RERANKING=true).
+
+One worker thread owns the CPU CrossEncoder, so the model is loaded once and
+inference (which releases the GIL in torch) never runs on the event loop.
+Requests arriving within RERANK_WINDOW_MS of each other are coalesced into one
+padded batch; passages are cut to RERANK_MAX_TOKENS tokens (query + passage)
+before scoring. The model is warmed up with a dummy batch at startup so the
+first query does not pay for lazy initialization.
+Env:
+  - USE_RERANKING: enable the service (default: false)
+  - RERANK_MODEL: cross-encoder model name or path (default: cross-encoder/ms-marco-MiniLM-L-6-v2)
+  - RERANK_MAX_TOKENS: token budget of one (query, passage) pair (default: 256)
+  - RERANK_WINDOW_MS: how long the worker waits for more requests before scoring (default: 5)
+  - RERANK_MAX_BATCH: pairs per forward pass; stops coalescing once reached (default: 64)
+  - RERANK_THREADS: torch intra-op threads (default: 0, torch default)
+  - RERANK_TIMEOUT_MS: results keep their retrieval order if scoring takes longer (default: 2000, 0 = no limit)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("USE_RERANKING", "false").strip().lower() == "true"
+MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2").strip()
+MAX_TOKENS = int(os.getenv("RERANK_MAX_TOKENS", "256"))
+WINDOW_MS = float(os.getenv("RERANK_WINDOW_MS", "5"))
+MAX_BATCH = max(1, int(os.getenv("RERANK_MAX_BATCH", "64")))
+THREADS = int(os.getenv("RERANK_THREADS", "0"))
+TIMEOUT_MS = float(os.getenv("RERANK_TIMEOUT_MS", "2000"))
+
+# Passages are cut to this many characters before tokenization (~4 chars per token, with margin)
+_CHARS_PER_TOKEN = 8
+
+
+class _Request:
+    __slots__ = ("query", "passages", "future")
+
+    def __init__(self, query: str, passages: List[str]):
+        self.query = query
+        self.passages = passages
+        self.future: "concurrent.futures.Future[List[float]]" = concurrent.futures.Future()
+
+
+class RerankService:
+    """CrossEncoder held by a dedicated worker thread that scores coalesced batches."""
+
+    def __init__(
+        self,
+        model_name: str = MODEL,
+        max_tokens: int = MAX_TOKENS,
+        window_ms: float = WINDOW_MS,
+        max_batch: int = MAX_BATCH,
+    ):
+        self.model_name = model_name
+        self.max_tokens = max_tokens
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._model: Any = None
+        self._queue: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._ready: "concurrent.futures.Future[None]" = concurrent.futures.Future()
+        self._thread = threading.Thread(target=self._run, name="reranker", daemon=True)
+        self._latencies: "deque[float]" = deque(maxlen=256)
+        self.batches = 0
+        self.requests = 0
+        self.pairs = 0
+        self.load_seconds = 0.0
+
+    def start(self) -> "concurrent.futures.Future[None]":
+        """Start the worker; the returned future resolves once the model is loaded and warm."""
+        self._thread.start()
+        return self._ready
+
+    def stop(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+
+    async def score(self, query: str, passages: Sequence[str]) -> List[float]:
+        if not passages:
+            return []
+        request = _Request(query, [p[: self.max_tokens * _CHARS_PER_TOKEN] for p in passages])
+        self._queue.put(request)
+        return await asyncio.wrap_future(request.future)
+
+    # --- Worker thread ---
+
+    def _load(self) -> None:
+        t0 = time.perf_counter()
+        if THREADS > 0:
+            import torch  # type: ignore
+
+            torch.set_num_threads(THREADS)
+        from sentence_transformers import CrossEncoder  # type: ignore
+
+        self._model = CrossEncoder(self.model_name, device="cpu", max_length=self.max_tokens)
+        # Warm-up: first forward pass allocates buffers and initializes kernels
+        self._model.predict([("warm up", "warm up")] * min(self.max_batch, 8), show_progress_bar=False)
+        self.load_seconds = time.perf_counter() - t0
+        logger.info(f"Reranker ready: {self.model_name} on CPU in {self.load_seconds:.1f}s")
+
+    def _run(self) -> None:
+        try:
+            self._load()
+        except Exception as e:
+            self._ready.set_exception(e)
+            return
+        self._ready.set_result(None)
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch, pairs = [first], len(first.passages)
+            deadline = time.monotonic() + self.window
+            while pairs < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    nxt = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stopping = True
+                    break
+                batch.append(nxt)
+                pairs += len(nxt.passages)
+            try:
+                self._score(batch)
+            except Exception as e:
+                # Never let one batch end the loop: later requests would wait forever
+                logger.warning(f"Rerank batch failed: {e}")
+                for r in batch:
+                    self._resolve(r.future, exception=e)
+        # Anything still queued after stop() gets an error rather than hanging
+        while True:
+            try:
+                pending = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if pending is not None:
+                self._resolve(pending.future, exception=RuntimeError("reranker stopped"))
+
+    @staticmethod
+    def _resolve(future: "concurrent.futures.Future[Any]", result: Any = None, exception: Optional[BaseException] = None) -> None:
+        # The caller may have given up (cancelled or timed out) meanwhile
+        if future.done():
+            return
+        try:
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+        except concurrent.futures.InvalidStateError:
+            pass
+
+    def _score(self, batch: List[_Request]) -> None:
+        # Requests whose caller already gave up are not scored
+        batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        pairs = [(r.query, p) for r in batch for p in r.passages]
+        # Length-sorted so each padded forward pass groups pairs of similar length
+        order = sorted(range(len(pairs)), key=lambda i: len(pairs[i][0]) + len(pairs[i][1]))
+        t0 = time.perf_counter()
+        try:
+            sorted_scores = self._model.predict(
+                [pairs[i] for i in order], batch_size=self.max_batch, show_progress_bar=False
+            )
+        except Exception as e:
+            for r in batch:
+                self._resolve(r.future, exception=e)
+            return
+        elapsed_ms = (time.perf_counter() - t0) * 1000
+        scores = [0.0] * len(pairs)
+        for rank, i in enumerate(order):
+            scores[i] = float(sorted_scores[rank])
+        start = 0
+        for r in batch:
+            self._resolve(r.future, scores[start:start + len(r.passages)])
+            start += len(r.passages)
+        self._latencies.append(elapsed_ms)
+        self.batches += 1
+        self.requests += len(batch)
+        self.pairs += len(pairs)
+        logger.debug(f"Rerank batch: {len(batch)} requests, {len(pairs)} pairs in {elapsed_ms:.1f} ms")
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+        return {
+            "model": self.model_name,
+            "ready": self._ready.done() and self._ready.exception() is None,
+            "load_seconds": round(self.load_seconds, 2),
+            "batches": self.batches,
+            "requests": self.requests,
+            "pairs": self.pairs,
+            "queued": self._queue.qsize(),
+            "last_batch_ms": round(self._latencies[-1], 1) if latencies else None,
+            "p50_batch_ms": round(latencies[len(latencies) // 2], 1) if latencies else None,
+            "p95_batch_ms": round(latencies[int(len(latencies) * 0.95)], 1) if latencies else None,
+        }
+
+
+_service: Optional[RerankService] = None
+
+
+def get_reranker() -> Optional[RerankService]:
+    """The running service, or None when reranking is disabled or failed to load."""
+    return _service
+
+
+async def start_reranker() -> Optional[RerankService]:
+    """Load and warm up the model in the worker thread (no-op unless USE_RERANKING=true)."""
+    global _service
+    if not ENABLED or _service is not None:
+        return _service
+    service = RerankService()
+    try:
+        await asyncio.wrap_future(service.start())
+    except Exception as e:
+        logger.warning(f"Reranker disabled: could not load {service.model_name}: {e}")
+        return None
+    _service = service
+    return _service
+
+
+async def stop_reranker() -> None:
+    global _service
+    if _service is not None:
+        service, _service = _service, None
+        await asyncio.to_thread(service.stop)
+
+
+async def rerank(query: str, results: List[Dict[str, Any]], content_key: str = "content") -> List[Dict[str, Any]]:
+    """Results sorted by cross-encoder score (`rerank_score` set on each); unchanged if the
+    service is not running, scoring fails or takes longer than RERANK_TIMEOUT_MS."""
+    service = _service
+    if service is None or not results:
+        return results
+    try:
+        scores = await asyncio.wait_for(
+            service.score(query, [str(r.get(content_key) or "") for r in results]),
+            TIMEOUT_MS / 1000 if TIMEOUT_MS > 0 else None,
+        )
+    except asyncio.TimeoutError:
+        logger.warning(f"Reranking took over {TIMEOUT_MS:.0f} ms, keeping retrieval order")
+        return results
+    except Exception as e:
+        logger.warning(f"Reranking failed, keeping retrieval order: {e}")
+        return results
+    for r, s in zip(results, scores):
+        r["rerank_score"] = s
+    return sorted(results, key=lambda r: r["rerank_score"], reverse=True)
@@ -0,0 +1,182 @@
+"""
+Streaming sitemap reader.
+
+Sitemaps are parsed incrementally with `XMLPullParser` while the body is still
+downloading (gzip'd files are inflated on the fly), so memory stays flat no matter
+how large the file is. `<sitemapindex>` entries are followed recursively by a
+bounded number of concurrent readers, and page URLs are yielded lazily as soon as
+they are parsed, ready to be fed to `CrawlFrontier.open_feed`.
+Env:
+  - SITEMAP_CONCURRENCY: child sitemaps read in parallel (default: 4)
+  - SITEMAP_MAX_DEPTH: nested <sitemapindex> levels followed (default: 3)
+  - SITEMAP_MAX_BYTES: cap on the decompressed size of one sitemap file (default: 100 MB)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import zlib
+from datetime import datetime, timezone
+from typing import AsyncIterator, Iterator, Optional, Tuple
+from xml.etree import ElementTree
+
+import http_fetch
+
+logger = logging.getLogger(__name__)
+
+CONCURRENCY = int(os.getenv("SITEMAP_CONCURRENCY", "4"))
+MAX_DEPTH = int(os.getenv("SITEMAP_MAX_DEPTH", "3"))
+MAX_BYTES = int(os.getenv("SITEMAP_MAX_BYTES", str(100 * 1024 * 1024)))
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_INFLATE_STEP = 64 * 1024
+_END = object()
+
+# (kind, loc, lastmod) where kind is 'url' or 'sitemap'
+Entry = Tuple[str, str, Optional[datetime]]
+
+
+def parse_lastmod(value: Optional[str]) -> Optional[datetime]:
+    """Parse a W3C datetime (`2024-05-01`, `2024-05-01T10:00:00Z`, ...) as an aware UTC datetime."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.endswith(("Z", "z")):
+        value = value[:-1] + "+00:00"
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return dt.replace(tzinfo=timezone.utc) if dt.tzinfo is None else dt.astimezone(timezone.utc)
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _inflate(inflater: "zlib._Decompress", data: bytes) -> Iterator[bytes]:
+    # Bounded steps so a highly compressed chunk never expands all at once
+    out = inflater.decompress(data, _INFLATE_STEP)
+    while out:
+        yield out
+        out = inflater.decompress(inflater.unconsumed_tail, _INFLATE_STEP) if inflater.unconsumed_tail else b""
+
+
+async def parse_stream(chunks: AsyncIterator[bytes], max_bytes: int = MAX_BYTES) -> AsyncIterator[Entry]:
+    """Yield `<url>` / `<sitemap>` entries from a (possibly gzip'd) sitemap body.
+    Parsed elements are discarded immediately; nested extension tags such as
+    `<image:loc>` are ignored.
+    """
+    parser = ElementTree.XMLPullParser(events=("start", "end"))
+    root: Optional[ElementTree.Element] = None
+    inflater: Optional["zlib._Decompress"] = None
+    first = True
+    size = 0
+    level = 0
+    loc: Optional[str] = None
+    lastmod: Optional[str] = None
+    async for chunk in chunks:
+        if first:
+            first = False
+            if chunk[:2] == _GZIP_MAGIC:
+                inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        for data in (_inflate(inflater, chunk) if inflater is not None else (chunk,)):
+            size += len(data)
+            if size > max_bytes:
+                logger.warning(f"Sitemap truncated at {max_bytes} bytes")
+                return
+            parser.feed(data)
+            for event, elem in parser.read_events():
+                if event == "start":
+                    level += 1
+                    if root is None:
+                        root = elem
+                    continue
+                level -= 1
+                name = _local(elem.tag)
+                # urlset/sitemapindex = 0, url/sitemap = 1, loc/lastmod = 2
+                if level == 2:
+                    if name == "loc":
+                        loc = (elem.text or "").strip()
+                    elif name == "lastmod":
+                        lastmod = elem.text
+                elif level == 1:
+                    if name in ("url", "sitemap") and loc:
+                        yield name, loc, parse_lastmod(lastmod)
+                    loc = lastmod = None
+                    if root is not None:
+                        root.clear()
+    parser.close()
+
+
+async def iter_sitemap(
+    url: str,
+    *,
+    since: Optional[datetime] = None,
+    max_depth: int = MAX_DEPTH,
+    concurrency: int = CONCURRENCY,
+    buffer: int = 1000,
+    timeout: float = 60.0,
+) -> AsyncIterator[str]:
+    """Yield page URLs of the sitemap at `url`, following nested sitemap indexes.
+
+    Entries whose `<lastmod>` is older than `since` are skipped (entries without a
+    lastmod are kept). At most `concurrency` sitemap files are read at once and at
+    most `buffer` parsed URLs wait for the consumer, so a slow consumer throttles
+    the downloads.
+    """
+    work: "asyncio.Queue[Tuple[str, int]]" = asyncio.Queue()
+    out: "asyncio.Queue[object]" = asyncio.Queue(maxsize=max(1, buffer))
+    visited = {url}
+    counts = {"sitemaps": 0, "urls": 0, "skipped": 0, "failed": 0}
+
+    async def read(sm_url: str, depth: int) -> None:
+        async with http_fetch.stream_bytes(sm_url, timeout=timeout, max_bytes=MAX_BYTES) as (_, chunks):
+            async for kind, loc, lastmod in parse_stream(chunks):
+                if since is not None and lastmod is not None and lastmod < since:
+                    counts["skipped"] += 1
+                elif kind == "sitemap":
+                    if depth >= max_depth:
+                        logger.info(f"Sitemap: max depth {max_depth} reached, not following {loc}")
+                    elif loc not in visited:
+                        visited.add(loc)
+                        work.put_nowait((loc, depth + 1))
+                else:
+                    counts["urls"] += 1
+                    await out.put(loc)
+
+    async def reader() -> None:
+        while True:
+            sm_url, depth = await work.get()
+            try:
+                await read(sm_url, depth)
+                counts["sitemaps"] += 1
+            except Exception as e:
+                counts["failed"] += 1
+                logger.warning(f"Sitemap: unable to read {sm_url}: {e}")
+            finally:
+                work.task_done()
+
+    async def finish() -> None:
+        await work.join()
+        await out.put(_END)
+
+    work.put_nowait((url, 0))
+    tasks = [asyncio.create_task(reader()) for _ in range(max(1, concurrency))]
+    tasks.append(asyncio.create_task(finish()))
+    try:
+        while True:
+            item = await out.get()
+            if item is _END:
+                break
+            yield item  # type: ignore[misc]
+    finally:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info(
+            f"Sitemap {url}: {counts['urls']} urls from {counts['sitemaps']} sitemaps "
+            f"({counts['skipped']} skipped by lastmod, {counts['failed']} failed)"
+        )
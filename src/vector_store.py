@@ -1,22 +1,68 @@
+import asyncio
+import logging
 import os
-from typing import Any, Dict, List, Optional
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
 from urllib.parse import urlparse
 from datetime import datetime
 
-from supabase import create_client, Client  # type: ignore
+import query_cache
 
-_SUPABASE_URL = os.getenv("SUPABASE_URL")
-_SUPABASE_KEY = (
-    os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-    or os.getenv("SUPABASE_SERVICE_KEY")
-    or os.getenv("SUPABASE_KEY")
-    or os.getenv("SUPABASE_ANON_KEY")
-)
+logger = logging.getLogger(__name__)
 
-if not _SUPABASE_URL or not _SUPABASE_KEY:
-    raise RuntimeError("Supabase configuration is missing. Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY.")
+# Source listings are cached briefly: they are read on every get_available_sources call
+_SOURCES_CACHE_TTL = float(os.getenv("SOURCES_CACHE_TTL", "30"))
+_SOURCES_PAGE_MAX = 1000
 
-_sb: Client = create_client(_SUPABASE_URL, _SUPABASE_KEY)
+# ANN knobs for the match_crawled_pages_ann_* functions (0 = server default)
+_EF_SEARCH = int(os.getenv("VECTOR_EF_SEARCH", "100"))
+_IVF_PROBES = int(os.getenv("VECTOR_IVF_PROBES", "0"))
+_ann_rpc_available = True
+
+# Filtered search planning (match_crawled_pages_filtered, migrations/005)
+_EXACT_THRESHOLD = int(os.getenv("VECTOR_EXACT_THRESHOLD", "2000"))
+_MAX_CANDIDATES = int(os.getenv("VECTOR_MAX_CANDIDATES", "4000"))
+_filtered_rpc_available = True
+
+# Hybrid search (match_crawled_pages_hybrid, migrations/006): RRF constant and per-side candidates
+_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+_HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "0"))
+_hybrid_rpc_available = True
+
+# VECTOR_BACKEND=supabase (PostgREST via supabase-py, default) | postgres (pooled asyncpg, see pg_store.py)
+# | local (embedded memmap + HNSW + SQLite, see local_store.py)
+_BACKEND = os.getenv("VECTOR_BACKEND", "supabase").strip().lower()
+
+if _BACKEND == "postgres":
+    import pg_store
+elif _BACKEND == "local":
+    import local_store
+
+# Supabase client, created on first use: importing supabase-py and building the client
+# would otherwise sit on the server's cold start path
+_sb: Any = None
+_sb_lock = threading.Lock()
+
+
+def _client() -> Any:
+    global _sb
+    if _sb is None:
+        with _sb_lock:
+            if _sb is None:
+                from supabase import create_client  # type: ignore
+
+                url = os.getenv("SUPABASE_URL")
+                key = (
+                    os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+                    or os.getenv("SUPABASE_SERVICE_KEY")
+                    or os.getenv("SUPABASE_KEY")
+                    or os.getenv("SUPABASE_ANON_KEY")
+                )
+                if not url or not key:
+                    raise RuntimeError("Supabase configuration is missing. Set SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY.")
+                _sb = create_client(url, key)
+    return _sb
 
 
 def _domain_from_url(url: str) -> str:
@@ -40,9 +86,35 @@ def upsert_chunks(
     """
     if not chunks:
         return 0
+    try:
+        return _write_chunks(source_id, url, title, chunks, embeddings, extra_metadata)
+    finally:
+        # Cached RAG answers over this source may be stale now, even after a partial write
+        query_cache.invalidate_source(source_id)
+
+
+def _write_chunks(
+    source_id: str,
+    url: str,
+    title: str,
+    chunks: List[Dict[str, Any]],
+    embeddings: List[List[float]],
+    extra_metadata: Optional[Dict[str, Any]],
+) -> int:
+    if _BACKEND == "postgres":
+        backend = pg_store.get_backend()
+        try:
+            backend.run(backend.upsert_sources([{"source_id": source_id, "summary": title}]))
+        except Exception:
+            pass
+        return backend.run(backend.upsert_rows(_chunk_rows(source_id, url, title, chunks, embeddings, extra_metadata)))
+    if _BACKEND == "local":
+        backend = local_store.get_backend()
+        backend.upsert_sources([{"source_id": source_id, "summary": title}])
+        return backend.upsert_rows(_chunk_rows(source_id, url, title, chunks, embeddings, extra_metadata))
     # Ensure source entry exists (best effort)
     try:
-        _sb.table("sources").upsert({
+        _client().table("sources").upsert({
             "source_id": source_id,
             "summary": title or source_id,
             "updated_at": datetime.utcnow().isoformat(),
@@ -50,6 +122,24 @@ def upsert_chunks(
     except Exception:
         pass
 
+    rows = _chunk_rows(source_id, url, title, chunks, embeddings, extra_metadata)
+    # Upsert chunks; rely on unique(url, chunk_number)
+    _client().table("crawled_pages").upsert(rows, on_conflict="url,chunk_number").execute()
+    return len(rows)
+
+
+# Per-chunk fields copied into the row metadata when present
+_CHUNK_META = ("header_path", "char_count", "word_count")
+
+
+def _chunk_rows(
+    source_id: str,
+    url: str,
+    title: str,
+    chunks: List[Dict[str, Any]],
+    embeddings: List[List[float]],
+    extra_metadata: Optional[Dict[str, Any]],
+) -> List[Dict[str, Any]]:
     rows = []
     meta_base = {"title": title or "", **(extra_metadata or {})}
     for ch, emb in zip(chunks, embeddings):
@@ -57,9 +147,11 @@ def upsert_chunks(
             "url": url,
             "chunk_number": int(ch.get("chunk_number", 0)),
             "content": ch.get("content", ""),
-            "metadata": meta_base,
+            "metadata": {**meta_base, **{k: ch[k] for k in _CHUNK_META if ch.get(k)}},
             "source_id": source_id,
         }
+        if ch.get("content_hash"):
+            row["content_hash"] = ch["content_hash"]
         # Route to the correct embedding column by vector length
         try:
             dim = len(emb)
@@ -73,25 +165,144 @@ def upsert_chunks(
             # Unknown dimension: skip to avoid DB errors
             continue
         rows.append(row)
-    # Upsert chunks; rely on unique(url, chunk_number)
-    _sb.table("crawled_pages").upsert(rows, on_conflict="url,chunk_number").execute()
-    return len(rows)
+    return rows
+
+
+def chunk_hashes(url: str) -> Dict[int, str]:
+    """Return {chunk_number: content_hash} currently stored for `url`."""
+    if _BACKEND == "postgres":
+        backend = pg_store.get_backend()
+        return backend.run(backend.chunk_hashes(url))
+    if _BACKEND == "local":
+        return local_store.get_backend().chunk_hashes(url)
+    res = _client().table("crawled_pages").select("chunk_number,content_hash").eq("url", url).execute()
+    return {int(r["chunk_number"]): (r.get("content_hash") or "") for r in (res.data or [])}
+
+
+def delete_chunks_from(url: str, first_chunk_number: int, source_id: Optional[str] = None) -> None:
+    """Delete the chunks of `url` numbered `first_chunk_number` and above. `source_id` scopes
+    the query-cache invalidation (unknown: the whole cache is dropped)."""
+    try:
+        if _BACKEND == "postgres":
+            backend = pg_store.get_backend()
+            backend.run(backend.delete_chunks_from(url, first_chunk_number))
+        elif _BACKEND == "local":
+            local_store.get_backend().delete_chunks_from(url, first_chunk_number)
+        else:
+            _client().table("crawled_pages").delete().eq("url", url).gte("chunk_number", first_chunk_number).execute()
+    finally:
+        query_cache.invalidate_source(source_id)
+
+
+_sources_cache: Dict[Tuple[str, int, int], Tuple[float, Any]] = {}
+_sources_lock = threading.Lock()
+
+
+def _sources_cached(key: Tuple[str, int, int]) -> Optional[Any]:
+    with _sources_lock:
+        hit = _sources_cache.get(key)
+    return hit[1] if hit is not None and hit[0] > time.monotonic() else None
+
+
+def _sources_remember(key: Tuple[str, int, int], value: Any) -> Any:
+    with _sources_lock:
+        if len(_sources_cache) > 256:
+            _sources_cache.clear()
+        _sources_cache[key] = (time.monotonic() + _SOURCES_CACHE_TTL, value)
+    return value
+
+
+def clear_sources_cache() -> None:
+    with _sources_lock:
+        _sources_cache.clear()
 
 
 def list_sources() -> List[str]:
-    res = _sb.table("crawled_pages").select("source_id").execute()
-    vals = res.data or []
-    uniq = sorted({r.get("source_id", "") for r in vals if r.get("source_id")})
-    return uniq
+    """All source ids, read from the `sources` table (one row per source)."""
+    cached = _sources_cached(("ids", 0, 0))
+    if cached is not None:
+        return cached
+    if _BACKEND == "postgres":
+        backend = pg_store.get_backend()
+        return _sources_remember(("ids", 0, 0), backend.run(backend.list_sources()))
+    if _BACKEND == "local":
+        return _sources_remember(("ids", 0, 0), local_store.get_backend().list_sources())
+    ids: List[str] = []
+    # PostgREST caps responses (1000 rows by default): page through
+    while True:
+        res = (
+            _client().table("sources").select("source_id").order("source_id")
+            .range(len(ids), len(ids) + _SOURCES_PAGE_MAX - 1).execute()
+        )
+        page = [r["source_id"] for r in (res.data or []) if r.get("source_id")]
+        ids.extend(page)
+        if len(page) < _SOURCES_PAGE_MAX:
+            break
+    return _sources_remember(("ids", 0, 0), ids)
 
 
-def search(
+def _format_source(row: Dict[str, Any]) -> Dict[str, Any]:
+    out = {
+        "source_id": row.get("source_id"),
+        "summary": row.get("summary"),
+        # Only list_source_stats reports it: without the function sources.total_word_count is stale
+        "total_words": row.get("total_words"),
+        "chunk_count": row.get("chunk_count"),
+        "created_at": row.get("created_at"),
+        "updated_at": row.get("updated_at"),
+    }
+    for k in ("created_at", "updated_at"):
+        if isinstance(out[k], datetime):
+            out[k] = out[k].isoformat()
+    return out
+
+
+def _load_source_stats(limit: int, offset: int) -> Dict[str, Any]:
+    if _BACKEND == "postgres":
+        backend = pg_store.get_backend()
+        rows = backend.run(backend.source_stats(limit, offset))
+        total = int(rows[0]["total_sources"]) if rows else None
+    elif _BACKEND == "local":
+        rows = local_store.get_backend().source_stats(limit, offset)
+        total = int(rows[0]["total_sources"]) if rows else None
+    else:
+        try:
+            rows = _client().rpc("list_source_stats", params={"p_limit": limit, "p_offset": offset}).execute().data or []
+            total = int(rows[0]["total_sources"]) if rows else None
+        except Exception as e:
+            # Function not deployed yet (migrations/003): plain page of the sources table, no word/chunk counts
+            logger.warning(f"list_source_stats unavailable, reading sources table: {e}")
+            res = (
+                _client().table("sources").select("*", count="exact").order("source_id")
+                .range(offset, offset + limit - 1).execute()
+            )
+            rows, total = res.data or [], res.count
+    if total is None and offset == 0:
+        total = 0
+    # Past the last page the total is unknown (it is only carried on rows): None
+    return {"sources": [_format_source(r) for r in rows], "total": total}
+
+
+def source_stats(limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+    """One page of sources with word/chunk counts and last update time:
+    {"sources": [...], "total": <number of sources>}. Cached for SOURCES_CACHE_TTL seconds.
+    """
+    limit = max(1, min(int(limit), _SOURCES_PAGE_MAX))
+    offset = max(0, int(offset))
+    cached = _sources_cached(("stats", limit, offset))
+    if cached is not None:
+        return cached
+    return _sources_remember(("stats", limit, offset), _load_source_stats(limit, offset))
+
+
+def _search_rpc(
     query_embedding: List[float],
-    *,
-    match_count: int = 5,
-    filter: Optional[Dict[str, Any]] = None,
-    source_filter: Optional[str] = None,
-) -> List[Dict[str, Any]]:
+    match_count: int,
+    filter: Optional[Dict[str, Any]],
+    source_filter: Optional[str],
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> Tuple[str, Dict[str, Any]]:
     # Choose RPC based on embedding dimension
     fn = "match_crawled_pages"
     try:
@@ -110,6 +321,12 @@ def search(
             "filter": filter or None,
             "source_filter": source_filter,
         }
+        ef_search = ef_search if ef_search is not None else (_EF_SEARCH or None)
+        probes = probes if probes is not None else (_IVF_PROBES or None)
+        # Tunable variant (migrations/004) when ANN knobs are in play
+        if _ann_rpc_available and (ef_search or probes):
+            fn = fn.replace("match_crawled_pages_", "match_crawled_pages_ann_")
+            rpc_params.update({"ef_search": ef_search, "probes": probes})
     else:
         rpc_params = {
             "query_embedding": query_embedding,
@@ -117,5 +334,327 @@ def search(
             "filter": filter or {},
             "source_filter": source_filter,
         }
-    res = _sb.rpc(fn, params=rpc_params).execute()
+    return fn, rpc_params
+
+
+def _function_missing(fn: str, e: Exception) -> bool:
+    """True if `e` says the database does not define `fn` (its migration is not applied):
+    PostgREST PGRST202 or Postgres undefined_function (42883) naming it. Errors raised while
+    the function runs (a missing column or operator, a timeout) are not."""
+    msg = getattr(e, "message", None) or str(e)  # primary message, not the PL/pgSQL context
+    code = getattr(e, "code", None) or getattr(e, "sqlstate", None)
+    if code not in ("PGRST202", "42883") and "PGRST202" not in msg:
+        return False
+    return fn in msg
+
+
+def _ann_rpc_missing(fn: str, e: Exception) -> bool:
+    """True if `fn` is an ANN variant the database does not define (migration not applied)."""
+    global _ann_rpc_available
+    if "_ann_" not in fn or not _function_missing(fn, e):
+        return False
+    _ann_rpc_available = False
+    logger.warning(f"{fn} unavailable, using the untuned matching functions (apply migrations/004): {e}")
+    return True
+
+
+def _run_search(fn: str, rpc_params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if _BACKEND == "postgres":
+        backend = pg_store.get_backend()
+        return backend.run(backend.search(fn, rpc_params))
+    res = _client().rpc(fn, params=rpc_params).execute()
     return res.data or []
+
+
+def search(
+    query_embedding: List[float],
+    *,
+    match_count: int = 5,
+    filter: Optional[Dict[str, Any]] = None,
+    source_filter: Optional[str] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Nearest chunks to `query_embedding`. `ef_search` (HNSW) and `probes` (IVFFlat)
+    trade latency for recall per query; they default to VECTOR_EF_SEARCH / VECTOR_IVF_PROBES.
+    """
+    if _BACKEND == "local":
+        return _local_search(query_embedding, match_count, filter, source_filter, ef_search)["results"]
+    fn, rpc_params = _search_rpc(query_embedding, match_count, filter, source_filter, ef_search, probes)
+    try:
+        return _run_search(fn, rpc_params)
+    except Exception as e:
+        if not _ann_rpc_missing(fn, e):
+            raise
+    fn, rpc_params = _search_rpc(query_embedding, match_count, filter, source_filter, ef_search, probes)
+    return _run_search(fn, rpc_params)
+
+
+async def asearch(
+    query_embedding: List[float],
+    *,
+    match_count: int = 5,
+    filter: Optional[Dict[str, Any]] = None,
+    source_filter: Optional[str] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """`search` for async handlers: awaits the Postgres pool directly, or runs the
+    blocking Supabase call in a thread."""
+    if _BACKEND == "postgres":
+        backend = pg_store.get_backend()
+        fn, rpc_params = _search_rpc(query_embedding, match_count, filter, source_filter, ef_search, probes)
+        try:
+            return await backend.arun(backend.search(fn, rpc_params))
+        except Exception as e:
+            if not _ann_rpc_missing(fn, e):
+                raise
+        fn, rpc_params = _search_rpc(query_embedding, match_count, filter, source_filter, ef_search, probes)
+        return await backend.arun(backend.search(fn, rpc_params))
+    return await asyncio.to_thread(
+        search, query_embedding, match_count=match_count, filter=filter, source_filter=source_filter,
+        ef_search=ef_search, probes=probes,
+    )
+
+
+def _local_search(
+    query_embedding: List[float],
+    match_count: int,
+    filter: Optional[Dict[str, Any]],
+    source_filter: Optional[str],
+    ef_search: Optional[int],
+) -> Dict[str, Any]:
+    rows, plan = local_store.get_backend().search(
+        query_embedding, match_count, filter or None, source_filter,
+        ef_search if ef_search is not None else (_EF_SEARCH or None),
+    )
+    return {"results": rows, "plan": plan}
+
+
+def _filtered_params(
+    query_embedding: List[float],
+    match_count: int,
+    filter: Optional[Dict[str, Any]],
+    source_filter: Optional[str],
+    ef_search: Optional[int],
+) -> Optional[Dict[str, Any]]:
+    """RPC params for match_crawled_pages_filtered, or None when a plain search applies."""
+    if not _filtered_rpc_available or not (filter or source_filter) or len(query_embedding) not in (768, 1536):
+        return None
+    return {
+        "query_embedding": query_embedding,
+        "match_count": match_count,
+        "filter": filter or None,
+        "source_filter": source_filter,
+        "ef_search": ef_search if ef_search is not None else (_EF_SEARCH or None),
+        "exact_threshold": _EXACT_THRESHOLD,
+        "max_candidates": _MAX_CANDIDATES,
+    }
+
+
+def _filtered_rpc_missing(e: Exception) -> bool:
+    global _filtered_rpc_available
+    if not _function_missing("match_crawled_pages_filtered", e):
+        return False
+    _filtered_rpc_available = False
+    logger.warning(f"match_crawled_pages_filtered unavailable, filtering inside the ANN query (apply migrations/005): {e}")
+    return True
+
+
+def _planned(payload: Any) -> Dict[str, Any]:
+    payload = payload or {}
+    results = payload.pop("results", None) or []
+    return {"results": results, "plan": payload}
+
+
+def search_with_plan(
+    query_embedding: List[float],
+    *,
+    match_count: int = 5,
+    filter: Optional[Dict[str, Any]] = None,
+    source_filter: Optional[str] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Like `search`, but filtered queries go through match_crawled_pages_filtered, which
+    picks an exact scan, a per-source partial index or an over-fetching ANN scan from the
+    filter's selectivity. Returns {"results": [...], "plan": {"plan": ..., ...}}.
+    """
+    if _BACKEND == "local":
+        return _local_search(query_embedding, match_count, filter, source_filter, ef_search)
+    params = _filtered_params(query_embedding, match_count, filter, source_filter, ef_search)
+    if params is not None:
+        try:
+            if _BACKEND == "postgres":
+                backend = pg_store.get_backend()
+                return _planned(backend.run(backend.call_json("match_crawled_pages_filtered", params)))
+            return _planned(_client().rpc("match_crawled_pages_filtered", params=params).execute().data)
+        except Exception as e:
+            if not _filtered_rpc_missing(e):
+                raise
+    fn, _ = _search_rpc(query_embedding, match_count, filter, source_filter, ef_search, probes)
+    rows = search(
+        query_embedding, match_count=match_count, filter=filter, source_filter=source_filter,
+        ef_search=ef_search, probes=probes,
+    )
+    return {"results": rows, "plan": {"plan": "ann", "function": fn}}
+
+
+async def asearch_with_plan(
+    query_embedding: List[float],
+    *,
+    match_count: int = 5,
+    filter: Optional[Dict[str, Any]] = None,
+    source_filter: Optional[str] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> Dict[str, Any]:
+    if _BACKEND == "postgres":
+        params = _filtered_params(query_embedding, match_count, filter, source_filter, ef_search)
+        if params is not None:
+            backend = pg_store.get_backend()
+            try:
+                return _planned(await backend.arun(backend.call_json("match_crawled_pages_filtered", params)))
+            except Exception as e:
+                if not _filtered_rpc_missing(e):
+                    raise
+        fn, _ = _search_rpc(query_embedding, match_count, filter, source_filter, ef_search, probes)
+        rows = await asearch(
+            query_embedding, match_count=match_count, filter=filter, source_filter=source_filter,
+            ef_search=ef_search, probes=probes,
+        )
+        return {"results": rows, "plan": {"plan": "ann", "function": fn}}
+    return await asyncio.to_thread(
+        search_with_plan, query_embedding, match_count=match_count, filter=filter, source_filter=source_filter,
+        ef_search=ef_search, probes=probes,
+    )
+
+
+def _hybrid_params(
+    query_text: str,
+    query_embedding: List[float],
+    match_count: int,
+    filter: Optional[Dict[str, Any]],
+    source_filter: Optional[str],
+    ef_search: Optional[int],
+) -> Optional[Dict[str, Any]]:
+    """RPC params for match_crawled_pages_hybrid, or None when only a vector search applies."""
+    if _BACKEND == "local" or not _hybrid_rpc_available or not query_text.strip() or len(query_embedding) not in (768, 1536):
+        return None
+    return {
+        "query_text": query_text,
+        "query_embedding": query_embedding,
+        "match_count": match_count,
+        "filter": filter or None,
+        "source_filter": source_filter,
+        "ef_search": ef_search if ef_search is not None else (_EF_SEARCH or None),
+        "rrf_k": _RRF_K,
+        "candidates": _HYBRID_CANDIDATES or None,
+    }
+
+
+def _hybrid_rpc_missing(e: Exception) -> bool:
+    global _hybrid_rpc_available
+    if not _function_missing("match_crawled_pages_hybrid", e):
+        return False
+    _hybrid_rpc_available = False
+    logger.warning(f"match_crawled_pages_hybrid unavailable, using vector search only (apply migrations/006): {e}")
+    return True
+
+
+def _hybrid_plan(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "plan": "hybrid",
+        "rrf_k": params["rrf_k"],
+        "candidates": max(params["candidates"] or params["match_count"] * 4, params["match_count"]),
+    }
+
+
+def _vector_fallback(found: Dict[str, Any]) -> Dict[str, Any]:
+    found["plan"] = dict(found["plan"], requested_mode="hybrid")
+    return found
+
+
+def hybrid_search(
+    query_text: str,
+    query_embedding: List[float],
+    *,
+    match_count: int = 5,
+    filter: Optional[Dict[str, Any]] = None,
+    source_filter: Optional[str] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Keyword (full-text) and vector rankings fused with reciprocal rank fusion, in a
+    single match_crawled_pages_hybrid call. Rows carry `similarity`, `keyword_rank` (null
+    for a side that did not find them) and the fused `score`. Same return shape as
+    `search_with_plan`, which it falls back to when the function is not installed.
+    """
+    params = _hybrid_params(query_text, query_embedding, match_count, filter, source_filter, ef_search)
+    if params is not None:
+        try:
+            if _BACKEND == "postgres":
+                backend = pg_store.get_backend()
+                rows = backend.run(backend.search("match_crawled_pages_hybrid", params))
+            else:
+                rows = _client().rpc("match_crawled_pages_hybrid", params=params).execute().data or []
+            return {"results": rows, "plan": _hybrid_plan(params)}
+        except Exception as e:
+            if not _hybrid_rpc_missing(e):
+                raise
+    return _vector_fallback(search_with_plan(
+        query_embedding, match_count=match_count, filter=filter, source_filter=source_filter,
+        ef_search=ef_search, probes=probes,
+    ))
+
+
+async def ahybrid_search(
+    query_text: str,
+    query_embedding: List[float],
+    *,
+    match_count: int = 5,
+    filter: Optional[Dict[str, Any]] = None,
+    source_filter: Optional[str] = None,
+    ef_search: Optional[int] = None,
+    probes: Optional[int] = None,
+) -> Dict[str, Any]:
+    if _BACKEND == "postgres":
+        params = _hybrid_params(query_text, query_embedding, match_count, filter, source_filter, ef_search)
+        if params is not None:
+            backend = pg_store.get_backend()
+            try:
+                rows = await backend.arun(backend.search("match_crawled_pages_hybrid", params))
+                return {"results": rows, "plan": _hybrid_plan(params)}
+            except Exception as e:
+                if not _hybrid_rpc_missing(e):
+                    raise
+        return _vector_fallback(await asearch_with_plan(
+            query_embedding, match_count=match_count, filter=filter, source_filter=source_filter,
+            ef_search=ef_search, probes=probes,
+        ))
+    return await asyncio.to_thread(
+        hybrid_search, query_text, query_embedding, match_count=match_count, filter=filter,
+        source_filter=source_filter, ef_search=ef_search, probes=probes,
+    )
+
+
+async def alist_sources() -> List[str]:
+    cached = _sources_cached(("ids", 0, 0))
+    if cached is not None:
+        return cached
+    return await asyncio.to_thread(list_sources)
+
+
+async def asource_stats(limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+    cached = _sources_cached(("stats", max(1, min(int(limit), _SOURCES_PAGE_MAX)), max(0, int(offset))))
+    if cached is not None:
+        return cached
+    return await asyncio.to_thread(source_stats, limit, offset)
+
+
+def close() -> None:
+    """Release the Postgres pool / flush the local store (no-op for the Supabase backend)."""
+    if _BACKEND == "postgres":
+        pg_store.close_backend()
+    elif _BACKEND == "local":
+        local_store.close_backend()
@@ -0,0 +1,73 @@
+"""
+Startup warm-ups kept off the path to the first /health answer.
+
+Launching the browser pool and loading the reranker model take seconds; with
+background warm-ups the server accepts requests as soon as its routes are
+registered and each warm-up runs as a task of the worker process. Requests that
+arrive before a resource is warm use the existing fallbacks (a dedicated browser,
+results in vector order). The per-process warm state is reported by /health.
+Env:
+  - STARTUP_WARMUP: background|blocking (default: background); blocking waits for every warm-up before serving
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+MODE = os.getenv("STARTUP_WARMUP", "background").strip().lower()
+
+_started = time.monotonic()
+_state: Dict[str, Dict[str, Any]] = {}
+_tasks: Dict[str, "asyncio.Task[Any]"] = {}
+
+
+async def _run(name: str, factory: Callable[[], Awaitable[Any]]) -> None:
+    t0 = time.monotonic()
+    state = _state[name]
+    try:
+        await factory()
+        state["state"] = "ready"
+    except Exception as e:
+        state.update(state="failed", error=str(e))
+        logger.warning(f"Warm-up {name} failed: {e}")
+    finally:
+        state["seconds"] = round(time.monotonic() - t0, 3)
+        state["ready_after_start_s"] = round(time.monotonic() - _started, 3)
+
+
+async def run(name: str, factory: Callable[[], Awaitable[Any]]) -> None:
+    """Warm `name` up with `factory()`: awaited in blocking mode, a background task otherwise."""
+    _state[name] = {"state": "pending"}
+    if MODE == "blocking":
+        await _run(name, factory)
+        return
+    _tasks[name] = asyncio.create_task(_run(name, factory), name=f"warmup:{name}")
+
+
+def ready() -> bool:
+    """Whether every warm-up finished, successfully or not."""
+    return all(s["state"] != "pending" for s in _state.values())
+
+
+async def wait(timeout: Optional[float] = None) -> None:
+    """Wait for the pending warm-ups (at most `timeout` seconds)."""
+    pending = [t for t in _tasks.values() if not t.done()]
+    if pending:
+        await asyncio.wait(pending, timeout=timeout)
+
+
+async def stop() -> None:
+    """Let the pending warm-ups finish before the resources they start are shut down: a browser
+    cancelled mid-launch could leave its process behind."""
+    await wait()
+    _tasks.clear()
+
+
+def stats() -> Dict[str, Any]:
+    return {"mode": MODE, "ready": ready(), "tasks": {k: dict(v) for k, v in _state.items()}}